@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+REJECTION_NOTICE_INTERVAL = 10.0
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        # rate <= 0 отключает ограничение.
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def try_acquire(self, now):
+        if self.rate <= 0:
+            return True
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def refund(self):
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+
+class UserAdmission:
+    __slots__ = ("bucket", "in_flight", "notified_until")
+
+    def __init__(self, rate, burst):
+        self.bucket = TokenBucket(rate, burst)
+        self.in_flight = 0
+        self.notified_until = 0.0
+
+
+class AdmissionController:
+    def __init__(self, user_rate=0.2, user_burst=5, user_in_flight=2, global_rate=20.0, global_burst=100,
+                 max_users=100000, notice_interval=REJECTION_NOTICE_INTERVAL):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.user_in_flight = user_in_flight
+        self.max_users = max_users
+        self.notice_interval = notice_interval
+        self._global = TokenBucket(global_rate, global_burst)
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self._in_flight = 0
+
+    def _user(self, user_id):
+        user = self._users.get(user_id)
+        if user is None:
+            user = self._users[user_id] = UserAdmission(self.user_rate, self.user_burst)
+            # Вытесняются давно не присылавшие чеки пользователи; их корзины и так были бы полными.
+            while len(self._users) > self.max_users:
+                _, evicted = self._users.popitem(last=False)
+                self._in_flight -= evicted.in_flight
+        else:
+            self._users.move_to_end(user_id)
+        return user
+
+    def _rejected(self, user, reason, now):
+        # Пользователь узнает об отказе не чаще раза в notice_interval: ответ на каждый
+        # лишний файл сам расходовал бы лимит запросов бота к Telegram.
+        notify = now >= user.notified_until
+        if notify:
+            user.notified_until = now + self.notice_interval
+        return reason, notify
+
+    def admit(self, user_id):
+        # Возвращает None, если задачу можно принять, иначе (причина, сообщать_ли_пользователю).
+        now = time.monotonic()
+        with self._lock:
+            user = self._user(user_id)
+            if self.user_in_flight > 0 and user.in_flight >= self.user_in_flight:
+                return self._rejected(user, "in_flight", now)
+            if not user.bucket.try_acquire(now):
+                return self._rejected(user, "rate_limited", now)
+            if not self._global.try_acquire(now):
+                user.bucket.refund()
+                return self._rejected(user, "busy", now)
+            user.in_flight += 1
+            self._in_flight += 1
+            self.admitted += 1
+            return None
+
+    def release(self, user_id):
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is not None and user.in_flight > 0:
+                user.in_flight -= 1
+                self._in_flight -= 1
+
+    def in_flight(self):
+        with self._lock:
+            return self._in_flight
+
+    def stats(self):
+        with self._lock:
+            return {
+                "admitted": self.admitted,
+                "tracked_users": len(self._users),
+                "in_flight": self._in_flight,
+                "global_tokens": round(self._global.tokens, 1) if self._global.rate > 0 else "unlimited",
+            }
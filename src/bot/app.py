@@ -0,0 +1,973 @@
+import logging
+import time
+
+from config import (
+    BROADCAST_CHUNK_SIZE, BROADCAST_PAID, BROADCAST_RATE, BROADCAST_REPORT_INTERVAL, BROADCAST_WORKERS,
+    IMPORT_MAX_BYTES, LEADERBOARD_SIZE, METRICS_ENABLED, METRICS_HOST, METRICS_PORT, OCR_ENABLED, OCR_LANG,
+    OCR_MAX_DPI, OCR_MAX_PAGES, OCR_TIMEOUT, OCR_WORKERS, PROFILER_ENABLED, PROFILER_INTERVAL, RECEIPT_GLOBAL_BURST,
+    RECEIPT_GLOBAL_RATE, RECEIPT_JOB_TIMEOUT, RECEIPT_MAX_BYTES, RECEIPT_MAX_FILE_PAGES, RECEIPT_MAX_PAGES,
+    RECEIPT_QUEUE_SIZE, RECEIPT_USER_BURST, RECEIPT_USER_IN_FLIGHT, RECEIPT_USER_RATE, RECEIPT_WORKERS, STATS_DAYS,
+    TICKET_PRICE, TICKETS_PAGE_SIZE, USER_CACHE_NOTIFY, WELCOME_IMAGE_PATH
+)
+from admission import AdmissionController
+from broadcast import STATUS_CANCELLED, BroadcastProgress
+from commands import (
+    CANCEL_COMMAND, CommandError, is_admin_user, optional_field, parse_contest_command, parse_draw_command,
+    parse_draw_verify_command, parse_stats_command, parse_user_id
+)
+from conversation import AddUserStates, BroadcastStates, DeleteUserStates, ImportUsersStates, RegistrationStates
+from draw import DrawError, DrawSampler, replay_matches, replay_sampler
+from metrics import MetricsServer, SamplingProfiler, instrument_handlers, instrument_telegram_api
+from media import MEDIA_SENDERS, is_invalid_file_id_error, uploaded_file_id
+from receipts import ReceiptJob, ReceiptRejected, create_ocr_pool, issue_tickets_params, receipt_details_complete
+from reports import EXPORT_FETCH_SIZE, UsersReportWriter
+from ui import (
+    ADD_USER_ADDRESS_PROMPT, ADD_USER_ID_PROMPT, ADD_USER_NAME_PROMPT, ADD_USER_PHONE_NUMBER_PROMPT,
+    ADD_USER_SURNAME_PROMPT, ADDRESS_PROMPT, ALREADY_REGISTERED_MESSAGE, BACK_TO_MENU_MESSAGE, BROADCAST_ACTIVE_MESSAGE,
+    BROADCAST_BUSY_MESSAGE, BROADCAST_CANCELLED_MESSAGE, BROADCAST_CREATE_FAILED_MESSAGE, BROADCAST_NOT_ACTIVE_MESSAGE,
+    BROADCAST_PROMPT, BROADCAST_RESUMED_MESSAGE, BROADCAST_STARTED_MESSAGE, BROADCAST_STOPPING_MESSAGE,
+    CONTEST_START_FAILED_MESSAGE, CONTEST_STARTED_MESSAGE, DELETE_USER_PROMPT, DETAILED_RESULTS_MESSAGE,
+    DRAW_FAILED_MESSAGE, DRAW_NOT_FOUND_MESSAGE, DRAW_VERIFY_FAILED_MESSAGE, ERROR_MESSAGE, IMPORT_CANCELLED_MESSAGE,
+    IMPORT_ERRORS_CAPTION, IMPORT_ERRORS_FILE_NAME, IMPORT_ERRORS_MESSAGE, IMPORT_FAILED_MESSAGE,
+    IMPORT_FINISHED_MESSAGE, IMPORT_PROMPT, IMPORT_STARTED_MESSAGE, IMPORT_TOO_LARGE_MESSAGE, INVALID_USER_ID_MESSAGE,
+    MAIN_MENU_MESSAGE, NAME_PROMPT, NO_PERMISSION_MESSAGE, NO_TICKETS_MESSAGE, NO_USERS_MESSAGE, NOT_REGISTERED_MESSAGE,
+    PHONE_NUMBER_PROMPT, RECEIPT_ACCEPTED_MESSAGE, RECEIPT_ALREADY_ADDED_MESSAGE, RECEIPT_NOT_PDF_MESSAGE,
+    RECEIPT_REJECTION_MESSAGES, RECEIPT_UNREADABLE_MESSAGE, RECEIPT_USED_MESSAGE, REGISTRATION_DONE_MESSAGE,
+    REGISTRATION_FAILED_MESSAGE, REGISTRATION_START_MESSAGE, REPORT_FAILED_MESSAGE, RESULTS_MESSAGE,
+    SEND_RECEIPT_MESSAGE, STATS_FAILED_MESSAGE, SURNAME_PROMPT, TICKETS_PAGE_CALLBACK_PREFIX,
+    TICKETS_PAGE_NOT_FOUND_MESSAGE, TICKETS_RECEIVED_MESSAGE, USER_ADD_FAILED_MESSAGE, USER_ADDED_MESSAGE,
+    USER_DELETE_ERROR_MESSAGE, USER_DELETE_FAILED_MESSAGE, USER_DELETED_MESSAGE, USER_MANAGEMENT_MESSAGE,
+    USERS_EXPORT_CAPTION, USERS_REPORT_CAPTION, USERS_REPORT_FILE_NAME, WELCOME_BACK_MESSAGE,
+    WELCOME_IMAGE_FAILED_MESSAGE, WELCOME_MESSAGE, build_tickets_page, create_admin_management_menu, create_menu,
+    create_results_inline_menu, format_broadcast_report, format_contest_stats, format_db_stats, format_draw_results,
+    format_draw_verification, format_receipt_rejection, format_tickets_summary, parse_tickets_page_callback
+)
+from user_cache import USER_CACHE_CLEAR_PAYLOAD
+from user_import import IMPORT_ERRORS_IN_MESSAGE, UserImport, UserImportError
+
+
+def menu_button(text):
+    return lambda message: message.text == text
+
+
+class SchemaMigrator:
+    # Версии схемы и проверка SQL запросов: нужны боту при запуске и проверке готовности (--check),
+    # которой не нужны ни бот, ни обработчики.
+    def __init__(self, database, query_registry):
+        self.database = database
+        self.query_registry = query_registry
+
+    async def fetch_schema_versions(self):
+        # None — база недоступна, пустой словарь — схема еще ни разу не применялась.
+        try:
+            async with self.database.connection() as db:
+                rows = await db.fetch("schema_migrations")
+            return {name: checksum for name, checksum in rows}
+        except self.database.undefined_table_error:
+            return {}
+        except self.database.errors as e:
+            logging.error(f"Ошибка при чтении версии схемы базы данных: {e}")
+            return None
+
+    async def create_user_table_if_not_exists(self, checksum):
+        try:
+            async with self.database.transaction() as db:
+                await db.execute("schema_migration_lock")
+                await db.run_script("create_table")
+                await db.execute("schema_migration_save", ("create_table", checksum))
+            logging.info(f"Схема базы данных обновлена до версии {checksum[:12]}.")
+            return True
+        except self.database.errors as e:
+            logging.error(f"Ошибка при создании таблицы пользователей: {e}")
+            return False
+
+    async def validate_queries(self, checksum):
+        try:
+            async with self.database.connection() as db:
+                failed = await db.validate_queries()
+                if not failed:
+                    await db.execute("schema_migration_save", ("queries", checksum))
+        except self.database.errors as e:
+            logging.error(f"Ошибка при проверке SQL запросов: {e}")
+            return
+        if not failed:
+            logging.info(f"Все SQL запросы ({len(self.query_registry.statements())}) прошли проверку.")
+
+    async def migrate(self):
+        # Скрипт схемы и проверка запросов выполняются, только если с прошлого запуска изменились
+        # их тексты: на актуальной базе запуск стоит одного SELECT.
+        expected = self.query_registry.checksums()
+        applied = await self.fetch_schema_versions()
+        if applied is None:
+            return
+        if applied.get("create_table") != expected["create_table"]:
+            if not await self.create_user_table_if_not_exists(expected["create_table"]):
+                return
+        if applied.get("queries") != expected["queries"]:
+            await self.validate_queries(expected["queries"])
+        else:
+            logging.info(f"Схема базы данных актуальна (версия {expected['create_table'][:12]}), проверка пропущена.")
+
+    async def check_readiness(self):
+        applied = await self.fetch_schema_versions()
+        if applied is None:
+            return False
+        pending = [name for name, checksum in self.query_registry.checksums().items() if applied.get(name) != checksum]
+        if pending:
+            logging.error(f"Схема базы данных не актуальна ({', '.join(pending)}): запустите бота, чтобы применить ее.")
+            return False
+        logging.info("База данных доступна, схема актуальна.")
+        return True
+
+
+class BotApp:
+    # Обработчики, запросы к БД и ответы бота, общие для многопоточного (threaded_main.py) и
+    # асинхронного (async_main.py) режимов. Ввод-вывод своего режима дают: database —
+    # connection()/transaction() с сессией БД (execute, fetchrow, fetch, fetchval, run_script,
+    # copy_import, stream, validate_queries), errors и pool_stats(); self.bot с awaitable-методами
+    # Bot API; наследник — callback, to_thread, upload_lock и import_records. Методы написаны как
+    # корутины: в многопоточном режиме они ни разу не приостанавливаются и выполняются сразу.
+    api_errors = ()
+    asynchronous = False
+    broadcaster_class = None
+    receipt_processor_class = None
+
+    def __init__(self, database, bot, telebot, query_registry, user_cache, static_media, bot_metrics, fingerprint_cache):
+        self.database = database
+        self.bot = bot
+        self.telebot = telebot
+        self.query_registry = query_registry
+        self.user_cache = user_cache
+        self.static_media = static_media
+        self.bot_metrics = bot_metrics
+        self.broadcaster = self.broadcaster_class(
+            send=self.callback(self.send_broadcast_message),
+            fetch_recipients=self.callback(self.fetch_broadcast_recipients),
+            save_progress=self.callback(self.save_broadcast_progress),
+            report=self.callback(self.report_broadcast_progress),
+            rate=BROADCAST_RATE,
+            workers=BROADCAST_WORKERS,
+            chunk_size=BROADCAST_CHUNK_SIZE,
+            report_interval=BROADCAST_REPORT_INTERVAL
+        )
+        self.receipt_processor = self.receipt_processor_class(
+            download=self.callback(self.download_receipt_file),
+            on_result=self.callback(self.on_receipt_parsed),
+            on_error=self.callback(self.on_receipt_failed),
+            workers=RECEIPT_WORKERS,
+            queue_size=RECEIPT_QUEUE_SIZE,
+            job_timeout=RECEIPT_JOB_TIMEOUT,
+            max_pages=RECEIPT_MAX_PAGES,
+            max_bytes=RECEIPT_MAX_BYTES,
+            cache=fingerprint_cache,
+            ocr_pool=create_ocr_pool(
+                OCR_ENABLED,
+                workers=OCR_WORKERS,
+                max_pages=OCR_MAX_PAGES,
+                max_dpi=OCR_MAX_DPI,
+                lang=OCR_LANG,
+                timeout=OCR_TIMEOUT
+            ),
+            on_parse_timing=bot_metrics.observe_receipt_parse,
+            max_file_pages=RECEIPT_MAX_FILE_PAGES,
+            admission=AdmissionController(
+                user_rate=RECEIPT_USER_RATE,
+                user_burst=RECEIPT_USER_BURST,
+                user_in_flight=RECEIPT_USER_IN_FLIGHT,
+                global_rate=RECEIPT_GLOBAL_RATE,
+                global_burst=RECEIPT_GLOBAL_BURST
+            ),
+            on_reject=bot_metrics.receipt_rejections.inc
+        )
+        self.conversation_steps = {
+            RegistrationStates.surname.name: self.ask_for_surname,
+            RegistrationStates.name.name: self.ask_for_name,
+            RegistrationStates.address.name: self.ask_for_address,
+            RegistrationStates.phone_number.name: self.ask_for_phone_number,
+            AddUserStates.user_id.name: self.process_add_user_id_input,
+            AddUserStates.surname.name: self.process_add_user_surname_input,
+            AddUserStates.name.name: self.process_add_user_name_input,
+            AddUserStates.address.name: self.process_add_user_address_input,
+            AddUserStates.phone_number.name: self.process_add_user_phone_input,
+            DeleteUserStates.user_id.name: self.process_user_deletion_input,
+        }
+
+    def callback(self, method):
+        return method
+
+    def register_handlers(self):
+        # Порядок регистрации — порядок проверки фильтров: шаги диалогов проверяются раньше кнопок меню.
+        message_handlers = [
+            (self.broadcast_message_handler,
+             {"state": BroadcastStates.message, "content_types": ['text', 'photo', 'video', 'document', 'animation']}),
+            (self.import_users_document_handler, {"state": ImportUsersStates.document, "content_types": ['text', 'document']}),
+            (self.conversation_step_handler, {"state": "*"}),
+            (self.start_command_handler, {"commands": ['start']}),
+            (self.export_data_handler, {"func": menu_button("📊 Экспорт данных")}),
+            (self.manage_users_handler, {"func": menu_button("⚙️ Управление пользователями")}),
+            (self.add_user_handler, {"func": menu_button("➕ Добавить пользователя")}),
+            (self.import_users_handler, {"func": menu_button("📥 Импорт пользователей")}),
+            (self.delete_user_handler, {"func": menu_button("➖ Удалить пользователя")}),
+            (self.broadcast_handler, {"func": menu_button("📢 Рассылка")}),
+            (self.broadcast_stop_handler, {"commands": ['broadcast_stop']}),
+            (self.back_to_admin_menu_handler, {"func": menu_button("⬅️ Назад")}),
+            (self.my_tickets_handler, {"func": menu_button("🎫 Мои билеты")}),
+            (self.get_tickets_handler, {"func": menu_button("🎟️ Получить билеты")}),
+            (self.results_handler, {"func": menu_button("🏆 Результаты")}),
+            (self.draw_command_handler, {"commands": ['draw']}),
+            (self.draw_verify_command_handler, {"commands": ['draw_verify']}),
+            (self.contest_stats_button_handler, {"func": menu_button("📈 Статистика")}),
+            (self.contest_stats_command_handler, {"commands": ['stats']}),
+            (self.new_contest_command_handler, {"commands": ['new_contest']}),
+            (self.export_users_command_handler, {"commands": ['export_users']}),
+            (self.db_stats_command_handler, {"commands": ['db_stats']}),
+            (self.handle_receipt_document, {"content_types": ['document']}),
+        ]
+        for handler, filters in message_handlers:
+            self.telebot.register_message_handler(self.callback(handler), **filters)
+        self.telebot.register_callback_query_handler(self.callback(self.callback_inline),
+                                                     func=lambda call: call.data == 'learn_results')
+        self.telebot.register_callback_query_handler(self.callback(self.tickets_page_callback),
+                                                     func=lambda call: call.data.startswith(TICKETS_PAGE_CALLBACK_PREFIX))
+
+    async def notify_user_changed(self, db, user_id):
+        # Уведомление доставляется другим экземплярам бота только после фиксации транзакции.
+        if USER_CACHE_NOTIFY:
+            await db.execute("notify_user_changed", (str(user_id),))
+
+    async def register_new_user(self, user_id, surname, name, address, phone_number):
+        try:
+            async with self.database.transaction() as db:
+                await db.execute("insert", (user_id, surname, name, address, phone_number, 0))
+                await self.notify_user_changed(db, user_id)
+            self.user_cache.set(user_id, (user_id, surname, name, address, phone_number))
+            logging.info(f"Пользователь {user_id} успешно зарегистрирован.")
+            return True
+        except self.database.errors as e:
+            logging.error(f"Ошибка при регистрации пользователя {user_id}: {e}")
+            return False
+
+    async def fetch_user_profile(self, user_id):
+        cached, profile = self.user_cache.get(user_id)
+        if cached:
+            return profile
+        generation = self.user_cache.generation()
+        try:
+            async with self.database.connection() as db:
+                profile = await db.fetchrow("select", (user_id,))
+        except self.database.errors as e:
+            logging.error(f"Ошибка при проверке регистрации пользователя {user_id}: {e}")
+            return None
+        self.user_cache.set(user_id, profile, generation)
+        return profile
+
+    async def is_user_registered(self, user_id):
+        return await self.fetch_user_profile(user_id) is not None
+
+    async def fetch_user_tickets_summary(self, user_id):
+        try:
+            async with self.database.connection() as db:
+                return await db.fetchrow("user_tickets_summary", (user_id,))
+        except self.database.errors as e:
+            logging.error(f"Ошибка при получении сводки билетов пользователя {user_id}: {e}")
+            return None
+
+    async def fetch_user_tickets_page(self, user_id, direction, cursor_ticket_id, limit=TICKETS_PAGE_SIZE):
+        # Запрашивается на одну строку больше страницы, чтобы узнать, есть ли билеты дальше.
+        try:
+            async with self.database.connection() as db:
+                return await db.fetch(f"user_tickets_page_{direction}", (user_id, cursor_ticket_id, limit + 1))
+        except self.database.errors as e:
+            logging.error(f"Ошибка при получении билетов пользователя {user_id}: {e}")
+            return []
+
+    async def update_user_tickets_count(self, user_id, receipt_data):
+        params = issue_tickets_params(user_id, receipt_data, TICKET_PRICE)
+        try:
+            async with self.database.connection() as db:
+                issued, owner_id = await db.fetchrow("issue_tickets", params)
+                if not issued and params["tickets_count"] > 0 and owner_id is None:
+                    # Чек был записан параллельной транзакцией после начала нашего запроса.
+                    owner_id = await db.fetchval("receipt_owner", (params["bill_number"],))
+        except self.database.errors as e:
+            logging.error(f"Ошибка при обновлении билетов пользователя {user_id}: {e}")
+            await self.bot.send_message(user_id, RECEIPT_REJECTION_MESSAGES["error"])
+            return 0
+
+        if issued:
+            return issued
+        if owner_id is None:
+            return 0
+        await self.bot.send_message(user_id, RECEIPT_ALREADY_ADDED_MESSAGE if owner_id == user_id else RECEIPT_USED_MESSAGE)
+        return 0
+
+    async def delete_user_from_db(self, user_id):
+        try:
+            async with self.database.transaction() as db:
+                await db.execute("delete_user", (user_id,))
+                await self.notify_user_changed(db, user_id)
+            self.user_cache.set(user_id, None)
+            logging.info(f"Пользователь {user_id} успешно удален из базы данных.")
+            return True
+        except self.database.errors as e:
+            logging.error(f"Ошибка при удалении пользователя {user_id} из базы данных: {e}")
+            return False
+
+    async def admin_add_new_user_to_db(self, user_id, surname=None, name=None, address=None, phone_number=None,
+                                       number_of_tickets=0):
+        try:
+            async with self.database.transaction() as db:
+                await db.execute("admin_insert_user", (user_id, surname, name, address, phone_number, number_of_tickets))
+                await self.notify_user_changed(db, user_id)
+            self.user_cache.invalidate(user_id)
+            logging.info(f"Администратор добавил пользователя {user_id} в базу данных.")
+            return True
+        except self.database.errors as e:
+            logging.error(f"Ошибка при добавлении пользователя {user_id} через администратора: {e}")
+            return False
+
+    async def import_users_to_db(self, admin_id, file_name, user_import, records):
+        # Проверенные строки загружаются через COPY в таблицу users_import_staging и одним
+        # запросом переносятся в users; при ошибке откатывается весь файл.
+        report = user_import.report
+        async with self.database.transaction() as db:
+            import_id = await db.fetchval("user_import_create", (admin_id, file_name))
+            await db.copy_import(import_id, records)
+            report.inserted, report.updated, report.tickets_added = await db.fetchrow("user_import_merge", (import_id,))
+            await db.execute("user_import_finish", report.finish_params(import_id))
+            await self.notify_user_changed(db, USER_CACHE_CLEAR_PAYLOAD)
+        self.user_cache.clear()
+        return import_id
+
+
+    async def create_broadcast(self, admin_chat_id, source_message_id):
+        try:
+            async with self.database.connection() as db:
+                return await db.fetchval("broadcast_create", (admin_chat_id, source_message_id))
+        except self.database.errors as e:
+            logging.error(f"Ошибка при создании рассылки: {e}")
+            return None
+
+    async def fetch_broadcast_recipients(self, after_user_id, limit):
+        # Ошибка БД не перехватывается: пустой список означал бы, что рассылка завершена.
+        async with self.database.connection() as db:
+            rows = await db.fetch("broadcast_recipients", (after_user_id, limit))
+        return [row[0] for row in rows]
+
+    async def save_broadcast_progress(self, progress):
+        try:
+            async with self.database.connection() as db:
+                await db.execute("broadcast_progress", progress.params())
+        except self.database.errors as e:
+            logging.error(f"Ошибка при сохранении прогресса рассылки №{progress.broadcast_id}: {e}")
+
+    async def fetch_running_broadcast(self):
+        try:
+            async with self.database.connection() as db:
+                row = await db.fetchrow("broadcast_running")
+        except self.database.errors as e:
+            logging.error(f"Ошибка при поиске незавершенной рассылки: {e}")
+            return None
+        return BroadcastProgress(*row) if row else None
+
+
+    async def sample_draw_winners(self, db, sampler, contest_id):
+        while not sampler.done:
+            batch = sampler.next_batch()
+            rows = await db.fetch("draw_ticket_owners", (contest_id, batch))
+            sampler.accept(batch, {ticket_id: user_id for ticket_id, user_id in rows})
+        return sampler.winners
+
+    async def run_winner_draw(self, winners_count, seed, admin_id):
+        # Границы и состав билетов читаются из одного снимка данных.
+        async with self.database.transaction(isolation="repeatable_read") as db:
+            contest_id, min_ticket_id, max_ticket_id, available = await db.fetchrow("draw_bounds", (winners_count,))
+            if available < winners_count:
+                raise DrawError(f"Недостаточно билетов для розыгрыша: есть {available}, нужно {winners_count}.")
+            sampler = DrawSampler(seed, winners_count, min_ticket_id, max_ticket_id)
+            winners = await self.sample_draw_winners(db, sampler, contest_id)
+            draw_id = await db.fetchval("draw_create", (contest_id, seed, winners_count, min_ticket_id, max_ticket_id,
+                                                        sampler.candidates_checked, admin_id))
+            await db.execute("draw_winners_insert", (draw_id, [ticket_id for ticket_id, _ in winners],
+                                                     [user_id for _, user_id in winners]))
+        logging.info(f"Администратор {admin_id} провел розыгрыш №{draw_id} с зерном {seed}.")
+        return draw_id
+
+    async def fetch_draw(self, draw_id):
+        async with self.database.connection() as db:
+            draw = await db.fetchrow("draw", (draw_id,))
+            winners = await db.fetch("draw_winners", (draw_id,))
+        return draw, winners
+
+    async def verify_winner_draw(self, draw, winners):
+        sampler, contest_id = replay_sampler(draw)
+        async with self.database.connection() as db:
+            await self.sample_draw_winners(db, sampler, contest_id)
+        return replay_matches(draw, sampler, winners)
+
+
+    async def fetch_contest_stats(self, days, leaders_count):
+        async with self.database.connection() as db:
+            totals = await db.fetchrow("contest_stats_totals")
+            stats_days = await db.fetch("contest_stats_days", (days,))
+            leaders = await db.fetch("leaderboard", (leaders_count,))
+        return totals, stats_days, leaders
+
+    async def start_contest(self, title, admin_id):
+        async with self.database.connection() as db:
+            contest_id = await db.fetchval("contest_start", (title,))
+        logging.info(f"Администратор {admin_id} начал конкурс №{contest_id} «{title}».")
+        return contest_id
+
+    async def load_static_media(self):
+        try:
+            async with self.database.connection() as db:
+                rows = await db.fetch("static_media")
+        except self.database.errors as e:
+            logging.error(f"Ошибка при загрузке сохраненных file_id медиафайлов: {e}")
+            return
+        self.static_media.load(rows)
+
+    async def save_static_media(self, name, sha256, file_id):
+        try:
+            async with self.database.connection() as db:
+                await db.execute("static_media_save", (name, sha256, file_id))
+        except self.database.errors as e:
+            logging.error(f"Ошибка при сохранении file_id медиафайла {name}: {e}")
+
+
+    async def fetch_tickets_page(self, user_id, direction="after", cursor_ticket_id=0):
+        rows = await self.fetch_user_tickets_page(user_id, direction, cursor_ticket_id)
+        return build_tickets_page(rows, direction, cursor_ticket_id, TICKETS_PAGE_SIZE)
+
+
+    async def send_main_menu(self, chat_id, is_admin):
+        await self.bot.send_message(chat_id, MAIN_MENU_MESSAGE, reply_markup=create_menu(is_admin), parse_mode='Markdown')
+
+    async def send_static_media(self, chat_id, name):
+        asset = self.static_media.asset(name)
+        send = getattr(self.bot, MEDIA_SENDERS[asset.kind])
+        file_id = self.static_media.cached_file_id(name)
+        if file_id is not None:
+            try:
+                return await send(chat_id, file_id)
+            except Exception as e:
+                if not is_invalid_file_id_error(e):
+                    raise
+                logging.warning(f"Сохраненный file_id медиафайла {name} недействителен, файл будет загружен заново: {e}")
+                self.static_media.forget(name, file_id)
+        # Файл загружается в Telegram один раз: остальные запросы дожидаются полученного file_id.
+        async with self.upload_lock():
+            file_id = self.static_media.cached_file_id(name)
+            if file_id is not None:
+                return await send(chat_id, file_id)
+            sha256 = asset.sha256
+            with open(asset.path, 'rb') as file:
+                sent_message = await send(chat_id, file)
+            file_id = uploaded_file_id(sent_message, asset.kind)
+            self.static_media.remember(name, sha256, file_id)
+        await self.save_static_media(name, sha256, file_id)
+        return sent_message
+
+    async def send_back_to_menu_message(self, chat_id, is_admin):
+        await self.bot.send_message(chat_id, BACK_TO_MENU_MESSAGE, reply_markup=create_menu(is_admin), parse_mode='Markdown')
+
+    async def send_users_excel_report(self, chat_id, caption):
+        report = None
+        try:
+            async with self.database.transaction() as db:
+                async for row in db.stream("users_tickets_export", EXPORT_FETCH_SIZE):
+                    if report is None:
+                        report = UsersReportWriter()
+                    report.append(row)
+        except self.database.errors as e:
+            logging.error(f"Ошибка при формировании отчета по пользователям: {e}")
+            await self.bot.send_message(chat_id, REPORT_FAILED_MESSAGE)
+            return
+
+        if report is None:
+            await self.bot.send_message(chat_id, NO_USERS_MESSAGE)
+            return
+
+        excel_file = await self.to_thread(report.finish)
+        with excel_file:
+            await self.bot.send_document(chat_id, excel_file, caption=caption,
+                                         visible_file_name=USERS_REPORT_FILE_NAME, parse_mode='Markdown')
+
+
+    async def send_broadcast_message(self, chat_id, progress):
+        await self.bot.copy_message(chat_id, progress.admin_chat_id, progress.source_message_id,
+                                    allow_paid_broadcast=BROADCAST_PAID)
+
+    async def report_broadcast_progress(self, progress, finished):
+        if finished:
+            logging.info(f"Рассылка №{progress.broadcast_id} {progress.status_text()}: {progress.summary()}.")
+        await self.bot.send_message(progress.admin_chat_id, format_broadcast_report(progress, finished))
+
+    async def resume_broadcast(self):
+        progress = await self.fetch_running_broadcast()
+        if progress is not None and self.broadcaster.start(progress):
+            logging.info(f"Рассылка №{progress.broadcast_id} возобновлена после пользователя {progress.last_user_id}.")
+            await self.bot.send_message(progress.admin_chat_id,
+                                        BROADCAST_RESUMED_MESSAGE.format(broadcast_id=progress.broadcast_id))
+
+    async def broadcast_message_handler(self, message):
+        await self.bot.delete_state(message.from_user.id, message.chat.id)
+        if message.text == CANCEL_COMMAND:
+            await self.bot.send_message(message.chat.id, BROADCAST_CANCELLED_MESSAGE)
+            await self.send_back_to_menu_message(message.chat.id, True)
+            return
+
+        broadcast_id = await self.create_broadcast(message.chat.id, message.message_id)
+        if broadcast_id is None:
+            await self.bot.send_message(message.chat.id, BROADCAST_CREATE_FAILED_MESSAGE)
+        elif self.broadcaster.start(BroadcastProgress(broadcast_id, message.chat.id, message.message_id)):
+            logging.info(f"Администратор {message.from_user.id} запустил рассылку №{broadcast_id}.")
+            await self.bot.send_message(message.chat.id, BROADCAST_STARTED_MESSAGE.format(broadcast_id=broadcast_id))
+        else:
+            progress = BroadcastProgress(broadcast_id, message.chat.id, message.message_id)
+            progress.status = STATUS_CANCELLED
+            await self.save_broadcast_progress(progress)
+            await self.bot.send_message(message.chat.id, BROADCAST_BUSY_MESSAGE)
+        await self.send_back_to_menu_message(message.chat.id, True)
+
+
+    async def import_users_document_handler(self, message):
+        await self.bot.delete_state(message.from_user.id, message.chat.id)
+        if message.content_type != 'document':
+            await self.bot.send_message(message.chat.id, IMPORT_CANCELLED_MESSAGE)
+        elif message.document.file_size and message.document.file_size > IMPORT_MAX_BYTES:
+            await self.bot.send_message(message.chat.id,
+                                        IMPORT_TOO_LARGE_MESSAGE.format(max_mb=IMPORT_MAX_BYTES // (1024 * 1024)))
+        else:
+            await self.run_user_import(message.chat.id, message.from_user.id, message.document)
+        await self.send_back_to_menu_message(message.chat.id, True)
+
+    async def run_user_import(self, chat_id, admin_id, document):
+        await self.bot.send_message(chat_id, IMPORT_STARTED_MESSAGE)
+        started = time.perf_counter()
+        try:
+            data = await self.download_receipt_file(document.file_id)
+            # Разбор XLSX и проверка строк занимают процессор: асинхронный режим выполняет их вне цикла событий.
+            user_import = await self.to_thread(UserImport, data, document.file_name)
+            records = await self.import_records(user_import)
+            import_id = await self.import_users_to_db(admin_id, document.file_name, user_import, records)
+        except UserImportError as e:
+            await self.bot.send_message(chat_id, ERROR_MESSAGE.format(error=e), parse_mode='Markdown')
+            return
+        except self.database.errors + self.api_errors as e:
+            logging.error(f"Ошибка при импорте пользователей из файла {document.file_name}: {e}")
+            await self.bot.send_message(chat_id, IMPORT_FAILED_MESSAGE)
+            return
+
+        report = user_import.report
+        logging.info(f"Импорт №{import_id} ({document.file_name}) администратора {admin_id} "
+                     f"завершен за {time.perf_counter() - started:.1f} с: {report.summary()}.")
+        await self.bot.send_message(chat_id, IMPORT_FINISHED_MESSAGE.format(import_id=import_id, summary=report.summary()))
+        if report.errors:
+            await self.bot.send_message(chat_id, IMPORT_ERRORS_MESSAGE.format(preview=report.errors_preview()))
+        if len(report.errors) > IMPORT_ERRORS_IN_MESSAGE:
+            with report.errors_csv() as errors_file:
+                await self.bot.send_document(chat_id, errors_file, caption=IMPORT_ERRORS_CAPTION.format(import_id=import_id),
+                                             visible_file_name=IMPORT_ERRORS_FILE_NAME.format(import_id=import_id))
+
+
+    async def conversation_step_handler(self, message):
+        state = await self.bot.get_state(message.from_user.id, message.chat.id)
+        step = self.conversation_steps.get(state)
+        if step is None:
+            logging.warning(f"Неизвестное состояние диалога {state} у пользователя {message.from_user.id}, состояние сброшено.")
+            await self.bot.delete_state(message.from_user.id, message.chat.id)
+            await self.send_back_to_menu_message(message.chat.id, is_admin_user(message.from_user.id))
+            return
+        await step(message)
+
+
+    async def start_command_handler(self, message):
+        user_id = message.from_user.id
+        is_admin = is_admin_user(user_id)
+
+        try:
+            await self.send_static_media(message.chat.id, "welcome_image")
+        except FileNotFoundError:
+            logging.error(f"Файл изображения не найден: {WELCOME_IMAGE_PATH}")
+            await self.bot.send_message(message.chat.id, WELCOME_IMAGE_FAILED_MESSAGE)
+
+        await self.bot.send_message(message.chat.id, WELCOME_MESSAGE, parse_mode='Markdown')
+
+        await self.send_main_menu(message.chat.id, is_admin)
+
+        if not await self.is_user_registered(user_id):
+            await self.bot.send_message(message.chat.id, REGISTRATION_START_MESSAGE)
+            await self.bot.send_message(message.chat.id, SURNAME_PROMPT)
+            await self.bot.set_state(user_id, RegistrationStates.surname, message.chat.id)
+        else:
+            await self.bot.send_message(message.chat.id, WELCOME_BACK_MESSAGE)
+            await self.send_back_to_menu_message(message.chat.id, is_admin)
+
+
+    async def export_data_handler(self, message):
+        if is_admin_user(message.from_user.id):
+            await self.send_users_excel_report(message.chat.id, USERS_REPORT_CAPTION)
+        else:
+            await self.bot.send_message(message.chat.id, NO_PERMISSION_MESSAGE)
+
+
+    async def manage_users_handler(self, message):
+        if is_admin_user(message.from_user.id):
+            await self.bot.send_message(message.chat.id, USER_MANAGEMENT_MESSAGE,
+                                        reply_markup=create_admin_management_menu(), parse_mode='Markdown')
+        else:
+            await self.bot.send_message(message.chat.id, NO_PERMISSION_MESSAGE)
+
+
+    async def add_user_handler(self, message):
+        if is_admin_user(message.from_user.id):
+            await self.bot.send_message(message.chat.id, ADD_USER_ID_PROMPT)
+            await self.bot.set_state(message.from_user.id, AddUserStates.user_id, message.chat.id)
+        else:
+            await self.bot.send_message(message.chat.id, NO_PERMISSION_MESSAGE)
+
+    async def process_add_user_id_input(self, message):
+        user_id = parse_user_id(message.text)
+        if user_id is None:
+            await self.bot.delete_state(message.from_user.id, message.chat.id)
+            await self.bot.send_message(message.chat.id, INVALID_USER_ID_MESSAGE)
+            await self.send_back_to_menu_message(message.chat.id, True)
+            return
+        await self.bot.add_data(message.from_user.id, message.chat.id, new_user_id=user_id)
+        await self.bot.set_state(message.from_user.id, AddUserStates.surname, message.chat.id)
+        await self.bot.send_message(message.chat.id, ADD_USER_SURNAME_PROMPT.format(user_id=user_id))
+
+    async def save_add_user_field(self, message, field, next_state, prompt):
+        async with self.bot.retrieve_data(message.from_user.id, message.chat.id) as data:
+            data[field] = optional_field(message.text)
+            user_id = data["new_user_id"]
+        await self.bot.set_state(message.from_user.id, next_state, message.chat.id)
+        await self.bot.send_message(message.chat.id, prompt.format(user_id=user_id))
+
+    async def process_add_user_surname_input(self, message):
+        await self.save_add_user_field(message, "surname", AddUserStates.name, ADD_USER_NAME_PROMPT)
+
+    async def process_add_user_name_input(self, message):
+        await self.save_add_user_field(message, "name", AddUserStates.address, ADD_USER_ADDRESS_PROMPT)
+
+    async def process_add_user_address_input(self, message):
+        await self.save_add_user_field(message, "address", AddUserStates.phone_number, ADD_USER_PHONE_NUMBER_PROMPT)
+
+    async def process_add_user_phone_input(self, message):
+        phone_number = optional_field(message.text)
+        async with self.bot.retrieve_data(message.from_user.id, message.chat.id) as data:
+            user_id, surname, name, address = data["new_user_id"], data.get("surname"), data.get("name"), data.get("address")
+        await self.bot.delete_state(message.from_user.id, message.chat.id)
+
+        if await self.admin_add_new_user_to_db(user_id, surname, name, address, phone_number):
+            await self.bot.send_message(message.chat.id, USER_ADDED_MESSAGE.format(user_id=user_id))
+            logging.info(f"Администратор {message.from_user.id} успешно добавил пользователя {user_id}.")
+        else:
+            await self.bot.send_message(message.chat.id, USER_ADD_FAILED_MESSAGE.format(user_id=user_id))
+
+        await self.send_back_to_menu_message(message.chat.id, True)
+
+    async def import_users_handler(self, message):
+        if is_admin_user(message.from_user.id):
+            await self.bot.send_message(message.chat.id, IMPORT_PROMPT, parse_mode='Markdown')
+            await self.bot.set_state(message.from_user.id, ImportUsersStates.document, message.chat.id)
+        else:
+            await self.bot.send_message(message.chat.id, NO_PERMISSION_MESSAGE)
+
+    async def delete_user_handler(self, message):
+        if is_admin_user(message.from_user.id):
+            await self.bot.send_message(message.chat.id, DELETE_USER_PROMPT)
+            await self.bot.set_state(message.from_user.id, DeleteUserStates.user_id, message.chat.id)
+        else:
+            await self.bot.send_message(message.chat.id, NO_PERMISSION_MESSAGE)
+
+    async def process_user_deletion_input(self, message):
+        await self.bot.delete_state(message.from_user.id, message.chat.id)
+        user_id = parse_user_id(message.text)
+        if user_id is None:
+            await self.bot.send_message(message.chat.id, INVALID_USER_ID_MESSAGE)
+            return
+        try:
+            deleted = await self.delete_user_from_db(user_id)
+        except Exception as e:
+            logging.error(f"Ошибка при обработке удаления пользователя: {e}")
+            await self.bot.send_message(message.chat.id, USER_DELETE_ERROR_MESSAGE)
+            return
+        if deleted:
+            await self.bot.send_message(message.chat.id, USER_DELETED_MESSAGE.format(user_id=user_id))
+            logging.info(f"Администратор {message.from_user.id} удалил пользователя {user_id}.")
+        else:
+            await self.bot.send_message(message.chat.id, USER_DELETE_FAILED_MESSAGE.format(user_id=user_id))
+
+
+    async def broadcast_handler(self, message):
+        if not is_admin_user(message.from_user.id):
+            await self.bot.send_message(message.chat.id, NO_PERMISSION_MESSAGE)
+            return
+        active = self.broadcaster.active()
+        if active is not None:
+            await self.bot.send_message(message.chat.id, BROADCAST_ACTIVE_MESSAGE.format(broadcast_id=active.broadcast_id,
+                                                                                         summary=active.summary()))
+            return
+        await self.bot.send_message(message.chat.id, BROADCAST_PROMPT)
+        await self.bot.set_state(message.from_user.id, BroadcastStates.message, message.chat.id)
+
+    async def broadcast_stop_handler(self, message):
+        if not is_admin_user(message.from_user.id):
+            await self.bot.send_message(message.chat.id, NO_PERMISSION_MESSAGE)
+        elif self.broadcaster.cancel():
+            await self.bot.send_message(message.chat.id, BROADCAST_STOPPING_MESSAGE)
+        else:
+            await self.bot.send_message(message.chat.id, BROADCAST_NOT_ACTIVE_MESSAGE)
+
+
+    async def back_to_admin_menu_handler(self, message):
+        await self.send_back_to_menu_message(message.chat.id, is_admin_user(message.from_user.id))
+
+
+    async def ask_for_surname(self, message):
+        await self.bot.add_data(message.from_user.id, message.chat.id, surname=message.text)
+        await self.bot.set_state(message.from_user.id, RegistrationStates.name, message.chat.id)
+        await self.bot.send_message(message.chat.id, NAME_PROMPT)
+
+    async def ask_for_name(self, message):
+        await self.bot.add_data(message.from_user.id, message.chat.id, name=message.text)
+        await self.bot.set_state(message.from_user.id, RegistrationStates.address, message.chat.id)
+        await self.bot.send_message(message.chat.id, ADDRESS_PROMPT)
+
+    async def ask_for_address(self, message):
+        await self.bot.add_data(message.from_user.id, message.chat.id, address=message.text)
+        await self.bot.set_state(message.from_user.id, RegistrationStates.phone_number, message.chat.id)
+        await self.bot.send_message(message.chat.id, PHONE_NUMBER_PROMPT)
+
+    async def ask_for_phone_number(self, message):
+        user_id = message.from_user.id
+        phone_number = message.text
+        async with self.bot.retrieve_data(user_id, message.chat.id) as data:
+            surname, name, address = data.get("surname"), data.get("name"), data.get("address")
+        await self.bot.delete_state(user_id, message.chat.id)
+        if await self.is_user_registered(user_id):
+            await self.bot.send_message(message.chat.id, ALREADY_REGISTERED_MESSAGE)
+        elif await self.register_new_user(user_id, surname, name, address, phone_number):
+            await self.bot.send_message(message.chat.id, REGISTRATION_DONE_MESSAGE, parse_mode='Markdown')
+            await self.send_back_to_menu_message(message.chat.id, False)
+        else:
+            await self.bot.send_message(message.chat.id, REGISTRATION_FAILED_MESSAGE)
+
+
+    async def my_tickets_handler(self, message):
+        user_id = message.from_user.id
+        if not await self.is_user_registered(user_id):
+            await self.bot.send_message(message.chat.id, NOT_REGISTERED_MESSAGE)
+            return
+
+        summary = await self.fetch_user_tickets_summary(user_id)
+        if summary and summary[0]:
+            await self.bot.send_message(message.chat.id, format_tickets_summary(*summary), parse_mode='Markdown')
+            page_text, page_markup = await self.fetch_tickets_page(user_id)
+            if page_text:
+                await self.bot.send_message(message.chat.id, page_text, reply_markup=page_markup, parse_mode='Markdown')
+        else:
+            await self.bot.send_message(message.chat.id, NO_TICKETS_MESSAGE)
+        await self.send_back_to_menu_message(message.chat.id, is_admin_user(user_id))
+
+
+    async def get_tickets_handler(self, message):
+        if not await self.is_user_registered(message.from_user.id):
+            await self.bot.send_message(message.chat.id, NOT_REGISTERED_MESSAGE)
+            return
+        await self.bot.send_message(message.chat.id, SEND_RECEIPT_MESSAGE, parse_mode='Markdown')
+
+
+    async def results_handler(self, message):
+        await self.bot.send_message(message.chat.id, RESULTS_MESSAGE, parse_mode='HTML',
+                                    reply_markup=create_results_inline_menu())
+
+
+    async def callback_inline(self, call):
+        if call.message:
+            await self.bot.send_message(call.message.chat.id, DETAILED_RESULTS_MESSAGE, parse_mode='HTML')
+
+
+    async def tickets_page_callback(self, call):
+        page = parse_tickets_page_callback(call.data)
+        if page is None or call.message is None:
+            await self.bot.answer_callback_query(call.id)
+            return
+        page_text, page_markup = await self.fetch_tickets_page(call.from_user.id, *page)
+        if page_text is None:
+            await self.bot.answer_callback_query(call.id, TICKETS_PAGE_NOT_FOUND_MESSAGE)
+            return
+        await self.bot.edit_message_text(page_text, call.message.chat.id, call.message.message_id,
+                                         reply_markup=page_markup, parse_mode='Markdown')
+        await self.bot.answer_callback_query(call.id)
+
+
+    async def draw_command_handler(self, message):
+        if not is_admin_user(message.from_user.id):
+            await self.bot.send_message(message.chat.id, NO_PERMISSION_MESSAGE)
+            return
+        try:
+            winners_count, seed = parse_draw_command(message.text)
+        except CommandError as e:
+            await self.bot.send_message(message.chat.id, str(e), parse_mode='Markdown')
+            return
+        try:
+            draw_id = await self.run_winner_draw(winners_count, seed, message.from_user.id)
+            draw, winners = await self.fetch_draw(draw_id)
+        except DrawError as e:
+            await self.bot.send_message(message.chat.id, ERROR_MESSAGE.format(error=e))
+            return
+        except self.database.errors as e:
+            logging.error(f"Ошибка при проведении розыгрыша: {e}")
+            await self.bot.send_message(message.chat.id, DRAW_FAILED_MESSAGE)
+            return
+        await self.bot.send_message(message.chat.id, format_draw_results(draw, winners), parse_mode='Markdown')
+
+    async def draw_verify_command_handler(self, message):
+        if not is_admin_user(message.from_user.id):
+            await self.bot.send_message(message.chat.id, NO_PERMISSION_MESSAGE)
+            return
+        try:
+            draw_id = parse_draw_verify_command(message.text)
+        except CommandError as e:
+            await self.bot.send_message(message.chat.id, str(e), parse_mode='Markdown')
+            return
+        try:
+            draw, winners = await self.fetch_draw(draw_id)
+            if draw is None:
+                await self.bot.send_message(message.chat.id, DRAW_NOT_FOUND_MESSAGE.format(draw_id=draw_id))
+                return
+            verified = await self.verify_winner_draw(draw, winners)
+        except (DrawError,) + self.database.errors as e:
+            logging.error(f"Ошибка при проверке розыгрыша №{draw_id}: {e}")
+            await self.bot.send_message(message.chat.id, DRAW_VERIFY_FAILED_MESSAGE)
+            return
+        await self.bot.send_message(message.chat.id, format_draw_verification(draw_id, verified))
+
+
+    async def contest_stats_button_handler(self, message):
+        await self.send_contest_stats(message, LEADERBOARD_SIZE)
+
+    async def contest_stats_command_handler(self, message):
+        await self.send_contest_stats(message, parse_stats_command(message.text, LEADERBOARD_SIZE))
+
+    async def send_contest_stats(self, message, leaders_count):
+        if not is_admin_user(message.from_user.id):
+            await self.bot.send_message(message.chat.id, NO_PERMISSION_MESSAGE)
+            return
+        try:
+            totals, stats_days, leaders = await self.fetch_contest_stats(STATS_DAYS, leaders_count)
+        except self.database.errors as e:
+            logging.error(f"Ошибка при получении статистики конкурса: {e}")
+            await self.bot.send_message(message.chat.id, STATS_FAILED_MESSAGE)
+            return
+        await self.bot.send_message(message.chat.id, format_contest_stats(totals, stats_days, leaders), parse_mode='Markdown')
+
+
+    async def new_contest_command_handler(self, message):
+        if not is_admin_user(message.from_user.id):
+            await self.bot.send_message(message.chat.id, NO_PERMISSION_MESSAGE)
+            return
+        try:
+            title = parse_contest_command(message.text)
+        except CommandError as e:
+            await self.bot.send_message(message.chat.id, str(e), parse_mode='Markdown')
+            return
+        try:
+            contest_id = await self.start_contest(title, message.from_user.id)
+        except self.database.errors as e:
+            logging.error(f"Ошибка при запуске нового конкурса: {e}")
+            await self.bot.send_message(message.chat.id, CONTEST_START_FAILED_MESSAGE)
+            return
+        await self.bot.send_message(message.chat.id, CONTEST_STARTED_MESSAGE.format(contest_id=contest_id))
+
+
+    async def export_users_command_handler(self, message):
+        if is_admin_user(message.from_user.id):
+            await self.send_users_excel_report(message.chat.id, USERS_EXPORT_CAPTION)
+        else:
+            await self.bot.send_message(message.chat.id, NO_PERMISSION_MESSAGE)
+
+
+    async def db_stats_command_handler(self, message):
+        if is_admin_user(message.from_user.id):
+            stats_text = format_db_stats(self.database.pool_stats(), self.user_cache.stats(),
+                                         self.receipt_processor.admission.stats(), self.receipt_processor.rejections,
+                                         self.static_media.stats(), self.query_registry.stats())
+            await self.bot.send_message(message.chat.id, stats_text, parse_mode='Markdown')
+        else:
+            await self.bot.send_message(message.chat.id, NO_PERMISSION_MESSAGE)
+
+
+    async def download_receipt_file(self, file_id):
+        file_info = await self.bot.get_file(file_id)
+        return await self.bot.download_file(file_info.file_path)
+
+    async def on_receipt_parsed(self, job, receipt_data):
+        if receipt_details_complete(receipt_data):
+            tickets_received = await self.update_user_tickets_count(job.user_id, receipt_data)
+            if tickets_received > 0:
+                await self.bot.send_message(job.chat_id, TICKETS_RECEIVED_MESSAGE.format(tickets_count=tickets_received),
+                                            parse_mode='Markdown')
+        else:
+            await self.bot.send_message(job.chat_id, RECEIPT_UNREADABLE_MESSAGE, parse_mode='Markdown')
+        await self.send_back_to_menu_message(job.chat_id, is_admin_user(job.user_id))
+
+    async def send_receipt_rejection(self, chat_id, reason):
+        await self.bot.send_message(chat_id, format_receipt_rejection(reason, RECEIPT_MAX_BYTES, RECEIPT_MAX_FILE_PAGES),
+                                    parse_mode='Markdown')
+
+    async def on_receipt_failed(self, job, reason):
+        await self.send_receipt_rejection(job.chat_id, reason)
+        await self.send_back_to_menu_message(job.chat_id, is_admin_user(job.user_id))
+
+    async def handle_receipt_document(self, message):
+        if message.document.mime_type == 'application/pdf':
+            job = ReceiptJob(
+                chat_id=message.chat.id,
+                user_id=message.from_user.id,
+                file_id=message.document.file_id,
+                file_unique_id=message.document.file_unique_id,
+                file_size=message.document.file_size
+            )
+            try:
+                self.receipt_processor.submit(job)
+            except ReceiptRejected as rejected:
+                if not rejected.notify:
+                    return
+                await self.send_receipt_rejection(message.chat.id, rejected.reason)
+            else:
+                await self.bot.send_message(message.chat.id, RECEIPT_ACCEPTED_MESSAGE)
+                return
+        else:
+            await self.bot.send_message(message.chat.id, RECEIPT_NOT_PDF_MESSAGE, parse_mode='Markdown')
+        await self.send_back_to_menu_message(message.chat.id, is_admin_user(message.from_user.id))
+
+
+    def start_metrics(self):
+        if not (METRICS_ENABLED or PROFILER_ENABLED):
+            return None, None
+        if METRICS_ENABLED:
+            registry = self.bot_metrics.registry
+            self.query_registry.on_timing = self.bot_metrics.observe_query
+            instrument_handlers(self.telebot, self.bot_metrics)
+            instrument_telegram_api(self.bot_metrics, asynchronous=self.asynchronous)
+            registry.gauge("receipt_queue_depth", "Чеки, ожидающие обработки.", self.receipt_processor.queue_depth)
+            registry.gauge("receipt_in_flight", "Принятые чеки, обработка которых еще не завершена.",
+                           self.receipt_processor.admission.in_flight)
+            registry.gauge("db_pool_connections", "Соединения пула БД.",
+                           lambda: {(state,): self.database.pool_stats()[state] for state in ("in_use", "idle")}, ("state",))
+            # Пул asyncpg не считает ожидания свободного соединения.
+            if "waits" in self.database.pool_stats():
+                registry.gauge("db_pool_waits", "Сколько раз запрос ждал свободное соединение.",
+                               lambda: self.database.pool_stats()["waits"])
+            registry.gauge("user_cache_entries", "Пользователи в кэше.", lambda: self.user_cache.stats()["entries"])
+        profiler = SamplingProfiler(PROFILER_INTERVAL) if PROFILER_ENABLED else None
+        if profiler is not None:
+            profiler.start()
+        metrics_server = MetricsServer(METRICS_HOST, METRICS_PORT, self.bot_metrics.registry, profiler)
+        metrics_server.start()
+        return metrics_server, profiler
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import asyncpg
+from telebot import asyncio_filters, asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+
+from config import (
+    BOT_TOKEN, DB_HOST, DB_NAME, DB_PASSWORD, DB_POOL_MAX, DB_POOL_MIN, DB_POOL_TIMEOUT, DB_PREPARED_STATEMENTS,
+    DB_USER, RECEIPT_CACHE_SIZE, STATE_MAX_ENTRIES, STATE_STORAGE, STATE_TTL, TELEGRAM_API_URL,
+    USER_CACHE_NEGATIVE_TTL, USER_CACHE_NOTIFY, USER_CACHE_SIZE, USER_CACHE_TTL, WELCOME_IMAGE_PATH
+)
+from app import BotApp, SchemaMigrator
+from broadcast import AsyncBroadcaster
+from metrics import BotMetrics
+from media import StaticMediaRegistry
+from queries import create_query_registry
+from receipt_cache import AsyncReceiptFingerprintCache
+from receipts import AsyncReceiptProcessor
+from state_storage import AsyncPostgresStateStorage, AsyncTTLStateMemoryStorage
+from user_cache import AsyncUserCacheListener, RegisteredUserCache
+from user_import import IMPORT_COLUMNS
+
+db_conn_kwargs = {
+    "host": DB_HOST,
+    "database": DB_NAME,
+    "user": DB_USER,
+    "password": DB_PASSWORD,
+}
+
+
+class ConnectionSession:
+    def __init__(self, query_registry, conn):
+        self.query_registry = query_registry
+        self.conn = conn
+
+    async def execute(self, name, params=None):
+        statement = self.query_registry.statement(name)
+        with self.query_registry.timed(name):
+            await self.conn.execute(statement.asyncpg_sql, *statement.bind(params))
+
+    async def fetchrow(self, name, params=None):
+        statement = self.query_registry.statement(name)
+        with self.query_registry.timed(name):
+            return await self.conn.fetchrow(statement.asyncpg_sql, *statement.bind(params))
+
+    async def fetch(self, name, params=None):
+        statement = self.query_registry.statement(name)
+        with self.query_registry.timed(name):
+            return await self.conn.fetch(statement.asyncpg_sql, *statement.bind(params))
+
+    async def fetchval(self, name, params=None):
+        statement = self.query_registry.statement(name)
+        with self.query_registry.timed(name):
+            return await self.conn.fetchval(statement.asyncpg_sql, *statement.bind(params))
+
+    async def run_script(self, name):
+        await self.conn.execute(self.query_registry.script(name))
+
+    async def copy_import(self, import_id, records):
+        await self.conn.copy_records_to_table(
+            "users_import_staging",
+            records=((import_id,) + record for record in records),
+            columns=("import_id", "row_number") + IMPORT_COLUMNS
+        )
+
+    async def stream(self, name, fetch_size):
+        # Курсор asyncpg работает только внутри транзакции.
+        async for row in self.conn.cursor(self.query_registry.statement(name).asyncpg_sql, prefetch=fetch_size):
+            yield row
+
+    async def validate_queries(self):
+        failed = []
+        for statement in self.query_registry.statements():
+            try:
+                await self.conn.prepare(statement.asyncpg_sql)
+            except asyncpg.PostgresError as e:
+                logging.error(f"SQL запрос '{statement.name}' не прошел проверку: {e}")
+                failed.append(statement.name)
+        return failed
+
+
+class AsyncDatabase:
+    errors = (asyncpg.PostgresError, OSError, asyncio.TimeoutError)
+    undefined_table_error = asyncpg.UndefinedTableError
+
+    def __init__(self, db_pool, query_registry):
+        self.db_pool = db_pool
+        self.query_registry = query_registry
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self.db_pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+            yield ConnectionSession(self.query_registry, conn)
+
+    @asynccontextmanager
+    async def transaction(self, isolation=None):
+        async with self.connection() as db:
+            async with db.conn.transaction(isolation=isolation):
+                yield db
+
+    def pool_stats(self):
+        size, idle = self.db_pool.get_size(), self.db_pool.get_idle_size()
+        return {
+            "min": self.db_pool.get_min_size(),
+            "max": self.db_pool.get_max_size(),
+            "size": size,
+            "in_use": size - idle,
+            "idle": idle,
+        }
+
+
+class AsyncBotApp(BotApp):
+    api_errors = (asyncio_helper.ApiException,)
+    asynchronous = True
+    broadcaster_class = AsyncBroadcaster
+    receipt_processor_class = AsyncReceiptProcessor
+
+    def __init__(self, bot, database, user_cache, static_media, bot_metrics):
+        self._upload_lock = asyncio.Lock()
+        fingerprint_cache = AsyncReceiptFingerprintCache(lambda: database.db_pool, max_entries=RECEIPT_CACHE_SIZE)
+        super().__init__(database, bot, bot, database.query_registry, user_cache, static_media, bot_metrics,
+                         fingerprint_cache)
+
+    def upload_lock(self):
+        return self._upload_lock
+
+    async def to_thread(self, function, *args):
+        return await asyncio.to_thread(function, *args)
+
+    async def import_records(self, user_import):
+        # Проверка строк занимает процессор, поэтому список для COPY собирается вне цикла событий.
+        return await asyncio.to_thread(list, user_import.records())
+
+
+async def create_database():
+    db_pool = await asyncpg.create_pool(
+        min_size=DB_POOL_MIN,
+        max_size=DB_POOL_MAX,
+        statement_cache_size=100 if DB_PREPARED_STATEMENTS else 0,
+        **db_conn_kwargs
+    )
+    return AsyncDatabase(db_pool, create_query_registry(use_prepared=DB_PREPARED_STATEMENTS))
+
+def create_bot(database):
+    if STATE_STORAGE == "postgres":
+        state_storage = AsyncPostgresStateStorage(lambda: database.db_pool, ttl=STATE_TTL)
+    else:
+        state_storage = AsyncTTLStateMemoryStorage(ttl=STATE_TTL, max_entries=STATE_MAX_ENTRIES)
+    bot = AsyncTeleBot(BOT_TOKEN, state_storage=state_storage)
+    bot.add_custom_filter(asyncio_filters.StateFilter(bot))
+    return bot
+
+
+async def run_check():
+    try:
+        database = await create_database()
+    except AsyncDatabase.errors as e:
+        logging.error(f"Ошибка при подключении к базе данных: {e}")
+        return False
+    try:
+        return await SchemaMigrator(database, database.query_registry).check_readiness()
+    finally:
+        await database.db_pool.close()
+
+async def run():
+    if TELEGRAM_API_URL:
+        asyncio_helper.API_URL = TELEGRAM_API_URL + "/bot{0}/{1}"
+        asyncio_helper.FILE_URL = TELEGRAM_API_URL + "/file/bot{0}/{1}"
+
+    database = await create_database()
+    user_cache = RegisteredUserCache(ttl=USER_CACHE_TTL, negative_ttl=USER_CACHE_NEGATIVE_TTL, max_entries=USER_CACHE_SIZE)
+    static_media = StaticMediaRegistry()
+    static_media.register("welcome_image", WELCOME_IMAGE_PATH)
+    bot = create_bot(database)
+    app = AsyncBotApp(bot, database, user_cache, static_media, BotMetrics())
+    app.register_handlers()
+    user_cache_listener = AsyncUserCacheListener(user_cache, db_conn_kwargs) if USER_CACHE_NOTIFY else None
+    try:
+        await SchemaMigrator(database, database.query_registry).migrate()
+        await app.load_static_media()
+        if user_cache_listener is not None:
+            user_cache_listener.start()
+        app.receipt_processor.start()
+        await app.resume_broadcast()
+        metrics_server, profiler = app.start_metrics()
+        logging.info("Бот запущен (асинхронный режим).")
+        try:
+            await bot.infinity_polling()
+        finally:
+            await app.broadcaster.stop()
+            await app.receipt_processor.stop()
+            if user_cache_listener is not None:
+                await user_cache_listener.stop()
+            if metrics_server is not None:
+                metrics_server.stop()
+            if profiler is not None:
+                profiler.stop()
+    finally:
+        await database.db_pool.close()
+        await bot.close_session()
+
+def check():
+    return asyncio.run(run_check())
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+DELIVERY_SENT = "sent"
+DELIVERY_BLOCKED = "blocked"
+DELIVERY_FAILED = "failed"
+DELIVERY_RETRY = "retry"
+
+STATUS_RUNNING = "running"
+STATUS_FINISHED = "finished"
+STATUS_CANCELLED = "cancelled"
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        # Возвращает, сколько секунд нужно подождать до отправки; токен при этом уже занят.
+        with self._lock:
+            now = time.monotonic()
+            if now > self._updated:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+            self._tokens -= 1
+            return max(self._updated - now, 0.0) + max(-self._tokens, 0.0) / self.rate
+
+    def pause(self, seconds):
+        with self._lock:
+            self._updated = max(self._updated, time.monotonic() + seconds)
+            self._tokens = min(self._tokens, 0.0)
+
+
+class ChatRateLimiter:
+    def __init__(self, interval=1.0, max_chats=10000):
+        self.interval = interval
+        self.max_chats = max_chats
+        self._next_allowed = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, chat_id):
+        with self._lock:
+            now = time.monotonic()
+            if len(self._next_allowed) >= self.max_chats:
+                self._next_allowed = {chat: at for chat, at in self._next_allowed.items() if at > now}
+            send_at = max(self._next_allowed.get(chat_id, now), now)
+            self._next_allowed[chat_id] = send_at + self.interval
+            return send_at - now
+
+
+class BroadcastProgress:
+    def __init__(self, broadcast_id, admin_chat_id, source_message_id, last_user_id=0,
+                 sent_count=0, blocked_count=0, failed_count=0):
+        self.broadcast_id = broadcast_id
+        self.admin_chat_id = admin_chat_id
+        self.source_message_id = source_message_id
+        self.last_user_id = last_user_id
+        self.sent_count = sent_count
+        self.blocked_count = blocked_count
+        self.failed_count = failed_count
+        self.status = STATUS_RUNNING
+        self.started_at = time.monotonic()
+
+    def count(self, delivery):
+        if delivery == DELIVERY_SENT:
+            self.sent_count += 1
+        elif delivery == DELIVERY_BLOCKED:
+            self.blocked_count += 1
+        else:
+            self.failed_count += 1
+
+    def summary(self):
+        return (f"отправлено {self.sent_count}, заблокировали бота {self.blocked_count}, "
+                f"ошибок {self.failed_count}")
+
+    def status_text(self):
+        return "остановлена" if self.status == STATUS_CANCELLED else "завершена"
+
+    def params(self):
+        return {
+            "broadcast_id": self.broadcast_id,
+            "status": self.status,
+            "last_user_id": self.last_user_id,
+            "sent_count": self.sent_count,
+            "blocked_count": self.blocked_count,
+            "failed_count": self.failed_count,
+        }
+
+
+def classify_send_error(error):
+    # Синхронный и асинхронный клиенты telebot используют разные классы ApiTelegramException,
+    # поэтому ошибка распознается по коду ответа.
+    error_code = getattr(error, "error_code", None)
+    if error_code == 429:
+        parameters = (getattr(error, "result_json", None) or {}).get("parameters") or {}
+        return DELIVERY_RETRY, float(parameters.get("retry_after", 1))
+    if error_code == 403:
+        return DELIVERY_BLOCKED, None
+    if error_code == 400:
+        return DELIVERY_FAILED, None
+    return DELIVERY_RETRY, None
+
+
+class BroadcasterBase:
+    # Общая часть потокового и асинхронного рассыльщиков: политика повторов, учет доставок,
+    # контрольные точки и отчеты. Наследники отличаются только ожиданием и параллельной отправкой.
+    def __init__(self, send, fetch_recipients, save_progress, report, rate=25, per_chat_interval=1.0,
+                 workers=8, chunk_size=200, max_attempts=3, report_interval=60):
+        self.send = send
+        self.fetch_recipients = fetch_recipients
+        self.save_progress = save_progress
+        self.report = report
+        self.bucket = TokenBucket(rate)
+        self.chat_limiter = ChatRateLimiter(per_chat_interval)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.report_interval = report_interval
+        self._active = None
+        self._next_report = 0.0
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def active(self):
+        with self._lock:
+            return self._active
+
+    def cancel(self):
+        with self._lock:
+            if self._active is None:
+                return False
+        self._cancelled.set()
+        return True
+
+    def _claim(self, progress):
+        with self._lock:
+            if self._active is not None:
+                return False
+            self._active = progress
+            self._cancelled.clear()
+        self._next_report = time.monotonic() + self.report_interval
+        return True
+
+    def _release(self):
+        with self._lock:
+            self._active = None
+
+    def _send_delay(self, chat_id):
+        return max(self.bucket.reserve(), self.chat_limiter.reserve(chat_id))
+
+    def _after_send_error(self, progress, chat_id, error, failed_attempts):
+        # Возвращает (итог доставки, неудачных попыток, пауза перед повтором); итог None — отправить еще раз.
+        delivery, retry_after = classify_send_error(error)
+        if delivery != DELIVERY_RETRY:
+            return delivery, failed_attempts, 0
+        if retry_after is not None:
+            # 429 не считается неудачной попыткой: сообщение будет отправлено после паузы.
+            logging.warning(f"Telegram ограничил рассылку №{progress.broadcast_id}, пауза {retry_after} с.")
+            self.bucket.pause(retry_after)
+            return None, failed_attempts, 0
+        failed_attempts += 1
+        if failed_attempts >= self.max_attempts:
+            logging.error(f"Не удалось отправить рассылку №{progress.broadcast_id} пользователю {chat_id}: {error}")
+            return DELIVERY_FAILED, failed_attempts, 0
+        return None, failed_attempts, failed_attempts
+
+    def _record_chunk(self, progress, recipients, deliveries):
+        for delivery in deliveries:
+            progress.count(delivery)
+        progress.last_user_id = recipients[-1]
+
+    def _report_due(self):
+        if time.monotonic() < self._next_report:
+            return False
+        self._next_report = time.monotonic() + self.report_interval
+        return True
+
+    def _finish(self, progress):
+        progress.status = STATUS_CANCELLED if self._cancelled.is_set() else STATUS_FINISHED
+
+
+class Broadcaster(BroadcasterBase):
+    def start(self, progress):
+        if not self._claim(progress):
+            return False
+        thread = threading.Thread(target=self._run, args=(progress,), name=f"broadcast-{progress.broadcast_id}", daemon=True)
+        thread.start()
+        return True
+
+    def _deliver(self, progress, chat_id):
+        failed_attempts = 0
+        while True:
+            time.sleep(self._send_delay(chat_id))
+            try:
+                self.send(chat_id, progress)
+                return DELIVERY_SENT
+            except Exception as e:
+                delivery, failed_attempts, backoff = self._after_send_error(progress, chat_id, e, failed_attempts)
+                if delivery is not None:
+                    return delivery
+            time.sleep(backoff)
+
+    def _run(self, progress):
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="broadcast-send") as executor:
+                while not self._cancelled.is_set():
+                    recipients = self.fetch_recipients(progress.last_user_id, self.chunk_size)
+                    if not recipients:
+                        break
+                    self._record_chunk(progress, recipients,
+                                       executor.map(lambda chat_id: self._deliver(progress, chat_id), recipients))
+                    # Прогресс сохраняется после каждой порции: после перезапуска повторно
+                    # может быть отправлена не больше чем одна порция.
+                    self.save_progress(progress)
+                    if self._report_due():
+                        self.report(progress, False)
+            self._finish(progress)
+            self.save_progress(progress)
+            self.report(progress, True)
+        except Exception as e:
+            logging.error(f"Рассылка №{progress.broadcast_id} прервана: {e}")
+        finally:
+            self._release()
+
+
+class AsyncBroadcaster(BroadcasterBase):
+    def __init__(self, send, fetch_recipients, save_progress, report, **options):
+        super().__init__(send, fetch_recipients, save_progress, report, **options)
+        self._task = None
+
+    def start(self, progress):
+        if not self._claim(progress):
+            return False
+        self._task = asyncio.create_task(self._run(progress))
+        return True
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _deliver(self, progress, chat_id, slots):
+        async with slots:
+            failed_attempts = 0
+            while True:
+                await asyncio.sleep(self._send_delay(chat_id))
+                try:
+                    await self.send(chat_id, progress)
+                    return DELIVERY_SENT
+                except Exception as e:
+                    delivery, failed_attempts, backoff = self._after_send_error(progress, chat_id, e, failed_attempts)
+                    if delivery is not None:
+                        return delivery
+                await asyncio.sleep(backoff)
+
+    async def _run(self, progress):
+        slots = asyncio.Semaphore(self.workers)
+        try:
+            while not self._cancelled.is_set():
+                recipients = await self.fetch_recipients(progress.last_user_id, self.chunk_size)
+                if not recipients:
+                    break
+                self._record_chunk(progress, recipients,
+                                   await asyncio.gather(*(self._deliver(progress, chat_id, slots) for chat_id in recipients)))
+                await self.save_progress(progress)
+                if self._report_due():
+                    await self.report(progress, False)
+            self._finish(progress)
+            await self.save_progress(progress)
+            await self.report(progress, True)
+        except Exception as e:
+            logging.error(f"Рассылка №{progress.broadcast_id} прервана: {e}")
+        finally:
+            self._release()
@@ -0,0 +1,68 @@
+import re
+
+from config import ADMIN_USER_ID
+from draw import generate_seed
+from ui import (
+    CONTEST_USAGE_MESSAGE, DRAW_SEED_INVALID_MESSAGE, DRAW_USAGE_MESSAGE, DRAW_VERIFY_USAGE_MESSAGE
+)
+
+
+SKIP_COMMAND = "/skip"
+CANCEL_COMMAND = "/cancel"
+MAX_LEADERBOARD_SIZE = 50
+MAX_CONTEST_TITLE_LENGTH = 255
+
+
+class CommandError(Exception):
+    # Текст исключения отправляется администратору как есть (Markdown).
+    pass
+
+
+def is_admin_user(user_id):
+    return str(user_id) == ADMIN_USER_ID
+
+def parse_user_id(text):
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return None
+
+def optional_field(text):
+    return None if text == SKIP_COMMAND else text
+
+def command_args(text):
+    return text.split()[1:]
+
+def parse_number(arg):
+    # str.isdigit() пропускает и не-ASCII цифры вроде «²», на которых int() падает.
+    return int(arg) if arg.isascii() and arg.isdigit() else None
+
+def parse_draw_command(text):
+    args = command_args(text)
+    winners_count = parse_number(args[0]) if args else None
+    if winners_count is None:
+        raise CommandError(DRAW_USAGE_MESSAGE)
+    seed = args[1] if len(args) > 1 else generate_seed()
+    if not re.fullmatch(r"[\w.:-]{1,128}", seed):
+        raise CommandError(DRAW_SEED_INVALID_MESSAGE)
+    return winners_count, seed
+
+def parse_draw_verify_command(text):
+    args = command_args(text)
+    draw_id = parse_number(args[0]) if args else None
+    if draw_id is None:
+        raise CommandError(DRAW_VERIFY_USAGE_MESSAGE)
+    return draw_id
+
+def parse_stats_command(text, default_leaders_count):
+    args = command_args(text)
+    leaders_count = parse_number(args[0]) if args else None
+    if leaders_count is None:
+        leaders_count = default_leaders_count
+    return min(max(leaders_count, 1), MAX_LEADERBOARD_SIZE)
+
+def parse_contest_command(text):
+    title = text.partition(" ")[2].strip()
+    if not title or len(title) > MAX_CONTEST_TITLE_LENGTH:
+        raise CommandError(CONTEST_USAGE_MESSAGE)
+    return title
@@ -0,0 +1,94 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+DB_HOST = os.getenv("DB_HOST")
+DB_NAME = os.getenv("DB_NAME")
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+ADMIN_USER_ID = os.getenv("ADMIN_USER_ID", "YOUR_ADMIN_USER_ID")
+
+required_env_vars = ["DB_HOST", "DB_NAME", "DB_USER", "DB_PASSWORD", "ADMIN_USER_ID", "BOT_TOKEN"]
+missing_vars = [var for var in required_env_vars if not os.getenv(var)]
+if missing_vars:
+    raise ValueError(f"Отсутствуют обязательные переменные окружения: {', '.join(missing_vars)}")
+
+BOT_RUNTIME = os.getenv("BOT_RUNTIME", "threaded").lower()
+BOT_UPDATE_MODE = os.getenv("BOT_UPDATE_MODE", "polling").lower()
+# Адрес собственного Bot API (например, тестового сервера из load_test.py) вместо api.telegram.org.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "").rstrip("/")
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "50"))
+
+if BOT_UPDATE_MODE == "webhook":
+    if not WEBHOOK_SECRET_TOKEN:
+        raise ValueError("Для режима webhook необходимо задать WEBHOOK_SECRET_TOKEN")
+    if BOT_RUNTIME == "async":
+        raise ValueError("Режим webhook поддерживается только в многопоточном режиме (BOT_RUNTIME=threaded)")
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", "30"))
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "true").lower() in ("1", "true", "yes")
+
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+USER_CACHE_NEGATIVE_TTL = int(os.getenv("USER_CACHE_NEGATIVE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "100000"))
+USER_CACHE_NOTIFY = os.getenv("USER_CACHE_NOTIFY", "false").lower() in ("1", "true", "yes")
+
+STATE_STORAGE = os.getenv("STATE_STORAGE", "memory").lower()
+STATE_TTL = int(os.getenv("STATE_TTL", "3600"))
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", "100000"))
+
+RECEIPT_WORKERS = int(os.getenv("RECEIPT_WORKERS", "0")) or os.cpu_count() or 1
+RECEIPT_QUEUE_SIZE = int(os.getenv("RECEIPT_QUEUE_SIZE", "100"))
+RECEIPT_JOB_TIMEOUT = float(os.getenv("RECEIPT_JOB_TIMEOUT", "20"))
+RECEIPT_MAX_PAGES = int(os.getenv("RECEIPT_MAX_PAGES", "5"))
+RECEIPT_MAX_BYTES = int(os.getenv("RECEIPT_MAX_BYTES", str(5 * 1024 * 1024)))
+RECEIPT_CACHE_SIZE = int(os.getenv("RECEIPT_CACHE_SIZE", "10000"))
+RECEIPT_MAX_FILE_PAGES = int(os.getenv("RECEIPT_MAX_FILE_PAGES", "20"))
+RECEIPT_USER_RATE = float(os.getenv("RECEIPT_USER_RATE", "0.2"))
+RECEIPT_USER_BURST = int(os.getenv("RECEIPT_USER_BURST", "5"))
+RECEIPT_USER_IN_FLIGHT = int(os.getenv("RECEIPT_USER_IN_FLIGHT", "2"))
+RECEIPT_GLOBAL_RATE = float(os.getenv("RECEIPT_GLOBAL_RATE", "20"))
+RECEIPT_GLOBAL_BURST = int(os.getenv("RECEIPT_GLOBAL_BURST", "100"))
+
+# Telegram отдает ботам файлы размером до 20 МБ.
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(20 * 1024 * 1024)))
+
+OCR_ENABLED = os.getenv("OCR_ENABLED", "true").lower() in ("1", "true", "yes")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "1"))
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "1"))
+OCR_MAX_DPI = int(os.getenv("OCR_MAX_DPI", "200"))
+OCR_LANG = os.getenv("OCR_LANG", "rus+eng")
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "30"))
+
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+BROADCAST_PAID = os.getenv("BROADCAST_PAID", "false").lower() in ("1", "true", "yes")
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "8"))
+BROADCAST_CHUNK_SIZE = int(os.getenv("BROADCAST_CHUNK_SIZE", "200"))
+BROADCAST_REPORT_INTERVAL = float(os.getenv("BROADCAST_REPORT_INTERVAL", "60"))
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.01"))
+
+TICKET_PRICE = 7900
+TICKETS_PAGE_SIZE = int(os.getenv("TICKETS_PAGE_SIZE", "20"))
+STATS_DAYS = int(os.getenv("STATS_DAYS", "7"))
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "10"))
+
+WELCOME_IMAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images", "welcome_image.png")
@@ -0,0 +1,28 @@
+from telebot.handler_backends import State, StatesGroup
+
+
+class RegistrationStates(StatesGroup):
+    surname = State()
+    name = State()
+    address = State()
+    phone_number = State()
+
+
+class AddUserStates(StatesGroup):
+    user_id = State()
+    surname = State()
+    name = State()
+    address = State()
+    phone_number = State()
+
+
+class DeleteUserStates(StatesGroup):
+    user_id = State()
+
+
+class ImportUsersStates(StatesGroup):
+    document = State()
+
+
+class BroadcastStates(StatesGroup):
+    message = State()
@@ -7,9 +7,256 @@ CREATE TABLE IF NOT EXISTS users (
     number_of_tickets INTEGER DEFAULT 0
 );
 
+CREATE TABLE IF NOT EXISTS contests (
+    contest_id SERIAL PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Одновременно идет ровно один конкурс: новый завершает текущий (см. start_contest).
+CREATE UNIQUE INDEX IF NOT EXISTS contests_active_idx ON contests ((finished_at IS NULL)) WHERE finished_at IS NULL;
+
+INSERT INTO contests (title)
+SELECT 'Конкурс №1'
+WHERE NOT EXISTS (SELECT 1 FROM contests);
+
+CREATE OR REPLACE FUNCTION active_contest_id() RETURNS INTEGER AS $$
+    SELECT contest_id FROM contests WHERE finished_at IS NULL
+$$ LANGUAGE sql STABLE;
+
+-- До появления конкурсов tickets была обычной таблицей: она переименовывается
+-- и ниже подключается к секционированной tickets как секция первого конкурса.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE oid = to_regclass('tickets') AND relkind = 'r') THEN
+        ALTER TABLE tickets RENAME TO tickets_legacy;
+    END IF;
+END $$;
+
+CREATE SEQUENCE IF NOT EXISTS tickets_ticket_id_seq AS INTEGER;
+
+-- Номера билетов сквозные для всех конкурсов. У каждого конкурса своя секция: запросы текущего
+-- конкурса читают только ее, а секцию завершенного можно отсоединить (DETACH PARTITION) или удалить.
 CREATE TABLE IF NOT EXISTS tickets (
-    ticket_id SERIAL PRIMARY KEY,
+    ticket_id INTEGER NOT NULL DEFAULT nextval('tickets_ticket_id_seq'),
+    contest_id INTEGER NOT NULL REFERENCES contests(contest_id),
+    user_id BIGINT REFERENCES users(user_id),
+    bill_number VARCHAR(255),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT tickets_contest_pkey PRIMARY KEY (contest_id, ticket_id)
+) PARTITION BY LIST (contest_id);
+
+ALTER SEQUENCE tickets_ticket_id_seq OWNED BY tickets.ticket_id;
+
+DO $$
+DECLARE
+    first_contest_id INTEGER := (SELECT min(contest_id) FROM contests);
+BEGIN
+    IF to_regclass('tickets_legacy') IS NOT NULL THEN
+        ALTER TABLE tickets_legacy DROP CONSTRAINT IF EXISTS tickets_bill_number_key;
+        EXECUTE format('ALTER TABLE tickets_legacy ADD COLUMN contest_id INTEGER NOT NULL DEFAULT %s', first_contest_id);
+        ALTER TABLE tickets_legacy ALTER COLUMN contest_id DROP DEFAULT;
+        EXECUTE format('ALTER TABLE tickets ATTACH PARTITION tickets_legacy FOR VALUES IN (%s)', first_contest_id);
+        EXECUTE format('ALTER TABLE tickets_legacy RENAME TO %I', 'tickets_contest_' || first_contest_id);
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS tickets_contest_bill_number_idx ON tickets (bill_number);
+CREATE INDEX IF NOT EXISTS tickets_contest_user_id_ticket_id_idx ON tickets (user_id, ticket_id);
+
+CREATE OR REPLACE FUNCTION create_tickets_partition(p_contest_id INTEGER) RETURNS VOID AS $$
+DECLARE
+    partition_name TEXT := 'tickets_contest_' || p_contest_id;
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        -- ATTACH, в отличие от CREATE TABLE ... PARTITION OF, не блокирует выдачу билетов в другие секции.
+        EXECUTE format('CREATE TABLE %I (LIKE tickets INCLUDING DEFAULTS)', partition_name);
+        EXECUTE format('ALTER TABLE tickets ATTACH PARTITION %I FOR VALUES IN (%s)', partition_name, p_contest_id);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- DDL нельзя проверить через PREPARE, поэтому смена конкурса вызывается как функция.
+CREATE OR REPLACE FUNCTION start_contest(p_title VARCHAR) RETURNS INTEGER AS $$
+DECLARE
+    new_contest_id INTEGER;
+BEGIN
+    UPDATE contests SET finished_at = CURRENT_TIMESTAMP WHERE finished_at IS NULL;
+    INSERT INTO contests (title) VALUES (p_title) RETURNING contest_id INTO new_contest_id;
+    PERFORM create_tickets_partition(new_contest_id);
+    RETURN new_contest_id;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_tickets_partition(contest_id) FROM contests WHERE finished_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS contest_users (
+    contest_id INTEGER NOT NULL REFERENCES contests(contest_id),
+    user_id BIGINT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    tickets_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (contest_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS contest_users_leaderboard_idx ON contest_users (contest_id, tickets_count DESC, user_id);
+
+-- Билеты, выданные до появления конкурсов, засчитываются первому конкурсу.
+INSERT INTO contest_users (contest_id, user_id, tickets_count)
+SELECT (SELECT min(contest_id) FROM contests), user_id, number_of_tickets
+FROM users
+WHERE number_of_tickets > 0
+  AND NOT EXISTS (SELECT 1 FROM contest_users)
+ON CONFLICT (contest_id, user_id) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS receipts (
+    bill_number VARCHAR(255) PRIMARY KEY,
     user_id BIGINT REFERENCES users(user_id),
-    bill_number VARCHAR(255) UNIQUE,
+    amount BIGINT,
+    tickets_count INTEGER NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO receipts (bill_number, user_id, tickets_count, created_at)
+SELECT bill_number, min(user_id), count(*), min(created_at)
+FROM tickets
+WHERE bill_number IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM receipts)
+GROUP BY bill_number
+ON CONFLICT (bill_number) DO NOTHING;
+
+
+CREATE TABLE IF NOT EXISTS receipt_fingerprints (
+    sha256 CHAR(64) PRIMARY KEY,
+    file_unique_id VARCHAR(255),
+    amount VARCHAR(32),
+    bill_number VARCHAR(255),
+    receipt_date VARCHAR(32),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+
+CREATE INDEX IF NOT EXISTS receipt_fingerprints_file_unique_id_idx ON receipt_fingerprints (file_unique_id);
+
+
+CREATE TABLE IF NOT EXISTS conversation_states (
+    state_key VARCHAR(255) PRIMARY KEY,
+    state VARCHAR(64) NOT NULL,
+    data JSONB NOT NULL DEFAULT '{}'::jsonb,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS conversation_states_expires_at_idx ON conversation_states (expires_at);
+
+
+CREATE TABLE IF NOT EXISTS broadcasts (
+    broadcast_id SERIAL PRIMARY KEY,
+    admin_chat_id BIGINT NOT NULL,
+    source_message_id BIGINT NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'running',
+    last_user_id BIGINT NOT NULL DEFAULT 0,
+    sent_count INTEGER NOT NULL DEFAULT 0,
+    blocked_count INTEGER NOT NULL DEFAULT 0,
+    failed_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+
+CREATE TABLE IF NOT EXISTS draws (
+    draw_id SERIAL PRIMARY KEY,
+    seed VARCHAR(128) NOT NULL,
+    winners_count INTEGER NOT NULL,
+    min_ticket_id INTEGER NOT NULL,
+    max_ticket_id INTEGER NOT NULL,
+    candidates_checked INTEGER NOT NULL,
+    created_by BIGINT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE draws ADD COLUMN IF NOT EXISTS contest_id INTEGER REFERENCES contests(contest_id);
+UPDATE draws SET contest_id = (SELECT min(contest_id) FROM contests) WHERE contest_id IS NULL;
+
+CREATE TABLE IF NOT EXISTS draw_winners (
+    draw_id INTEGER NOT NULL REFERENCES draws(draw_id) ON DELETE CASCADE,
+    place INTEGER NOT NULL,
+    ticket_id INTEGER NOT NULL,
+    user_id BIGINT NOT NULL,
+    PRIMARY KEY (draw_id, place)
+);
+
+CREATE TABLE IF NOT EXISTS static_media (
+    name VARCHAR(64) PRIMARY KEY,
+    sha256 CHAR(64) NOT NULL,
+    file_id TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS user_imports (
+    import_id SERIAL PRIMARY KEY,
+    admin_id BIGINT NOT NULL,
+    file_name VARCHAR(255),
+    rows_count INTEGER NOT NULL DEFAULT 0,
+    inserted_count INTEGER NOT NULL DEFAULT 0,
+    updated_count INTEGER NOT NULL DEFAULT 0,
+    tickets_added INTEGER NOT NULL DEFAULT 0,
+    errors_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNLOGGED TABLE IF NOT EXISTS users_import_staging (
+    import_id INTEGER NOT NULL,
+    row_number INTEGER NOT NULL,
+    user_id BIGINT NOT NULL,
+    surname VARCHAR(255),
+    name VARCHAR(255),
+    address VARCHAR(255),
+    phone_number VARCHAR(20),
+    number_of_tickets INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS contest_daily_stats (
+    contest_id INTEGER NOT NULL REFERENCES contests(contest_id),
+    day DATE NOT NULL,
+    tickets_count BIGINT NOT NULL DEFAULT 0,
+    receipts_count BIGINT NOT NULL DEFAULT 0,
+    receipts_amount BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (contest_id, day)
+);
+
+-- Статистика, собранная до появления конкурсов, относится к первому конкурсу.
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_attribute
+        WHERE attrelid = to_regclass('contest_daily_stats') AND attname = 'contest_id' AND NOT attisdropped
+    ) THEN
+        EXECUTE format('ALTER TABLE contest_daily_stats ADD COLUMN contest_id INTEGER NOT NULL DEFAULT %s REFERENCES contests(contest_id)',
+                       (SELECT min(contest_id) FROM contests));
+        ALTER TABLE contest_daily_stats ALTER COLUMN contest_id DROP DEFAULT;
+        ALTER TABLE contest_daily_stats DROP CONSTRAINT contest_daily_stats_pkey;
+        ALTER TABLE contest_daily_stats ADD PRIMARY KEY (contest_id, day);
+    END IF;
+END $$;
+
+INSERT INTO contest_daily_stats (contest_id, day, tickets_count, receipts_count, receipts_amount)
+SELECT contest_id, day, sum(tickets_count), sum(receipts_count), sum(receipts_amount)
+FROM (
+    SELECT contest_id, created_at::date AS day, count(*) AS tickets_count, 0 AS receipts_count, 0 AS receipts_amount
+    FROM tickets
+    GROUP BY 1, 2
+    UNION ALL
+    SELECT (SELECT min(contest_id) FROM contests), created_at::date, 0, count(*), COALESCE(sum(amount), 0)
+    FROM receipts
+    GROUP BY 2
+) issued
+WHERE NOT EXISTS (SELECT 1 FROM contest_daily_stats)
+GROUP BY contest_id, day
+ON CONFLICT (contest_id, day) DO NOTHING;
+
+-- Рейтинг строится по contest_users, индекс по счетчику за все время больше не нужен.
+DROP INDEX IF EXISTS users_number_of_tickets_idx;
+
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    name VARCHAR(64) PRIMARY KEY,
+    checksum VARCHAR(64) NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
@@ -1 +1 @@
-SELECT user_id FROM users WHERE user_id = %s;
\ No newline at end of file
+SELECT user_id, surname, name, address, phone_number FROM users WHERE user_id = %s;
\ No newline at end of file
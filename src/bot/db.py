@@ -0,0 +1,199 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.pool
+from psycopg2 import extensions
+
+
+class PoolTimeout(psycopg2.pool.PoolError):
+    pass
+
+
+class PreparedConnection(extensions.connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+
+class ConnectionPool:
+    def __init__(self, minconn, maxconn, timeout=10.0, healthcheck_interval=30.0, **conn_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(f"Некорректные размеры пула: min={minconn}, max={maxconn}")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._conn_kwargs = conn_kwargs
+        self._idle = deque()
+        self._in_use = set()
+        self._opening = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._discarded = 0
+        self._created = 0
+
+    def _connect(self):
+        return psycopg2.connect(**self._conn_kwargs)
+
+    def warmup(self):
+        while True:
+            with self._cond:
+                if self._closed or len(self._idle) + len(self._in_use) + self._opening >= self.minconn:
+                    return
+                self._opening += 1
+            try:
+                conn = self._connect()
+            except psycopg2.Error:
+                with self._cond:
+                    self._opening -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._opening -= 1
+                self._created += 1
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _is_healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.healthcheck_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        self._discarded += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise psycopg2.pool.PoolError("Пул соединений закрыт")
+                    if self._idle:
+                        conn, idle_since = self._idle.pop()
+                        self._in_use.add(conn)
+                        break
+                    if len(self._in_use) + self._opening < self.maxconn:
+                        conn, idle_since = None, None
+                        self._opening += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"Не удалось получить соединение из пула за {self.timeout} с "
+                            f"(занято {len(self._in_use)} из {self.maxconn})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except BaseException:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._opening -= 1
+                    self._created += 1
+                    self._in_use.add(conn)
+            elif not self._is_healthy(conn, idle_since):
+                logging.warning("Обнаружено неработоспособное соединение в пуле, оно будет пересоздано.")
+                with self._cond:
+                    self._in_use.discard(conn)
+                    self._discard(conn)
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                self._checkouts += 1
+                wait_time = time.monotonic() - started
+                if waited:
+                    self._waits += 1
+                self._wait_time_total += wait_time
+                self._wait_time_max = max(self._wait_time_max, wait_time)
+            return conn
+
+    def putconn(self, conn, close=False):
+        if not close and not conn.closed and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                close = True
+        with self._cond:
+            self._in_use.discard(conn)
+            if close or conn.closed or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except psycopg2.OperationalError:
+            broken = True
+            raise
+        except BaseException:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            raise
+        finally:
+            self.putconn(conn, close=broken)
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "created": self._created,
+                "discarded": self._discarded,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "wait_time_total": round(self._wait_time_total, 6),
+                "wait_time_max": round(self._wait_time_max, 6),
+                "wait_time_avg": round(self._wait_time_total / self._checkouts, 6) if self._checkouts else 0.0,
+            }
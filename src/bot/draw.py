@@ -0,0 +1,71 @@
+import hashlib
+import secrets
+
+
+MAX_DRAW_WINNERS = 1000
+
+
+class DrawError(Exception):
+    pass
+
+
+def generate_seed():
+    return secrets.token_hex(16)
+
+
+def candidate_ticket_id(seed, index, min_ticket_id, max_ticket_id):
+    # Кандидат зависит только от зерна и номера попытки: любой участник может пересчитать
+    # последовательность sha256("<seed>:<index>") и проверить результат розыгрыша.
+    digest = hashlib.sha256(f"{seed}:{index}".encode("utf-8")).digest()
+    return min_ticket_id + int.from_bytes(digest, "big") % (max_ticket_id - min_ticket_id + 1)
+
+
+class DrawSampler:
+    def __init__(self, seed, winners_count, min_ticket_id, max_ticket_id, max_candidates=None):
+        if winners_count < 1 or winners_count > MAX_DRAW_WINNERS:
+            raise DrawError(f"Количество победителей должно быть от 1 до {MAX_DRAW_WINNERS}.")
+        self.seed = seed
+        self.winners_count = winners_count
+        self.min_ticket_id = min_ticket_id
+        self.max_ticket_id = max_ticket_id
+        self.max_candidates = max_candidates or 20 * (max_ticket_id - min_ticket_id + 1) + 1000
+        self.candidates_checked = 0
+        self.winners = []
+        self._chosen = set()
+
+    @property
+    def done(self):
+        return len(self.winners) >= self.winners_count
+
+    def next_batch(self):
+        if self.candidates_checked >= self.max_candidates:
+            raise DrawError("Не удалось выбрать победителей: слишком много пропусков в номерах билетов.")
+        remaining = self.winners_count - len(self.winners)
+        batch_size = min(max(remaining * 2, 64), self.max_candidates - self.candidates_checked)
+        return [
+            candidate_ticket_id(self.seed, self.candidates_checked + offset, self.min_ticket_id, self.max_ticket_id)
+            for offset in range(batch_size)
+        ]
+
+    def accept(self, batch, owners):
+        # owners — билеты из пакета, которые существуют в БД: {ticket_id: user_id}.
+        # Кандидаты просматриваются строго по порядку, поэтому результат не зависит от размера пакета.
+        for ticket_id in batch:
+            self.candidates_checked += 1
+            if ticket_id in owners and ticket_id not in self._chosen:
+                self._chosen.add(ticket_id)
+                self.winners.append((ticket_id, owners[ticket_id]))
+                if self.done:
+                    return
+
+
+def replay_sampler(draw):
+    # Сэмплер с параметрами сохраненного розыгрыша для его повторного расчета.
+    _, seed, winners_count, min_ticket_id, max_ticket_id, _, _, contest_id = draw
+    return DrawSampler(seed, winners_count, min_ticket_id, max_ticket_id), contest_id
+
+
+def replay_matches(draw, sampler, winners):
+    candidates_checked = draw[5]
+    recorded = [(ticket_id, user_id) for _, ticket_id, user_id, _, _ in winners]
+    return sampler.winners == recorded and sampler.candidates_checked == candidates_checked
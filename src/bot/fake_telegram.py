@@ -0,0 +1,213 @@
+import itertools
+import json
+import logging
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "LoadTestBot", "username": "load_test_bot"}
+
+
+class FakeApiError(Exception):
+    def __init__(self, error_code, description):
+        super().__init__(description)
+        self.error_code = error_code
+        self.description = description
+
+
+def parse_request_params(headers, query, body):
+    # telebot передает параметры в строке запроса, асинхронный клиент — в теле формы,
+    # файлы в обоих случаях приходят как multipart/form-data.
+    params = dict(parse_qsl(query))
+    files = {}
+    content_type = headers.get("Content-Type", "")
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body)
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename() is not None:
+                files[name] = part.get_payload(decode=True)
+            else:
+                params[name] = part.get_content()
+    elif content_type.startswith("application/json") and body:
+        params.update(json.loads(body))
+    elif body:
+        params.update(parse_qsl(body.decode("utf-8")))
+    return params, files
+
+
+class FakeTelegramServer:
+    def __init__(self, host="127.0.0.1", port=8081, on_bot_message=None):
+        self.on_bot_message = on_bot_message
+        self._updates = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._files = {}
+        self._file_paths = {}
+        self._file_ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self.requests = {}
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-telegram", daemon=True)
+        self._thread.start()
+        logging.info(f"Тестовый Bot API слушает {self.url}")
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def add_file(self, data, name="file"):
+        file_num = next(self._file_ids)
+        file_id = f"file{file_num}"
+        file_path = f"documents/{file_num}_{name}"
+        self._files[file_id] = {"data": data, "file_unique_id": f"unique{file_num}", "file_path": file_path}
+        self._file_paths[file_path] = file_id
+        return file_id, self._files[file_id]["file_unique_id"]
+
+    def push_update(self, **update):
+        with self._cond:
+            update["update_id"] = next(self._update_ids)
+            self._updates.append(update)
+            self._cond.notify_all()
+        return update["update_id"]
+
+    def push_message(self, user_id, text=None, document=None):
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+        }
+        if text is not None:
+            message["text"] = text
+            if text.startswith("/"):
+                message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        if document is not None:
+            message["document"] = document
+        return self.push_update(message=message)
+
+    def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        deadline = time.monotonic() + float(params.get("timeout") or 0)
+        with self._cond:
+            # Подтвержденные обновления (update_id < offset) удаляются, как в настоящем Bot API.
+            self._updates = [update for update in self._updates if update["update_id"] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            return self._updates[:limit]
+
+    def _bot_message(self, params, **content):
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(params["chat_id"]), "type": "private"},
+            "from": BOT_USER,
+        }
+        message.update(content)
+        if self.on_bot_message is not None:
+            self.on_bot_message(message["chat"]["id"], message)
+        return message
+
+    def _stored_file(self, name, params, files, default_name):
+        if name in files:
+            file_id, file_unique_id = self.add_file(files[name], default_name)
+            return file_id, file_unique_id, len(files[name])
+        file_id = params.get(name)
+        if file_id not in self._files:
+            raise FakeApiError(400, "Bad Request: wrong file identifier/HTTP URL specified")
+        stored = self._files[file_id]
+        return file_id, stored["file_unique_id"], len(stored["data"])
+
+    def call(self, method, params, files):
+        with self._cond:
+            self.requests[method] = self.requests.get(method, 0) + 1
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            return self._get_updates(params)
+        if method == "sendMessage":
+            return self._bot_message(params, text=params.get("text", ""))
+        if method == "editMessageText":
+            return self._bot_message(params, text=params.get("text", ""))
+        if method == "sendPhoto":
+            file_id, file_unique_id, size = self._stored_file("photo", params, files, "photo.png")
+            return self._bot_message(params, photo=[{"file_id": file_id, "file_unique_id": file_unique_id,
+                                                     "width": 800, "height": 600, "file_size": size}])
+        if method == "sendDocument":
+            file_id, file_unique_id, size = self._stored_file("document", params, files, "document")
+            return self._bot_message(params, document={"file_id": file_id, "file_unique_id": file_unique_id, "file_size": size})
+        if method == "getFile":
+            stored = self._files.get(params.get("file_id"))
+            if stored is None:
+                raise FakeApiError(400, "Bad Request: invalid file_id")
+            return {"file_id": params["file_id"], "file_unique_id": stored["file_unique_id"],
+                    "file_size": len(stored["data"]), "file_path": stored["file_path"]}
+        if method == "copyMessage":
+            return {"message_id": next(self._message_ids)}
+        # Остальные методы (answerCallbackQuery, deleteWebhook, setMyCommands...) просто подтверждаются.
+        return True
+
+    def file_data(self, file_path):
+        file_id = self._file_paths.get(file_path)
+        return self._files[file_id]["data"] if file_id is not None else None
+
+    def _make_handler(self):
+        fake_server = self
+
+        class FakeTelegramRequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, body, content_type="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                url = urlsplit(self.path)
+                parts = url.path.strip("/").split("/")
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if len(parts) >= 3 and parts[0] == "file" and parts[1].startswith("bot"):
+                    data = fake_server.file_data("/".join(parts[2:]))
+                    if data is None:
+                        self._reply(404, b"", "application/octet-stream")
+                    else:
+                        self._reply(200, data, "application/octet-stream")
+                    return
+                if len(parts) != 2 or not parts[0].startswith("bot"):
+                    self._reply(404, b'{"ok": false, "error_code": 404, "description": "Not Found"}')
+                    return
+                try:
+                    params, files = parse_request_params(self.headers, url.query, body)
+                    response = {"ok": True, "result": fake_server.call(parts[1], params, files)}
+                    status = 200
+                except FakeApiError as e:
+                    response = {"ok": False, "error_code": e.error_code, "description": e.description}
+                    status = e.error_code
+                self._reply(status, json.dumps(response, ensure_ascii=False).encode("utf-8"))
+
+            do_GET = _handle
+            do_POST = _handle
+
+        return FakeTelegramRequestHandler
@@ -0,0 +1,271 @@
+import argparse
+import logging
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import psycopg2
+
+from fake_telegram import FakeTelegramServer
+
+
+BOT_TOKEN = "123456:load-test"
+PG_STAT_COLUMNS = ("xact_commit", "xact_rollback", "tup_returned", "tup_fetched", "tup_inserted", "tup_updated",
+                   "tup_deleted", "blks_read", "blks_hit")
+MENU_MARKER = "Возврат в главное меню"
+
+
+def build_receipt_pdf(*pages):
+    # Минимальный PDF с текстовым слоем: символы кодируются одним байтом, а таблица
+    # ToUnicode позволяет PyPDF2 восстановить кириллицу и «₸» без встраивания шрифта.
+    # Каждый аргумент — строки одной страницы.
+    codes = {char: index + 1 for index, char in enumerate(sorted(set("".join(line for lines in pages for line in lines))))}
+    mappings = sorted(codes.items(), key=lambda item: item[1])
+    bfchar = "".join(
+        f"{len(chunk)} beginbfchar\n" + "".join(f"<{code:02X}> <{ord(char):04X}>\n" for char, code in chunk) + "endbfchar\n"
+        for chunk in (mappings[start:start + 100] for start in range(0, len(mappings), 100))
+    )
+    cmap = ("/CIDInit /ProcSet findresource begin 12 dict begin begincmap\n"
+            "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+            "/CMapName /Adobe-Identity-UCS def /CMapType 2 def\n"
+            "1 begincodespacerange <00> <FF> endcodespacerange\n"
+            f"{bfchar}endcmap CMapName currentdict /CMap defineresource pop end end").encode("ascii")
+    # Объекты 1-3 — каталог, шрифт и ToUnicode, далее по паре «страница, содержимое» на каждую страницу.
+    page_refs = [3 + 2 * index + 1 for index in range(len(pages))]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % ref for ref in page_refs), len(pages)),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /ToUnicode %d 0 R >>" % (page_refs[-1] + 2),
+    ]
+    for ref, lines in zip(page_refs, pages):
+        text_ops = " ".join(f"<{''.join(f'{codes[char]:02X}' for char in line)}> Tj T*" for line in lines)
+        content = f"BT /F1 10 Tf 14 TL 40 800 Td {text_ops} ET".encode("ascii")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+                       b"/Contents %d 0 R >>" % (ref + 1))
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+    objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(cmap), cmap))
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(pdf)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+class VirtualUser:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.step = 0
+        self.step_started = None
+        self.errors = 0
+        self.done = False
+        self.failed = False
+
+
+class RegistrationScenario:
+    # Каждый шаг: (название, сообщение пользователя, текст ответа бота, которым шаг завершается).
+    STEPS = (
+        ("start", "/start", "фамилию"),
+        ("surname", "Тестов", "*имя*"),
+        ("name", "Тест", "*адрес*"),
+        ("address", "Алматы, ул. Абая 1", "номер телефона"),
+        ("phone", "87771234567", MENU_MARKER),
+        ("receipt", None, MENU_MARKER),
+        ("tickets", "🎫 Мои билеты", MENU_MARKER),
+    )
+
+    def __init__(self, server, users, first_user_id, rate, step_timeout):
+        self.server = server
+        self.rate = rate
+        self.step_timeout = step_timeout
+        self.users = {user_id: VirtualUser(user_id) for user_id in range(first_user_id, first_user_id + users)}
+        self.latencies = {name: [] for name, _, _ in self.STEPS}
+        self.finished = threading.Event()
+        self.started_at = None
+        self.finished_at = None
+        self._completed = 0
+        self._lock = threading.Lock()
+
+    def _receipt_document(self, user):
+        amount = 7900 * (1 + user.user_id % 5)
+        pdf = build_receipt_pdf([
+            "Kaspi.kz",
+            "Платеж успешно совершен",
+            f"Итого {amount:,} ₸".replace(",", " "),
+            f"№ чека LT{user.user_id % 10 ** 10:010d}",
+            "15.03.2025 12:30",
+        ])
+        file_id, file_unique_id = self.server.add_file(pdf, f"receipt_{user.user_id}.pdf")
+        return {"file_id": file_id, "file_unique_id": file_unique_id, "file_name": "receipt.pdf",
+                "mime_type": "application/pdf", "file_size": len(pdf)}
+
+    def _send_step(self, user):
+        _, text, _ = self.STEPS[user.step]
+        user.step_started = time.perf_counter()
+        if text is None:
+            self.server.push_message(user.user_id, document=self._receipt_document(user))
+        else:
+            self.server.push_message(user.user_id, text=text)
+
+    def _finish_user(self, user, failed=False):
+        user.done = True
+        user.failed = failed
+        self._completed += 1
+        if self._completed == len(self.users):
+            self.finished_at = time.perf_counter()
+            self.finished.set()
+
+    def on_bot_message(self, chat_id, message):
+        user = self.users.get(chat_id)
+        if user is None:
+            return
+        text = message.get("text") or ""
+        with self._lock:
+            if user.done or user.step_started is None:
+                return
+            if "❌" in text:
+                user.errors += 1
+            name, _, marker = self.STEPS[user.step]
+            if marker not in text:
+                return
+            self.latencies[name].append(time.perf_counter() - user.step_started)
+            user.step += 1
+            if user.step == len(self.STEPS):
+                self._finish_user(user)
+                return
+            self._send_step(user)
+
+    def _check_timeouts(self):
+        while not self.finished.wait(1.0):
+            now = time.perf_counter()
+            with self._lock:
+                for user in self.users.values():
+                    if not user.done and user.step_started is not None and now - user.step_started > self.step_timeout:
+                        logging.warning(f"Пользователь {user.user_id} не получил ответ на шаге {self.STEPS[user.step][0]}.")
+                        self._finish_user(user, failed=True)
+
+    def run(self, timeout):
+        self.started_at = time.perf_counter()
+        threading.Thread(target=self._check_timeouts, name="load-test-timeouts", daemon=True).start()
+        for user in self.users.values():
+            with self._lock:
+                self._send_step(user)
+            time.sleep(1 / self.rate)
+        if not self.finished.wait(timeout):
+            logging.warning("Нагрузочный тест остановлен по общему таймауту.")
+            self.finished_at = time.perf_counter()
+
+    def report(self):
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        completed = sum(1 for user in self.users.values() if user.done and not user.failed)
+        failed = sum(1 for user in self.users.values() if user.failed)
+        with_errors = sum(1 for user in self.users.values() if user.errors)
+        steps = sum(len(values) for values in self.latencies.values())
+        lines = [
+            f"Пользователей: {len(self.users)}, прошли сценарий: {completed}, не дождались ответа: {failed}, "
+            f"получили сообщение об ошибке: {with_errors}",
+            f"Длительность: {elapsed:.1f} с, шагов в секунду: {steps / elapsed:.1f}, сценариев в секунду: {completed / elapsed:.2f}",
+            f"{'шаг':10} {'ответов':>8} {'p50, мс':>9} {'p99, мс':>9} {'max, мс':>9}",
+        ]
+        all_latencies = []
+        for name, _, _ in self.STEPS:
+            values = self.latencies[name]
+            all_latencies.extend(values)
+            lines.append(f"{name:10} {len(values):8} {percentile(values, 0.5) * 1000:9.1f} "
+                         f"{percentile(values, 0.99) * 1000:9.1f} {max(values, default=0) * 1000:9.1f}")
+        lines.append(f"{'всего':10} {len(all_latencies):8} {percentile(all_latencies, 0.5) * 1000:9.1f} "
+                     f"{percentile(all_latencies, 0.99) * 1000:9.1f} {max(all_latencies, default=0) * 1000:9.1f}")
+        return "\n".join(lines)
+
+
+def db_connect_kwargs():
+    return {"host": os.getenv("DB_HOST"), "database": os.getenv("DB_NAME"),
+            "user": os.getenv("DB_USER"), "password": os.getenv("DB_PASSWORD")}
+
+def read_pg_stats():
+    try:
+        with psycopg2.connect(**db_connect_kwargs()) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT {', '.join(PG_STAT_COLUMNS)} FROM pg_stat_database WHERE datname = current_database()")
+                return dict(zip(PG_STAT_COLUMNS, cursor.fetchone()))
+    except psycopg2.Error as e:
+        logging.error(f"Не удалось прочитать статистику базы данных: {e}")
+        return None
+
+
+def spawn_bot(api_url, log_path, runtime):
+    env = dict(os.environ, BOT_TOKEN=BOT_TOKEN, TELEGRAM_API_URL=api_url, BOT_RUNTIME=runtime,
+               BOT_UPDATE_MODE="polling", ADMIN_USER_ID=os.getenv("ADMIN_USER_ID", "1"))
+    repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    log_file = open(log_path, "w", encoding="utf-8")
+    process = subprocess.Popen([sys.executable, os.path.join("src", "bot", "main.py")], cwd=repo_root, env=env,
+                               stdout=log_file, stderr=subprocess.STDOUT)
+    return process, log_file
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Нагрузочный тест бота на тестовом Bot API: "
+                                                     "/start → регистрация → чек → «Мои билеты».")
+    arg_parser.add_argument("--users", type=int, default=1000, help="сколько пользователей проходят сценарий")
+    arg_parser.add_argument("--rate", type=float, default=50, help="сколько новых пользователей в секунду")
+    arg_parser.add_argument("--first-user-id", type=int, default=None,
+                            help="user_id первого пользователя (по умолчанию зависит от времени запуска)")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8081, help="порт тестового Bot API")
+    arg_parser.add_argument("--step-timeout", type=float, default=60, help="сколько секунд ждать ответа на шаг")
+    arg_parser.add_argument("--timeout", type=float, default=1800, help="общее ограничение времени теста")
+    arg_parser.add_argument("--spawn-bot", action="store_true",
+                            help="запустить main.py с TELEGRAM_API_URL тестового сервера (DB_* берутся из окружения)")
+    arg_parser.add_argument("--runtime", choices=("threaded", "async"), default="threaded", help="BOT_RUNTIME для --spawn-bot")
+    arg_parser.add_argument("--bot-log", default="load_test_bot.log", help="куда писать вывод запущенного бота")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Новые user_id при каждом запуске: уже зарегистрированные пользователи прошли бы сценарий иначе.
+    first_user_id = args.first_user_id or int(time.time()) * 10000
+
+    server = FakeTelegramServer(args.host, args.port)
+    scenario = RegistrationScenario(server, args.users, first_user_id, args.rate, args.step_timeout)
+    server.on_bot_message = scenario.on_bot_message
+    server.start()
+
+    bot_process = log_file = None
+    if args.spawn_bot:
+        bot_process, log_file = spawn_bot(server.url, args.bot_log, args.runtime)
+        logging.info(f"Бот запущен (pid {bot_process.pid}), вывод: {args.bot_log}")
+    else:
+        logging.info(f"Запустите бота с TELEGRAM_API_URL={server.url} и BOT_TOKEN={BOT_TOKEN}")
+
+    pg_before = read_pg_stats() if os.getenv("DB_NAME") else None
+    try:
+        scenario.run(args.timeout)
+    finally:
+        pg_after = read_pg_stats() if pg_before is not None else None
+        if bot_process is not None:
+            bot_process.terminate()
+            bot_process.wait(timeout=30)
+            log_file.close()
+        server.stop()
+
+    print(scenario.report())
+    print("Запросы к Bot API: " + ", ".join(f"{method} {count}" for method, count in sorted(server.requests.items())))
+    if pg_before is not None and pg_after is not None:
+        print("Нагрузка на БД: " + ", ".join(f"{column} +{pg_after[column] - pg_before[column]}" for column in PG_STAT_COLUMNS))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,598 +1,18 @@
-import telebot
-from telebot.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
-import psycopg2
-from dotenv import load_dotenv
-import os
-import openpyxl
-import re
-import PyPDF2
-from io import BytesIO
 import logging
+import sys
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-load_dotenv()
-
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-DB_HOST = os.getenv("DB_HOST")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-ADMIN_USER_ID = os.getenv("ADMIN_USER_ID", "YOUR_ADMIN_USER_ID")
-
-required_env_vars = ["DB_HOST", "DB_NAME", "DB_USER", "DB_PASSWORD", "ADMIN_USER_ID", "BOT_TOKEN"]
-missing_vars = [var for var in required_env_vars if not os.getenv(var)]
-if missing_vars:
-    raise ValueError(f"Отсутствуют обязательные переменные окружения: {', '.join(missing_vars)}")
-
-bot = telebot.TeleBot(BOT_TOKEN)
-
-
-def get_database_connection():
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        return conn
-    except psycopg2.Error as e:
-        logging.error(f"Ошибка подключения к базе данных: {e}")
-        return None
-
-def execute_sql_from_file(filename):
-    file_path = os.path.join("src", "bot", "database", filename)
-    try:
-        with open(file_path, 'r', encoding="utf-8") as file:
-            return file.read()
-    except FileNotFoundError:
-        error_message = f"SQL файл '{file_path}' не найден."
-        logging.error(error_message)
-        raise FileNotFoundError(error_message)
-
-def create_user_table_if_not_exists():
-    conn = get_database_connection()
-    if conn:
-        try:
-            create_table_query = execute_sql_from_file("create_table.sql")
-            cursor = conn.cursor()
-            cursor.execute(create_table_query)
-            conn.commit()
-            cursor.close()
-            conn.close()
-            logging.info("Таблица пользователей успешно создана (или уже существовала).")
-        except psycopg2.Error as e:
-            logging.error(f"Ошибка при создании таблицы пользователей: {e}")
-
-def register_new_user(user_id, surname, name, address, phone_number):
-    conn = get_database_connection()
-    if conn:
-        try:
-            insert_query = execute_sql_from_file("insert.sql") 
-            cursor = conn.cursor()
-            cursor.execute(insert_query, (user_id, surname, name, address, phone_number, 0))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            logging.info(f"Пользователь {user_id} успешно зарегистрирован.")
-            return True
-        except psycopg2.Error as e:
-            logging.error(f"Ошибка при регистрации пользователя {user_id}: {e}")
-            return False
-    return False
-
-def is_user_registered(user_id):
-    conn = get_database_connection()
-    if conn:
-        try:
-            select_query = execute_sql_from_file("select.sql")
-            cursor = conn.cursor()
-            cursor.execute(select_query, (user_id,))
-            user = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            return user is not None
-        except psycopg2.Error as e:
-            logging.error(f"Ошибка при проверке регистрации пользователя {user_id}: {e}")
-    return False
-
-def fetch_all_users():
-    conn = get_database_connection()
-    if conn:
-        try:
-            select_query = "SELECT * FROM users"
-            cursor = conn.cursor()
-            cursor.execute(select_query)
-            users = cursor.fetchall()
-            cursor.close()
-            conn.close()
-            return users
-        except psycopg2.Error as e:
-            logging.error(f"Ошибка при получении списка всех пользователей: {e}")
-            return []
-    return []
-
-def fetch_user_tickets(user_id):
-    conn = get_database_connection()
-    if conn:
-        try:
-            query = """
-                SELECT
-                    t.ticket_id,
-                    t.created_at,
-                    u.surname,
-                    u.name
-                FROM tickets t
-                JOIN users u ON t.user_id = u.user_id
-                WHERE t.user_id = %s
-                ORDER BY t.ticket_id
-            """
-            cursor = conn.cursor()
-            cursor.execute(query, (user_id,))
-            tickets = cursor.fetchall()
-            return tickets
-        except psycopg2.Error as e:
-            logging.error(f"Ошибка при получении билетов пользователя {user_id}: {e}")
-            return []
-        finally:
-            if conn:
-                cursor.close()
-                conn.close()
-    return []
-
-def update_user_tickets_count(user_id, bill_amount, bill_number):
-    conn = get_database_connection()
-    if conn:
-        try:
-            tickets_count = bill_amount // 7900
-            cursor = conn.cursor()
-
-            check_ticket_query = "SELECT 1 FROM tickets WHERE user_id = %s AND bill_number = %s"
-            cursor.execute(check_ticket_query, (user_id, bill_number))
-            existing_ticket = cursor.fetchone()
-            if existing_ticket:
-                bot.send_message(user_id, "⚠️ Вы уже добавили этот чек. ⚠️")
-                return 0
-
-            insert_ticket_query = "INSERT INTO tickets (user_id, bill_number) VALUES (%s, %s)"
-            for _ in range(tickets_count):
-                cursor.execute(insert_ticket_query, (user_id, bill_number))
-
-            update_user_query = """
-                UPDATE users
-                SET number_of_tickets = number_of_tickets + %s
-                WHERE user_id = %s
-            """
-            cursor.execute(update_user_query, (tickets_count, user_id))
-            conn.commit()
-            return tickets_count
-
-        except psycopg2.IntegrityError as unique_error:
-            logging.error(f"Ошибка уникальности при добавлении билетов: {unique_error}")
-            bot.send_message(user_id, "🚫 Этот чек уже был использован другим пользователем. 🚫")
-            return 0
-        except psycopg2.Error as e:
-            logging.error(f"Ошибка при обновлении билетов пользователя {user_id}: {e}")
-            bot.send_message(user_id, "❌ Произошла ошибка при обработке чека. Пожалуйста, попробуйте позже. ❌")
-            return 0
-        finally:
-            if conn:
-                cursor.close()
-                conn.close()
-    return 0
-
-def delete_user_from_db(user_id):
-    conn = get_database_connection()
-    if conn:
-        try:
-            delete_query = execute_sql_from_file("delete_user.sql")
-            cursor = conn.cursor()
-            cursor.execute(delete_query, (user_id,))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            logging.info(f"Пользователь {user_id} успешно удален из базы данных.")
-            return True
-        except psycopg2.Error as e:
-            logging.error(f"Ошибка при удалении пользователя {user_id} из базы данных: {e}")
-            return False
-    return False
-
-def admin_add_new_user_to_db(user_id, surname=None, name=None, address=None, phone_number=None, number_of_tickets=0):
-    conn = get_database_connection()
-    if conn:
-        try:
-            insert_query = execute_sql_from_file("admin_insert_user.sql")
-            cursor = conn.cursor()
-            cursor.execute(insert_query, (user_id, surname, name, address, phone_number, number_of_tickets))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            logging.info(f"Администратор добавил пользователя {user_id} в базу данных.")
-            return True
-        except psycopg2.Error as e:
-            logging.error(f"Ошибка при добавлении пользователя {user_id} через администратора: {e}")
-            return False
-    return False
-
-
-def create_main_menu():
-    menu = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=False) 
-    menu.add(KeyboardButton("🎫 Мои билеты"), KeyboardButton("🎟️ Получить билеты"), KeyboardButton("🏆 Результаты"))
-    return menu
-
-def create_admin_menu():
-    menu = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=False)
-    menu.add(KeyboardButton("🎫 Мои билеты"), KeyboardButton("🎟️ Получить билеты"), KeyboardButton("🏆 Результаты"))
-    menu.add(KeyboardButton("📊 Экспорт данных"), KeyboardButton("⚙️ Управление пользователями"))
-    return menu
-
-def create_admin_management_menu():
-    management_menu = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-    management_menu.add(KeyboardButton("➕ Добавить пользователя"), KeyboardButton("➖ Удалить пользователя"))
-    management_menu.add(KeyboardButton("⬅️ Назад"))
-    return management_menu
-
-def send_main_menu(chat_id, is_admin):
-    if is_admin:
-        reply_markup = create_admin_menu()
-    else:
-        reply_markup = create_main_menu()
-    bot.send_message(chat_id, "✨ *Выберите действие:* ✨", reply_markup=reply_markup, parse_mode='Markdown')
-
-def send_back_to_menu_message(chat_id, is_admin):
-    if is_admin:
-        reply_markup = create_admin_menu()
-    else:
-        reply_markup = create_main_menu()
-    bot.send_message(chat_id, "⬅️ *Возврат в главное меню:* ⬅️", reply_markup=reply_markup, parse_mode='Markdown')
-
-
-def generate_users_excel_report(users):
-    workbook = openpyxl.Workbook()
-    worksheet = workbook.active
-    worksheet.title = "Users and Tickets"
-
-    headers = ["User ID", "Фамилия", "Имя", "Адрес", "Номер телефона", "Количество билетов", "ID билета", "Дата билета"]
-    worksheet.append(headers)
-
-    for user in users:
-        user_id = user[0]
-        user_data = list(user[:6])
-        tickets = fetch_user_tickets(user_id)
-
-        if tickets:
-            for ticket in tickets:
-                ticket_data = [ticket[0], ticket[1].strftime('%d.%m.%Y %H:%M')]
-                worksheet.append(user_data + ticket_data)
-        else:
-            worksheet.append(user_data + ["Нет билетов", "N/A"])
-
-    byte_stream = BytesIO()
-    workbook.save(byte_stream)
-    byte_stream.seek(0)
-    byte_stream.name = "user_tickets_data.xlsx"
-    return byte_stream
-
-
-def read_file_content(filename):
-    try:
-        with open(filename, 'r', encoding="utf-8") as file:
-            return file.read()
-    except FileNotFoundError:
-        error_message = f"Файл '{filename}' не найден."
-        logging.error(error_message)
-        raise FileNotFoundError(error_message)
-
-
-def extract_text_from_pdf_file(pdf_file):
-    pdf_reader = PyPDF2.PdfReader(pdf_file)
-    text = ""
-    for page_num in range(len(pdf_reader.pages)):
-        page = pdf_reader.pages[page_num]
-        text += page.extract_text()
-    return text
-
-def extract_receipt_details(text):
-    amount_pattern = r"(\d{1,3}(?: \d{3})*|\d+) ?₸"
-    date_pattern = r"(\d{2}\.\d{2}\.\d{4} \d{2}:\d{2})"
-    name_pattern = r"([А-Яа-я]+\s[А-Яа-я]+\.)"
-    number_pattern = r"№ чека ([A-Z]{2}\d{10})"
-
-    amount_match = re.search(amount_pattern, text)
-    date_match = re.search(date_pattern, text)
-    name_match = re.search(name_pattern, text)
-    number_match = re.search(number_pattern, text)
-
-    return {
-        "amount": amount_match.group(1).replace(" ", "") if amount_match else None,
-        "date": date_match.group(1) if date_match else None,
-        "name": name_match.group(1) if name_match else None,
-        "number": number_match.group(1) if number_match else None,
-    }
-
-
-@bot.message_handler(commands=['start'])
-def start_command_handler(message):
-    user_id = message.from_user.id
-    is_admin = str(user_id) == ADMIN_USER_ID
-
-    image_path = os.path.join("src", "bot", "images", "welcome_image.png")
-    try:
-        with open(image_path, 'rb') as photo:
-            bot.send_photo(message.chat.id, photo)
-    except FileNotFoundError:
-        logging.error(f"Файл изображения не найден: {image_path}")
-        bot.send_message(message.chat.id, "Не удалось загрузить приветственное изображение.")
-
-
-    welcome_message = (
-        "🎉 *Добро пожаловать в Конкурс Бот!* 🎉\n\n"
-        "Приветствую! 👋 Я помогу вам получить билеты для участия в захватывающих конкурсах. 🚀\n\n"
-        "💰 *Стоимость билета:* 7900 ТГ за участие\n"
-        "📜 *Правила конкурса:*\n\n"
-        "Ваш чек должен включать сумму *не менее* 7900 ТГ.\n"
-        "Если сумма чека, например, 15800 ТГ, вы получите *2 билета* и так далее.\n"
-        "Для участия отправьте чек в формате *PDF*.\n\n"
-        "📌 *Команды меню:* 📌\n"
-        "🎫 */Мои билеты* – Показывает количество билетов, накопленных за все время.\n"
-        "🎟️ */Получить билеты* – Отправьте чек и получите свои билеты!\n"
-        "🏆 */Результаты* – Узнайте результаты прошедших и будущих конкурсов!\n\n"
-        "👇 Нажмите *«Получить билет»*, чтобы участвовать! 👇\n"
-        "🔔 Следите за обновлениями и не пропустите объявления о новых конкурсах! 🔔\n"
-    )
-
-    bot.send_message(message.chat.id, welcome_message, parse_mode='Markdown')
-
-    send_main_menu(message.chat.id, is_admin) 
-
-    if not is_user_registered(user_id):
-        bot.send_message(message.chat.id, "📝 Для начала регистрации, пожалуйста, введите следующие данные:")
-        bot.send_message(message.chat.id, "👤 Введите вашу *фамилию*:")
-        bot.register_next_step_handler(message, ask_for_surname)
-    else:
-        bot.send_message(message.chat.id, "🎉 Вы уже зарегистрированы! Добро пожаловать снова! 🎉")
-        send_back_to_menu_message(message.chat.id, is_admin) 
-
-
-@bot.message_handler(func=lambda message: message.text == "📊 Экспорт данных")
-def export_data_handler(message):
-    if str(message.from_user.id) == ADMIN_USER_ID:
-        users = fetch_all_users()
-        if users:
-            excel_file = generate_users_excel_report(users)
-            bot.send_document(message.chat.id, excel_file, caption="📊 *Отчет по данным пользователей и билетам* 📊", parse_mode='Markdown')
-        else:
-            bot.send_message(message.chat.id, "ℹ️ В базе данных не найдено пользователей. ℹ️")
-    else:
-        bot.send_message(message.chat.id, "🚫 У вас нет прав на выполнение этого действия. 🚫")
-
-
-@bot.message_handler(func=lambda message: message.text == "⚙️ Управление пользователями")
-def manage_users_handler(message):
-    if str(message.from_user.id) == ADMIN_USER_ID:
-        bot.send_message(message.chat.id, "⚙️ *Выберите действие по управлению пользователями:* ⚙️", reply_markup=create_admin_management_menu(), parse_mode='Markdown')
-    else:
-        bot.send_message(message.chat.id, "🚫 У вас нет прав на выполнение этого действия. 🚫")
-
-
-@bot.message_handler(func=lambda message: message.text == "➕ Добавить пользователя")
-def add_user_handler(message):
-    if str(message.from_user.id) == ADMIN_USER_ID:
-        bot.send_message(message.chat.id, "➕ Введите *ID нового пользователя*:")
-        bot.register_next_step_handler(message, process_add_user_id_input)
-    else:
-        bot.send_message(message.chat.id, "🚫 У вас нет прав на выполнение этого действия. 🚫")
-
-def process_add_user_id_input(message):
-    user_id_to_add = message.text
-    try:
-        user_id_int = int(user_id_to_add)
-        bot.send_message(message.chat.id, f"👤 Введите *фамилию* для пользователя с ID {user_id_int} (или пропустите, нажав /skip):")
-        bot.register_next_step_handler(message, process_add_user_surname_input, user_id=user_id_int)
-    except ValueError:
-        bot.send_message(message.chat.id, "❌ Некорректный ID пользователя. Введите *числовой ID*. ❌")
-        send_back_to_menu_message(message.chat.id, True)
-
-def process_add_user_surname_input(message, user_id):
-    surname = message.text
-    if message.text == '/skip':
-        surname = None
-    bot.send_message(message.chat.id, f"👤 Введите *имя* для пользователя с ID {user_id} (или /skip):")
-    bot.register_next_step_handler(message, process_add_user_name_input, user_id=user_id, surname=surname)
-
-def process_add_user_name_input(message, user_id, surname):
-    name = message.text
-    if message.text == '/skip':
-        name = None
-    bot.send_message(message.chat.id, f"📍 Введите *адрес* для пользователя с ID {user_id} (или /skip):")
-    bot.register_next_step_handler(message, process_add_user_address_input, user_id=user_id, surname=surname, name=name)
-
-def process_add_user_address_input(message, user_id, surname, name):
-    address = message.text
-    if message.text == '/skip':
-        address = None
-    bot.send_message(message.chat.id, f"📞 Введите *номер телефона* для пользователя с ID {user_id} (или /skip):")
-    bot.register_next_step_handler(message, process_add_user_phone_input, user_id=user_id, surname=surname, name=name, address=address)
-
-def process_add_user_phone_input(message, user_id, surname, name, address):
-    phone_number = message.text
-    if message.text == '/skip':
-        phone_number = None
-
-    if admin_add_new_user_to_db(user_id, surname, name, address, phone_number):
-        bot.send_message(message.chat.id, f"✅ Пользователь с ID {user_id} успешно *добавлен* администратором. ✅")
-        logging.info(f"Администратор {message.from_user.id} успешно добавил пользователя {user_id}.")
-    else:
-        bot.send_message(message.chat.id, f"❌ Не удалось добавить пользователя с ID {user_id}. Произошла ошибка. ❌")
-
-    send_back_to_menu_message(message.chat.id, True)
-
-@bot.message_handler(func=lambda message: message.text == "➖ Удалить пользователя")
-def delete_user_handler(message):
-    if str(message.from_user.id) == ADMIN_USER_ID:
-        bot.send_message(message.chat.id, "➖ Введите *ID пользователя для удаления*:")
-        bot.register_next_step_handler(message, process_user_deletion_input)
-    else:
-        bot.send_message(message.chat.id, "🚫 У вас нет прав на выполнение этого действия. 🚫")
-
-def process_user_deletion_input(message):
-    user_id_to_delete = message.text
-    try:
-        user_id_int = int(user_id_to_delete)
-        if delete_user_from_db(user_id_int):
-            bot.send_message(message.chat.id, f"✅ Пользователь с ID {user_id_to_delete} успешно *удален*. ✅")
-            logging.info(f"Администратор {message.from_user.id} удалил пользователя {user_id_to_delete}.")
-        else:
-            bot.send_message(message.chat.id, f"❌ Не удалось удалить пользователя с ID {user_id_to_delete}. Произошла ошибка. ❌")
-    except ValueError:
-        bot.send_message(message.chat.id, "❌ Некорректный ID пользователя. Введите *числовой ID*. ❌")
-    except Exception as e:
-        logging.error(f"Ошибка при обработке удаления пользователя: {e}")
-        bot.send_message(message.chat.id, "❌ Произошла непредвиденная ошибка при удалении пользователя. ❌")
-
-
-@bot.message_handler(func=lambda message: message.text == "⬅️ Назад")
-def back_to_admin_menu_handler(message):
-    is_admin = str(message.from_user.id) == ADMIN_USER_ID
-    send_back_to_menu_message(message.chat.id, is_admin)
-
-
-def ask_for_surname(message):
-    bot.send_message(message.chat.id, "👤 Введите ваше *имя*:")
-    bot.register_next_step_handler(message, ask_for_name, surname=message.text)
-
-def ask_for_name(message, surname):
-    bot.send_message(message.chat.id, "📍 Введите ваш *адрес* (Город, район, улица, номер квартиры):")
-    bot.register_next_step_handler(message, ask_for_address, surname=surname, name=message.text)
-
-def ask_for_address(message, surname, name):
-    bot.send_message(message.chat.id, "📞 Введите ваш *номер телефона*: (например, 87771234567)")
-    bot.register_next_step_handler(message, ask_for_phone_number, surname=surname, name=name, address=message.text)
-
-def ask_for_phone_number(message, surname, name, address):
-    user_id = message.from_user.id
-    phone_number = message.text
-    if is_user_registered(user_id):
-        bot.send_message(message.chat.id, "🎉 Вы уже зарегистрированы! 🎉")
-    elif register_new_user(user_id, surname, name, address, phone_number):
-        bot.send_message(message.chat.id, "✅ *Регистрация успешно завершена!* Добро пожаловать в клуб! 🎉", parse_mode='Markdown')
-        send_back_to_menu_message(message.chat.id, False)
-    else:
-        bot.send_message(message.chat.id, "❌ Ошибка при регистрации. Пожалуйста, попробуйте снова. ❌")
-
-
-@bot.message_handler(func=lambda message: message.text == "🎫 Мои билеты")
-def my_tickets_handler(message):
-    user_id = message.from_user.id
-    user = is_user_registered(user_id)
-
-    if not user:
-        bot.send_message(message.chat.id, "❌ Вы не зарегистрированы. ❌")
-        return
-
-    tickets = fetch_user_tickets(user_id)
-    if tickets:
-        response_lines = ["🎫 *Ваши билеты:* 🎫"]
-        response_lines.append(f"Всего билетов накоплено: *{len(tickets)} шт.*")
-        response_lines.append("---")
-        for ticket in tickets:
-            response_lines.append(f"Билет №: *{ticket[0]}* | Дата получения: {ticket[1].strftime('%d.%m.%Y %H:%M')}")
-        response_text = "\n".join(response_lines)
-        bot.send_message(message.chat.id, response_text, parse_mode='Markdown')
-
-    else:
-        bot.send_message(message.chat.id, "ℹ️ У вас пока нет билетов. ℹ️")
-    send_back_to_menu_message(message.chat.id, str(user_id) == ADMIN_USER_ID)
-
-
-@bot.message_handler(func=lambda message: message.text == "🎟️ Получить билеты")
-def get_tickets_handler(message):
-    user_id = message.from_user.id
-    if not is_user_registered(user_id):
-        bot.send_message(message.chat.id, "❌ Вы не зарегистрированы. ❌")
-        return
-    bot.send_message(message.chat.id, "🧾 Отправьте *чек* в формате *PDF* для получения билетов. 🚀", parse_mode='Markdown')
-
-
-@bot.message_handler(func=lambda message: message.text == "🏆 Результаты")
-def results_handler(message):
-    results_message = "🏆 <b>Результаты конкурса будут опубликованы позже!</b> 🏆\n\n"
-    results_message += "Ожидайте объявлений! 🔔"
-
-    inline_menu = InlineKeyboardMarkup()
-    learn_more_button = InlineKeyboardButton(text="Подробнее ℹ️", callback_data='learn_results')
-    inline_menu.add(learn_more_button)
-
-    bot.send_message(message.chat.id, results_message, parse_mode='HTML', reply_markup=inline_menu)
-
-
-@bot.callback_query_handler(func=lambda call: call.data == 'learn_results')
-def callback_inline(call):
-    if call.message:
-        detailed_results_message = (
-            "📜 <b>Подробная информация о результатах конкурса:</b> 📜\n\n"
-            "Результаты будут определены случайным образом среди всех участников, "
-            "получивших билеты. Следите за новостями в канале! 📢\n\n"
-            "Дата объявления результатов: <b>[Дата будет объявлена позже]</b>. 📅\n"
-            "Призовой фонд: <b>[Призовой фонд будет объявлен позже]</b>. 🎁\n\n"
-            "Желаем всем удачи! 👍"
-        )
-        bot.send_message(call.message.chat.id, detailed_results_message, parse_mode='HTML')
-
-
-@bot.message_handler(commands=['export_users'])
-def export_users_command_handler(message):
-    if message.from_user.id == int(ADMIN_USER_ID):
-        users = fetch_all_users()
-        if users:
-            excel_file = generate_users_excel_report(users)
-            bot.send_document(message.chat.id, excel_file,
-                                             caption="📊 *Отчет по данным пользователей* 📊",
-                                             file_name="user_data.xlsx", parse_mode='Markdown')
-        else:
-            bot.send_message(message.chat.id, "ℹ️ В базе данных не найдено пользователей. ℹ️")
-    else:
-        bot.send_message(message.chat.id, "🚫 У вас нет прав на выполнение этого действия. 🚫")
-
-
-
-@bot.message_handler(content_types=['document'])
-def handle_receipt_document(message):
-    if message.document.mime_type == 'application/pdf':
-        try:
-            file_info = bot.get_file(message.document.file_id)
-            downloaded_file = bot.download_file(file_info.file_path)
-            pdf_file = BytesIO(downloaded_file)
-
-            receipt_text = extract_text_from_pdf_file(pdf_file)
-            receipt_data = extract_receipt_details(receipt_text)
-
-            if receipt_data["amount"] and receipt_data["number"]:
-                amount = int(receipt_data["amount"])
-                bill_number = receipt_data["number"]
-                user_id = message.from_user.id
-
-                tickets_received = update_user_tickets_count(user_id, amount, bill_number)
-
-                if tickets_received > 0:
-                    bot.send_message(message.chat.id, f"🎉 Поздравляем! Вы получили *{tickets_received} билетов*! 🎟️ Удачи в конкурсе! 🎉", parse_mode='Markdown')
-                else:
-                    pass
-            else:
-                bot.send_message(message.chat.id, "❌ Не удалось извлечь данные из чека. Пожалуйста, убедитесь, что чек корректный и в формате *PDF*. ❌", parse_mode='Markdown')
-
-        except Exception as e:
-            logging.error(f"Ошибка при обработке PDF чека пользователя {message.from_user.id}: {e}")
-            bot.send_message(message.chat.id, "❌ Произошла ошибка при обработке чека. Пожалуйста, попробуйте позже. ❌")
-
-    else:
-        bot.send_message(message.chat.id, "❌ Пожалуйста, отправьте чек в формате *PDF*. ❌", parse_mode='Markdown')
-    send_back_to_menu_message(message.chat.id, str(message.from_user.id) == ADMIN_USER_ID)
+from config import BOT_RUNTIME
 
 
 if __name__ == '__main__':
-    create_user_table_if_not_exists()
-    logging.info("Бот запущен.")
-    bot.polling(non_stop=True)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Режим выбирается до импорта модуля бота: каждый режим загружает только свой стек
+    # (TeleBot и psycopg2 или AsyncTeleBot, aiohttp и asyncpg) и ничего не создает при импорте.
+    if BOT_RUNTIME == "async":
+        import async_main as runtime
+    else:
+        import threaded_main as runtime
+    if "--check" in sys.argv[1:]:
+        # Проверка готовности для healthcheck и CI: бот не запускается, код выхода 0 — все в порядке.
+        raise SystemExit(0 if runtime.check() else 1)
+    runtime.main()
@@ -0,0 +1,113 @@
+import hashlib
+import logging
+import os
+import threading
+
+
+MEDIA_SENDERS = {
+    "photo": "send_photo",
+    "document": "send_document",
+    "animation": "send_animation",
+    "video": "send_video",
+}
+
+
+def uploaded_file_id(message, kind):
+    if kind == "photo":
+        return message.photo[-1].file_id
+    return getattr(message, kind).file_id
+
+
+def is_invalid_file_id_error(error):
+    # Сохраненный file_id перестает работать, например, при смене токена бота.
+    description = (getattr(error, "description", "") or "").lower()
+    return getattr(error, "error_code", None) == 400 and ("file" in description or "identifier" in description)
+
+
+class StaticAsset:
+    def __init__(self, name, path, kind):
+        if kind not in MEDIA_SENDERS:
+            raise ValueError(f"Неизвестный тип медиафайла: {kind}")
+        self.name = name
+        self.path = path
+        self.kind = kind
+        self.sha256 = None
+        self.file_id = None
+        self._stat = None
+
+    def refresh(self):
+        # Хэш пересчитывается только при изменении размера или времени изменения файла.
+        stat = os.stat(self.path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if signature == self._stat:
+            return False
+        with open(self.path, "rb") as file:
+            sha256 = hashlib.sha256(file.read()).hexdigest()
+        self._stat = signature
+        if sha256 == self.sha256:
+            return False
+        if self.sha256 is not None:
+            logging.info(f"Медиафайл {self.name} изменился, он будет загружен в Telegram заново.")
+        self.sha256 = sha256
+        self.file_id = None
+        return True
+
+
+class StaticMediaRegistry:
+    def __init__(self):
+        self._assets = {}
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.cached_sends = 0
+
+    def register(self, name, path, kind="photo"):
+        self._assets[name] = StaticAsset(name, path, kind)
+
+    def asset(self, name):
+        return self._assets[name]
+
+    def assets(self):
+        return list(self._assets.values())
+
+    def load(self, rows):
+        # rows — сохраненные (name, sha256, file_id); file_id берется, только если хэш совпадает.
+        for name, sha256, file_id in rows:
+            asset = self._assets.get(name)
+            if asset is None:
+                continue
+            try:
+                asset.refresh()
+            except OSError as e:
+                logging.error(f"Не удалось прочитать медиафайл {asset.path}: {e}")
+                continue
+            if asset.sha256 == sha256:
+                asset.file_id = file_id
+
+    def cached_file_id(self, name):
+        asset = self._assets[name]
+        asset.refresh()
+        if asset.file_id is not None:
+            with self._lock:
+                self.cached_sends += 1
+        return asset.file_id
+
+    def remember(self, name, sha256, file_id):
+        asset = self._assets[name]
+        with self._lock:
+            self.uploads += 1
+            if asset.sha256 == sha256:
+                asset.file_id = file_id
+
+    def forget(self, name, file_id):
+        asset = self._assets[name]
+        if asset.file_id == file_id:
+            asset.file_id = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "assets": len(self._assets),
+                "cached": sum(1 for asset in self._assets.values() if asset.file_id),
+                "uploads": self.uploads,
+                "cached_sends": self.cached_sends,
+            }
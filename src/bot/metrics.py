@@ -0,0 +1,339 @@
+import asyncio
+import bisect
+import functools
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as StackCounter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import apihelper
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PAGE_BUCKETS = (1, 2, 3, 5, 10)
+
+
+def format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                yield f"{self.name}_bucket{format_labels(self.labelnames, labels, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help_text, callback, labelnames=()):
+        # Значение читается в момент запроса /metrics: callback возвращает число
+        # или словарь {кортеж_меток: число}.
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        try:
+            value = self.callback()
+        except Exception as e:
+            logging.error(f"Не удалось получить значение метрики {self.name}: {e}")
+            return
+        values = value if isinstance(value, dict) else {(): value}
+        for labels, label_value in sorted(values.items()):
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {label_value}"
+
+
+class MetricsRegistry:
+    def __init__(self, prefix="bot_"):
+        self.prefix = prefix
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(self.prefix + name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self.prefix + name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, callback, labelnames=()):
+        return self._add(Gauge(self.prefix + name, help_text, callback, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class BotMetrics:
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        self.handler_seconds = self.registry.histogram(
+            "handler_seconds", "Время работы обработчиков обновлений.", ("handler",))
+        self.handler_errors = self.registry.counter(
+            "handler_errors_total", "Исключения в обработчиках обновлений.", ("handler",))
+        self.db_query_seconds = self.registry.histogram(
+            "db_query_seconds", "Время выполнения SQL запросов.", ("statement",))
+        self.db_query_errors = self.registry.counter(
+            "db_query_errors_total", "Ошибки SQL запросов.", ("statement",))
+        self.receipt_parse_seconds = self.registry.histogram(
+            "receipt_parse_seconds", "Время разбора чека (text — текст PDF, ocr — распознавание).", ("stage",))
+        self.receipt_pages = self.registry.histogram(
+            "receipt_pages", "Сколько страниц PDF прочитано при разборе чека.", buckets=PAGE_BUCKETS)
+        self.receipt_rejections = self.registry.counter(
+            "receipt_rejections_total", "Отказы в обработке чеков по причине (лимиты, размер, очередь, ошибки).", ("reason",))
+        self.telegram_request_seconds = self.registry.histogram(
+            "telegram_request_seconds", "Время запросов к Telegram Bot API.", ("method",))
+        self.telegram_errors = self.registry.counter(
+            "telegram_errors_total", "Ошибки запросов к Telegram Bot API по коду ответа.", ("method", "code"))
+
+    def observe_query(self, name, seconds, failed):
+        self.db_query_seconds.observe(seconds, name)
+        if failed:
+            self.db_query_errors.inc(name)
+
+    def observe_receipt_parse(self, stage, seconds, pages=None):
+        self.receipt_parse_seconds.observe(seconds, stage)
+        if pages is not None:
+            self.receipt_pages.observe(pages)
+
+    def observe_telegram_request(self, method_name, seconds, error=None):
+        self.telegram_request_seconds.observe(seconds, method_name)
+        if error is not None:
+            self.telegram_errors.inc(method_name, str(getattr(error, "error_code", None) or "network"))
+
+
+def instrument_handlers(bot, metrics):
+    # Обработчики оборачиваются после регистрации, сами функции обработчиков остаются как есть.
+    handler_lists = (bot.message_handlers, bot.callback_query_handlers)
+    for handlers in handler_lists:
+        for handler in handlers:
+            function = handler["function"]
+            name = function.__name__
+            if asyncio.iscoroutinefunction(function):
+                handler["function"] = _async_timed_handler(function, name, metrics)
+            else:
+                handler["function"] = _timed_handler(function, name, metrics)
+
+def _timed_handler(function, name, metrics):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            metrics.handler_errors.inc(name)
+            raise
+        finally:
+            metrics.handler_seconds.observe(time.perf_counter() - started, name)
+    return wrapper
+
+def _async_timed_handler(function, name, metrics):
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await function(*args, **kwargs)
+        except Exception:
+            metrics.handler_errors.inc(name)
+            raise
+        finally:
+            metrics.handler_seconds.observe(time.perf_counter() - started, name)
+    return wrapper
+
+
+def instrument_telegram_api(metrics, asynchronous=False):
+    # В telebot нет публичного хука на каждый запрос, поэтому оборачивается функция,
+    # через которую apihelper (или asyncio_helper) выполняет все вызовы Bot API.
+    # asyncio_helper тянет aiohttp, поэтому потоковый бот его не импортирует.
+    if not asynchronous:
+        make_request = apihelper._make_request
+
+        @functools.wraps(make_request)
+        def timed_make_request(token, method_name, *args, **kwargs):
+            started = time.perf_counter()
+            error = None
+            try:
+                return make_request(token, method_name, *args, **kwargs)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                metrics.observe_telegram_request(method_name, time.perf_counter() - started, error)
+
+        apihelper._make_request = timed_make_request
+        return
+
+    from telebot import asyncio_helper
+
+    process_request = asyncio_helper._process_request
+
+    @functools.wraps(process_request)
+    async def timed_process_request(token, url, *args, **kwargs):
+        started = time.perf_counter()
+        error = None
+        try:
+            return await process_request(token, url, *args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            metrics.observe_telegram_request(url, time.perf_counter() - started, error)
+
+    asyncio_helper._process_request = timed_process_request
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.01, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = StackCounter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample_loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logging.info(f"Профилировщик запущен: снимок стеков раз в {self.interval} с.")
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _sample_loop(self):
+        own_thread_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            collected = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread_id:
+                    continue
+                frames = traceback.extract_stack(frame, limit=self.max_depth)
+                stack = ";".join(f"{summary.name} ({summary.filename.rsplit('/', 1)[-1]}:{summary.lineno})" for summary in frames)
+                collected.append(f"{thread_names.get(thread_id, thread_id)};{stack}")
+            with self._lock:
+                self.samples += 1
+                self._stacks.update(collected)
+
+    def collapsed(self, reset=False):
+        # Формат «стек количество» понимают flamegraph.pl и speedscope.
+        with self._lock:
+            stacks = self._stacks
+            if reset:
+                self._stacks = StackCounter()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class MetricsServer:
+    def __init__(self, host, port, registry, profiler=None):
+        self.registry = registry
+        self.profiler = profiler
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def _make_handler(self):
+        metrics_server = self
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, body=b"", content_type="text/plain; charset=utf-8"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                if path == "/metrics":
+                    self._reply(200, metrics_server.registry.render().encode("utf-8"),
+                                "text/plain; version=0.0.4; charset=utf-8")
+                elif path == "/profile" and metrics_server.profiler is not None:
+                    self._reply(200, metrics_server.profiler.collapsed(reset="reset=1" in query).encode("utf-8"))
+                elif path == "/healthz":
+                    self._reply(200)
+                else:
+                    self._reply(404)
+
+        return MetricsRequestHandler
+
+    def start(self):
+        host, port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        logging.info(f"Метрики доступны по адресу http://{host}:{port}/metrics")
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,61 @@
+import logging
+import shutil
+import time
+from io import BytesIO
+
+
+POINTS_PER_INCH = 72
+# Команда по умолчанию в pytesseract. Сам pytesseract (вместе с Pillow и PyPDF2) импортируется
+# только в процессах распознавания: основному процессу достаточно проверить, что tesseract установлен.
+TESSERACT_CMD = "tesseract"
+
+
+def tesseract_available():
+    return shutil.which(TESSERACT_CMD) is not None
+
+
+def limit_image_dpi(image, page_width_points, max_dpi):
+    from PIL import Image
+
+    # Сканы часто сохраняются в 600+ DPI; для распознавания чека хватает 200-300 DPI,
+    # а время работы tesseract растет вместе с числом пикселей.
+    max_width = int(page_width_points / POINTS_PER_INCH * max_dpi)
+    if max_width > 0 and image.width > max_width:
+        image = image.resize((max_width, max(1, image.height * max_width // image.width)), Image.LANCZOS)
+    return image
+
+
+def page_images(page, max_dpi):
+    from PIL import Image
+
+    # У скана чека страница обычно состоит из одного встроенного изображения: оно извлекается
+    # напрямую, без отдельной растеризации PDF.
+    page_width = float(page.mediabox.width)
+    for image_file in page.images:
+        with Image.open(BytesIO(image_file.data)) as image:
+            image = limit_image_dpi(image.convert("L"), page_width, max_dpi)
+            yield image
+
+
+def ocr_pdf_bytes(data, max_pages=1, max_dpi=200, lang="rus+eng", timeout=30):
+    # timeout ограничивает распознавание всего чека: каждому изображению достается остаток времени.
+    import PyPDF2
+    import pytesseract
+
+    deadline = time.monotonic() + timeout
+    pdf_reader = PyPDF2.PdfReader(BytesIO(data))
+    page_texts = []
+    for page_num, page in enumerate(pdf_reader.pages):
+        if page_num >= max_pages:
+            break
+        for image in page_images(page, max_dpi):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return "\n".join(page_texts)
+            try:
+                page_texts.append(pytesseract.image_to_string(image, lang=lang, timeout=remaining))
+            except RuntimeError as e:
+                # pytesseract сообщает о превышении timeout через RuntimeError и сам завершает tesseract.
+                logging.warning(f"Распознавание изображения чека прервано: {e}")
+                return "\n".join(page_texts)
+    return "\n".join(page_texts)
@@ -0,0 +1,514 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database")
+SQL_SCRIPTS = ("create_table",)
+
+
+def to_asyncpg_query(query):
+    param_names = []
+
+    def replace_placeholder(match):
+        name = match.group(1)
+        if name is None:
+            param_names.append(None)
+            return f"${len(param_names)}"
+        if name not in param_names:
+            param_names.append(name)
+        return f"${param_names.index(name) + 1}"
+
+    return re.sub(r"%(?:\((\w+)\))?s", replace_placeholder, query), param_names
+
+
+# Запросы по билетам ограничены текущим конкурсом: active_contest_id() вычисляется при запуске
+# запроса, и PostgreSQL читает только секцию tickets этого конкурса.
+USER_TICKETS_SUMMARY_QUERY = """
+    SELECT
+        count(*),
+        min(created_at),
+        max(created_at)
+    FROM tickets
+    WHERE contest_id = active_contest_id() AND user_id = %s
+"""
+
+USER_TICKETS_PAGE_AFTER_QUERY = """
+    SELECT ticket_id, created_at
+    FROM tickets
+    WHERE contest_id = active_contest_id() AND user_id = %s AND ticket_id > %s
+    ORDER BY ticket_id
+    LIMIT %s
+"""
+
+USER_TICKETS_PAGE_BEFORE_QUERY = """
+    SELECT ticket_id, created_at
+    FROM tickets
+    WHERE contest_id = active_contest_id() AND user_id = %s AND ticket_id < %s
+    ORDER BY ticket_id DESC
+    LIMIT %s
+"""
+
+USERS_TICKETS_EXPORT_QUERY = """
+    SELECT
+        u.user_id,
+        u.surname,
+        u.name,
+        u.address,
+        u.phone_number,
+        COALESCE(cu.tickets_count, 0),
+        t.ticket_id,
+        t.created_at
+    FROM users u
+    LEFT JOIN contest_users cu ON cu.contest_id = active_contest_id() AND cu.user_id = u.user_id
+    LEFT JOIN tickets t ON t.contest_id = active_contest_id() AND t.user_id = u.user_id
+    ORDER BY u.user_id, t.ticket_id
+"""
+
+# users.number_of_tickets — счетчик за все время, contest_users — за текущий конкурс.
+ISSUE_TICKETS_QUERY = """
+    WITH contest AS (
+        SELECT active_contest_id() AS contest_id
+    ),
+    new_receipt AS (
+        INSERT INTO receipts (bill_number, user_id, amount, tickets_count)
+        SELECT %(bill_number)s::varchar, %(user_id)s::bigint, %(amount)s::bigint, %(tickets_count)s::integer
+        WHERE %(tickets_count)s::integer > 0
+        ON CONFLICT (bill_number) DO NOTHING
+        RETURNING bill_number, user_id, amount, tickets_count
+    ),
+    new_tickets AS (
+        INSERT INTO tickets (contest_id, user_id, bill_number)
+        SELECT c.contest_id, r.user_id, r.bill_number
+        FROM new_receipt r, contest c, generate_series(1, r.tickets_count)
+        RETURNING ticket_id
+    ),
+    updated_user AS (
+        UPDATE users
+        SET number_of_tickets = number_of_tickets + r.tickets_count
+        FROM new_receipt r
+        WHERE users.user_id = r.user_id
+        RETURNING users.user_id
+    ),
+    contest_user AS (
+        INSERT INTO contest_users AS cu (contest_id, user_id, tickets_count)
+        SELECT c.contest_id, r.user_id, r.tickets_count
+        FROM new_receipt r, contest c
+        ON CONFLICT (contest_id, user_id) DO UPDATE
+        SET tickets_count = cu.tickets_count + EXCLUDED.tickets_count
+    ),
+    daily_stats AS (
+        INSERT INTO contest_daily_stats AS d (contest_id, day, tickets_count, receipts_count, receipts_amount)
+        SELECT c.contest_id, CURRENT_DATE, r.tickets_count, 1, COALESCE(r.amount, 0)
+        FROM new_receipt r, contest c
+        ON CONFLICT (contest_id, day) DO UPDATE
+        SET tickets_count = d.tickets_count + EXCLUDED.tickets_count,
+            receipts_count = d.receipts_count + EXCLUDED.receipts_count,
+            receipts_amount = d.receipts_amount + EXCLUDED.receipts_amount
+    )
+    SELECT
+        (SELECT count(*) FROM new_tickets) AS issued,
+        (SELECT user_id FROM receipts WHERE bill_number = %(bill_number)s) AS owner_id
+"""
+
+RECEIPT_OWNER_QUERY = "SELECT user_id FROM receipts WHERE bill_number = %s"
+
+BROADCAST_CREATE_QUERY = """
+    INSERT INTO broadcasts (admin_chat_id, source_message_id)
+    VALUES (%s, %s)
+    RETURNING broadcast_id
+"""
+
+BROADCAST_RECIPIENTS_QUERY = "SELECT user_id FROM users WHERE user_id > %s ORDER BY user_id LIMIT %s"
+
+BROADCAST_PROGRESS_QUERY = """
+    UPDATE broadcasts
+    SET status = %(status)s::varchar,
+        last_user_id = %(last_user_id)s::bigint,
+        sent_count = %(sent_count)s::integer,
+        blocked_count = %(blocked_count)s::integer,
+        failed_count = %(failed_count)s::integer,
+        finished_at = CASE WHEN %(status)s::varchar = 'running' THEN NULL ELSE CURRENT_TIMESTAMP END
+    WHERE broadcast_id = %(broadcast_id)s::integer
+"""
+
+BROADCAST_RUNNING_QUERY = """
+    SELECT broadcast_id, admin_chat_id, source_message_id, last_user_id, sent_count, blocked_count, failed_count
+    FROM broadcasts
+    WHERE status = 'running'
+    ORDER BY broadcast_id
+    LIMIT 1
+"""
+
+# Розыгрыш проводится среди билетов текущего конкурса; номер конкурса сохраняется в draws,
+# чтобы /draw_verify повторял выборку по той же секции.
+DRAW_BOUNDS_QUERY = """
+    SELECT
+        c.contest_id,
+        (SELECT min(ticket_id) FROM tickets t WHERE t.contest_id = c.contest_id),
+        (SELECT max(ticket_id) FROM tickets t WHERE t.contest_id = c.contest_id),
+        (SELECT count(*) FROM (SELECT 1 FROM tickets t WHERE t.contest_id = c.contest_id LIMIT %s) limited)
+    FROM contests c
+    WHERE c.finished_at IS NULL
+"""
+
+DRAW_TICKET_OWNERS_QUERY = """
+    SELECT ticket_id, user_id
+    FROM tickets
+    WHERE contest_id = %s AND ticket_id = ANY(%s::integer[])
+"""
+
+DRAW_CREATE_QUERY = """
+    INSERT INTO draws (contest_id, seed, winners_count, min_ticket_id, max_ticket_id, candidates_checked, created_by)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    RETURNING draw_id
+"""
+
+DRAW_WINNERS_INSERT_QUERY = """
+    INSERT INTO draw_winners (draw_id, place, ticket_id, user_id)
+    SELECT %s::integer, w.place, w.ticket_id, w.user_id
+    FROM unnest(%s::integer[], %s::bigint[]) WITH ORDINALITY AS w(ticket_id, user_id, place)
+"""
+
+DRAW_QUERY = """
+    SELECT draw_id, seed, winners_count, min_ticket_id, max_ticket_id, candidates_checked, created_at, contest_id
+    FROM draws
+    WHERE draw_id = %s
+"""
+
+DRAW_WINNERS_QUERY = """
+    SELECT w.place, w.ticket_id, w.user_id, u.surname, u.name
+    FROM draw_winners w
+    LEFT JOIN users u ON u.user_id = w.user_id
+    WHERE w.draw_id = %s
+    ORDER BY w.place
+"""
+
+STATIC_MEDIA_QUERY = "SELECT name, sha256, file_id FROM static_media"
+
+STATIC_MEDIA_SAVE_QUERY = """
+    INSERT INTO static_media (name, sha256, file_id)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (name) DO UPDATE
+    SET sha256 = EXCLUDED.sha256, file_id = EXCLUDED.file_id, updated_at = CURRENT_TIMESTAMP
+"""
+
+USER_IMPORT_CREATE_QUERY = "INSERT INTO user_imports (admin_id, file_name) VALUES (%s, %s) RETURNING import_id"
+
+# Количество билетов из файла — итоговое число билетов пользователя в текущем конкурсе: недостающие
+# билеты выдаются, лишние не отзываются, поэтому повторная загрузка того же файла ничего не меняет.
+USER_IMPORT_MERGE_QUERY = """
+    WITH contest AS (
+        SELECT active_contest_id() AS contest_id
+    ),
+    staged AS (
+        SELECT user_id, surname, name, address, phone_number, number_of_tickets
+        FROM users_import_staging
+        WHERE import_id = %s
+    ),
+    existing AS (
+        SELECT u.user_id, COALESCE(cu.tickets_count, 0) AS tickets_count
+        FROM users u
+        JOIN staged s ON s.user_id = u.user_id
+        LEFT JOIN contest_users cu ON cu.contest_id = (SELECT contest_id FROM contest) AND cu.user_id = u.user_id
+        FOR UPDATE OF u
+    ),
+    added AS (
+        SELECT s.user_id, s.number_of_tickets - COALESCE(e.tickets_count, 0) AS tickets_count
+        FROM staged s
+        LEFT JOIN existing e ON e.user_id = s.user_id
+        WHERE s.number_of_tickets > COALESCE(e.tickets_count, 0)
+    ),
+    merged AS (
+        INSERT INTO users (user_id, surname, name, address, phone_number, number_of_tickets)
+        SELECT s.user_id, s.surname, s.name, s.address, s.phone_number, COALESCE(a.tickets_count, 0)
+        FROM staged s
+        LEFT JOIN added a ON a.user_id = s.user_id
+        ON CONFLICT (user_id) DO UPDATE
+        SET surname = COALESCE(EXCLUDED.surname, users.surname),
+            name = COALESCE(EXCLUDED.name, users.name),
+            address = COALESCE(EXCLUDED.address, users.address),
+            phone_number = COALESCE(EXCLUDED.phone_number, users.phone_number),
+            number_of_tickets = users.number_of_tickets + EXCLUDED.number_of_tickets
+        RETURNING (xmax = 0) AS inserted
+    ),
+    new_tickets AS (
+        INSERT INTO tickets (contest_id, user_id)
+        SELECT c.contest_id, a.user_id
+        FROM added a, contest c, generate_series(1, a.tickets_count)
+        RETURNING ticket_id
+    ),
+    contest_user AS (
+        INSERT INTO contest_users AS cu (contest_id, user_id, tickets_count)
+        SELECT c.contest_id, a.user_id, a.tickets_count
+        FROM added a, contest c
+        ON CONFLICT (contest_id, user_id) DO UPDATE
+        SET tickets_count = cu.tickets_count + EXCLUDED.tickets_count
+    ),
+    daily_stats AS (
+        INSERT INTO contest_daily_stats AS d (contest_id, day, tickets_count)
+        SELECT (SELECT contest_id FROM contest), CURRENT_DATE, count(*)
+        FROM new_tickets
+        HAVING count(*) > 0
+        ON CONFLICT (contest_id, day) DO UPDATE
+        SET tickets_count = d.tickets_count + EXCLUDED.tickets_count
+    )
+    SELECT
+        (SELECT count(*) FILTER (WHERE inserted) FROM merged),
+        (SELECT count(*) FILTER (WHERE NOT inserted) FROM merged),
+        (SELECT count(*) FROM new_tickets)
+"""
+
+USER_IMPORT_FINISH_QUERY = """
+    WITH cleared AS (
+        DELETE FROM users_import_staging WHERE import_id = %(import_id)s::integer
+    )
+    UPDATE user_imports
+    SET rows_count = %(rows_count)s::integer,
+        inserted_count = %(inserted_count)s::integer,
+        updated_count = %(updated_count)s::integer,
+        tickets_added = %(tickets_added)s::integer,
+        errors_count = %(errors_count)s::integer
+    WHERE import_id = %(import_id)s::integer
+"""
+
+# Статистика текущего конкурса читается из contest_daily_stats (строка на день, обновляется при выдаче
+# билетов), рейтинг — из contest_users по индексу contest_users_leaderboard_idx.
+CONTEST_STATS_TOTALS_QUERY = """
+    SELECT
+        c.contest_id,
+        c.title,
+        c.started_at,
+        COALESCE(sum(d.tickets_count), 0),
+        COALESCE(sum(d.receipts_count), 0),
+        COALESCE(sum(d.receipts_amount), 0)
+    FROM contests c
+    LEFT JOIN contest_daily_stats d ON d.contest_id = c.contest_id
+    WHERE c.finished_at IS NULL
+    GROUP BY c.contest_id
+"""
+
+CONTEST_STATS_DAYS_QUERY = """
+    SELECT day, tickets_count, receipts_count, receipts_amount
+    FROM contest_daily_stats
+    WHERE contest_id = active_contest_id()
+    ORDER BY day DESC
+    LIMIT %s
+"""
+
+LEADERBOARD_QUERY = """
+    SELECT cu.user_id, u.surname, u.name, cu.tickets_count
+    FROM contest_users cu
+    JOIN users u ON u.user_id = cu.user_id
+    WHERE cu.contest_id = active_contest_id() AND cu.tickets_count > 0
+    ORDER BY cu.tickets_count DESC, cu.user_id
+    LIMIT %s
+"""
+
+CONTEST_START_QUERY = "SELECT start_contest(%s)"
+
+USER_CHANGED_NOTIFY_QUERY = "SELECT pg_notify('user_cache', %s::text)"
+
+SCHEMA_MIGRATIONS_QUERY = "SELECT name, checksum FROM schema_migrations"
+
+SCHEMA_MIGRATION_SAVE_QUERY = """
+    INSERT INTO schema_migrations (name, checksum)
+    VALUES (%s, %s)
+    ON CONFLICT (name) DO UPDATE
+    SET checksum = EXCLUDED.checksum, applied_at = CURRENT_TIMESTAMP
+"""
+
+# Несколько экземпляров бота, запущенных одновременно, применяют схему по очереди.
+SCHEMA_MIGRATION_LOCK_QUERY = "SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))"
+
+
+class Statement:
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql.strip().rstrip(";")
+        self.asyncpg_sql, self.param_names = to_asyncpg_query(self.sql)
+        self.named = any(self.param_names)
+        self.prepared_name = f"bot_{name}"
+        self.prepare_sql = f"PREPARE {self.prepared_name} AS {self.asyncpg_sql}"
+        if self.param_names:
+            self.execute_sql = f"EXECUTE {self.prepared_name} ({', '.join(['%s'] * len(self.param_names))})"
+        else:
+            self.execute_sql = f"EXECUTE {self.prepared_name}"
+
+    def bind(self, params):
+        params = params or ()
+        if self.named:
+            return tuple(params[name] for name in self.param_names)
+        if len(params) != len(self.param_names):
+            raise TypeError(
+                f"Запрос '{self.name}' ожидает {len(self.param_names)} параметров, передано {len(params)}"
+            )
+        return tuple(params)
+
+
+class QueryRegistry:
+    def __init__(self, sql_dir=SQL_DIR, use_prepared=True):
+        self.sql_dir = sql_dir
+        self.use_prepared = use_prepared
+        self._statements = {}
+        self._scripts = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+        # Вызывается после каждого запроса: on_timing(name, seconds, failed).
+        self.on_timing = None
+
+    def load(self):
+        for filename in sorted(os.listdir(self.sql_dir)):
+            name, extension = os.path.splitext(filename)
+            if extension != ".sql":
+                continue
+            with open(os.path.join(self.sql_dir, filename), "r", encoding="utf-8") as file:
+                sql = file.read()
+            if not sql.strip():
+                raise ValueError(f"SQL файл '{filename}' пуст.")
+            if name in SQL_SCRIPTS:
+                self._scripts[name] = sql
+            else:
+                self.register(name, sql)
+        missing = [name for name in SQL_SCRIPTS if name not in self._scripts]
+        if missing:
+            raise FileNotFoundError(f"SQL файлы не найдены в '{self.sql_dir}': {', '.join(missing)}")
+        logging.info(f"Загружено SQL запросов: {len(self._statements)}, скриптов: {len(self._scripts)}.")
+        return self
+
+    def register(self, name, sql):
+        if name in self._statements:
+            raise ValueError(f"SQL запрос '{name}' уже зарегистрирован.")
+        statement = Statement(name, sql)
+        self._statements[name] = statement
+        self._timings[name] = [0, 0, 0.0, 0.0]
+        return statement
+
+    def script(self, name):
+        return self._scripts[name]
+
+    def checksums(self):
+        # Версия каждого скрипта — хеш его текста. Версия "queries" учитывает и скрипты:
+        # запрос, прошедший проверку на старой схеме, после ее изменения проверяется заново.
+        versions = {name: hashlib.sha256(sql.encode("utf-8")).hexdigest() for name, sql in self._scripts.items()}
+        queries = hashlib.sha256()
+        for name in sorted(versions):
+            queries.update(f"{name}\0{versions[name]}\0".encode("utf-8"))
+        for name in sorted(self._statements):
+            queries.update(f"{name}\0{self._statements[name].sql}\0".encode("utf-8"))
+        versions["queries"] = queries.hexdigest()
+        return versions
+
+    def statement(self, name):
+        return self._statements[name]
+
+    def statements(self):
+        return list(self._statements.values())
+
+    @contextmanager
+    def timed(self, name):
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                timing = self._timings[name]
+                timing[0] += 1
+                timing[1] += failed
+                timing[2] += elapsed
+                timing[3] = max(timing[3], elapsed)
+            if self.on_timing is not None:
+                self.on_timing(name, elapsed, failed)
+
+    def _prepare(self, cursor, statement):
+        # Подготовленные выражения живут, пока живет сессия, поэтому список
+        # подготовленных запросов хранится на самом соединении.
+        prepared = getattr(cursor.connection, "prepared_statements", None)
+        if prepared is None:
+            return False
+        if statement.name not in prepared:
+            cursor.execute(statement.prepare_sql)
+            prepared.add(statement.name)
+        return True
+
+    def execute(self, cursor, name, params=None):
+        statement = self._statements[name]
+        with self.timed(name):
+            # Именованный (серверный) курсор нельзя открыть через EXECUTE.
+            if self.use_prepared and cursor.name is None and self._prepare(cursor, statement):
+                cursor.execute(statement.execute_sql, statement.bind(params))
+            else:
+                cursor.execute(statement.sql, params)
+
+    def validate(self, cursor):
+        failed = []
+        for statement in self._statements.values():
+            cursor.execute("SAVEPOINT validate_statement")
+            try:
+                if not (self.use_prepared and self._prepare(cursor, statement)):
+                    cursor.execute(statement.prepare_sql)
+                    cursor.execute(f"DEALLOCATE {statement.prepared_name}")
+                cursor.execute("RELEASE SAVEPOINT validate_statement")
+            except psycopg2.Error as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT validate_statement")
+                logging.error(f"SQL запрос '{statement.name}' не прошел проверку: {e}")
+                failed.append(statement.name)
+        return failed
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    "calls": calls,
+                    "errors": errors,
+                    "total_ms": round(total * 1000, 3),
+                    "avg_ms": round(total * 1000 / calls, 3) if calls else 0.0,
+                    "max_ms": round(max_time * 1000, 3),
+                }
+                for name, (calls, errors, total, max_time) in self._timings.items()
+            }
+
+
+def create_query_registry(use_prepared=True):
+    registry = QueryRegistry(use_prepared=use_prepared)
+    registry.register("user_tickets_summary", USER_TICKETS_SUMMARY_QUERY)
+    registry.register("user_tickets_page_after", USER_TICKETS_PAGE_AFTER_QUERY)
+    registry.register("user_tickets_page_before", USER_TICKETS_PAGE_BEFORE_QUERY)
+    registry.register("users_tickets_export", USERS_TICKETS_EXPORT_QUERY)
+    registry.register("issue_tickets", ISSUE_TICKETS_QUERY)
+    registry.register("receipt_owner", RECEIPT_OWNER_QUERY)
+    registry.register("notify_user_changed", USER_CHANGED_NOTIFY_QUERY)
+    registry.register("broadcast_create", BROADCAST_CREATE_QUERY)
+    registry.register("broadcast_recipients", BROADCAST_RECIPIENTS_QUERY)
+    registry.register("broadcast_progress", BROADCAST_PROGRESS_QUERY)
+    registry.register("broadcast_running", BROADCAST_RUNNING_QUERY)
+    registry.register("draw_bounds", DRAW_BOUNDS_QUERY)
+    registry.register("draw_ticket_owners", DRAW_TICKET_OWNERS_QUERY)
+    registry.register("draw_create", DRAW_CREATE_QUERY)
+    registry.register("draw_winners_insert", DRAW_WINNERS_INSERT_QUERY)
+    registry.register("draw", DRAW_QUERY)
+    registry.register("draw_winners", DRAW_WINNERS_QUERY)
+    registry.register("static_media", STATIC_MEDIA_QUERY)
+    registry.register("static_media_save", STATIC_MEDIA_SAVE_QUERY)
+    registry.register("contest_stats_totals", CONTEST_STATS_TOTALS_QUERY)
+    registry.register("contest_stats_days", CONTEST_STATS_DAYS_QUERY)
+    registry.register("leaderboard", LEADERBOARD_QUERY)
+    registry.register("contest_start", CONTEST_START_QUERY)
+    registry.register("user_import_create", USER_IMPORT_CREATE_QUERY)
+    registry.register("user_import_merge", USER_IMPORT_MERGE_QUERY)
+    registry.register("user_import_finish", USER_IMPORT_FINISH_QUERY)
+    registry.register("schema_migrations", SCHEMA_MIGRATIONS_QUERY)
+    registry.register("schema_migration_save", SCHEMA_MIGRATION_SAVE_QUERY)
+    registry.register("schema_migration_lock", SCHEMA_MIGRATION_LOCK_QUERY)
+    return registry.load()
@@ -0,0 +1,150 @@
+import argparse
+import random
+import re
+import time
+from collections import Counter
+
+from load_test import build_receipt_pdf
+from receipt_parser import ReceiptParser
+from receipts import parse_receipt_bytes
+
+
+SURNAMES = ("Иванов", "Петрова", "Сериков", "Ахметова", "Ким", "Нурланов")
+ITEMS = ("Молоко", "Хлеб", "Кофе", "Сыр", "Вода", "Шоколад", "Чай")
+# PDF часто разделяет разряды неразрывным пробелом.
+THOUSANDS_SEPARATORS = (" ", "\u00a0")
+# Размеченные чеки: (название, страницы, ожидаемые сумма и номер). Проверяются и по тексту,
+# и через PDF тем же разбором, что и у бота.
+SAMPLE_RECEIPTS = (
+    ("kaspi", [["Kaspi.kz", "Платеж успешно совершен", "15.03.2025 12:30", "Кофе 2 шт 1 800 ₸",
+                "Итого 12 500 ₸", "№ чека QR0123456789", "ФИО Иванов А."]],
+     {"amount": "12500", "number": "QR0123456789"}),
+    ("halyk", [["Halyk Bank", "АО «Народный Банк Казахстана»", "Квитанция", "Дата 01.02.2025 09:15",
+                "Получатель Ким Б.", "Сумма перевода 150 000,00 KZT", "Комиссия 200,00 KZT",
+                "№ квитанции 4815162342"]],
+     {"amount": "150000", "number": "4815162342"}),
+    ("итог на второй странице", [["ТОО «Магазин»", "20.05.2025 18:40", "Хлеб 350 ₸", "Сыр 2 400 ₸",
+                                  "№ чека AB0000012345"],
+                                 ["Вода 300 ₸", "Итого: 3 050 ₸", "Кассир Сериков В."]],
+     {"amount": "3050", "number": "AB0000012345"}),
+    ("без итога", [["ТОО «Магазин»", "11.11.2025 11:11", "Чай 990 ₸", "№ чека KS9876543210"]],
+     {"amount": "990", "number": "KS9876543210"}),
+)
+
+
+def format_amount(value, separator=" ", decimals=False):
+    text = f"{value:,}".replace(",", separator)
+    return f"{text},00" if decimals else text
+
+
+def kaspi_receipt(rng, total, number, date, name):
+    lines = ["Kaspi.kz", "Платеж успешно совершен", f"{date}"]
+    lines += [f"{rng.choice(ITEMS)} {rng.randint(1, 3)} шт {format_amount(rng.randint(100, 9000))} ₸" for _ in range(rng.randint(0, 4))]
+    lines += [f"Итого {format_amount(total, rng.choice(THOUSANDS_SEPARATORS))} ₸", f"№ чека {number}", f"ФИО {name}"]
+    if rng.random() < 0.5:
+        lines.insert(-3, f"Комиссия {rng.choice((0, 150))} ₸")
+    return lines
+
+def halyk_receipt(rng, total, number, date, name):
+    lines = ["Halyk Bank", "АО «Народный Банк Казахстана»", "Квитанция", f"Дата {date}"]
+    lines += [f"Получатель {name}", f"Сумма перевода {format_amount(total, decimals=True)} KZT",
+              f"Комиссия {format_amount(rng.choice((0, 200)), decimals=True)} KZT", f"№ квитанции {number}"]
+    return lines
+
+def plain_receipt(rng, total, number, date, name):
+    lines = ["ТОО «Магазин»", f"{date}"]
+    lines += [f"{rng.choice(ITEMS)} {format_amount(rng.randint(100, 9000))} ₸" for _ in range(rng.randint(0, 5))]
+    lines += [f"Итого: {format_amount(total)} ₸", f"Кассир {name}", f"№ чека {number}"]
+    return lines
+
+def generate_corpus(count, seed=0):
+    # Синтетические чеки: в каждом есть «ложные» суммы (товары, комиссия) до итоговой,
+    # часть чеков разбита на две страницы, итог может оказаться на второй.
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        kind = rng.choice(("kaspi", "halyk", "default"))
+        total = rng.randint(1000, 2000000)
+        date = f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2025 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+        name = f"{rng.choice(SURNAMES)} {rng.choice('АБВГДЕ')}."
+        if kind == "halyk":
+            number = str(rng.randint(10 ** 9, 10 ** 10 - 1))
+            lines = halyk_receipt(rng, total, number, date, name)
+        else:
+            number = f"{rng.choice(('QR', 'AB', 'KS'))}{rng.randint(0, 10 ** 10 - 1):010d}"
+            lines = (kaspi_receipt if kind == "kaspi" else plain_receipt)(rng, total, number, date, name)
+        split = rng.randint(len(lines) // 2, len(lines)) if rng.random() < 0.3 else len(lines)
+        pages = ["\n".join(lines[:split]), "\n".join(lines[split:])] if split < len(lines) else ["\n".join(lines)]
+        corpus.append((kind, pages, {"amount": str(total), "number": number}))
+    return corpus
+
+
+def legacy_extract_receipt_details(text):
+    # Прежний разбор: четыре re.search по всему тексту, сумма — первое число с «₸».
+    amount_match = re.search(r"(\d{1,3}(?: \d{3})*|\d+) ?₸", text)
+    number_match = re.search(r"№ чека ([A-Z]{2}\d{10})", text)
+    re.search(r"(\d{2}\.\d{2}\.\d{4} \d{2}:\d{2})", text)
+    re.search(r"([А-Яа-я]+\s[А-Яа-я]+\.)", text)
+    return {
+        "amount": amount_match.group(1).replace(" ", "") if amount_match else None,
+        "number": number_match.group(1) if number_match else None,
+    }
+
+def parse_legacy(pages):
+    page_texts = []
+    details = None
+    for page in pages:
+        page_texts.append(page)
+        details = legacy_extract_receipt_details("".join(page_texts))
+        if details["amount"] and details["number"]:
+            break
+    return details
+
+def parse_current(pages):
+    parser = ReceiptParser()
+    for page in pages:
+        if parser.feed(page):
+            break
+    return parser.details()
+
+
+def check_samples(max_pages=5):
+    for name, pages, expected in SAMPLE_RECEIPTS:
+        text_details = parse_current(["\n".join(lines) for lines in pages])
+        pdf_details, _ = parse_receipt_bytes(build_receipt_pdf(*pages), max_pages)
+        for source, details in (("текст", text_details), ("PDF", pdf_details)):
+            extracted = {"amount": details["amount"], "number": details["number"]}
+            assert extracted == expected, f"Образец «{name}» ({source}): ожидалось {expected}, получено {extracted}"
+    print(f"Размеченные образцы: {len(SAMPLE_RECEIPTS)} из {len(SAMPLE_RECEIPTS)} разобраны верно")
+
+
+def run_benchmark(name, parse, corpus, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        results = [parse(pages) for _, pages, _ in corpus]
+    elapsed = time.perf_counter() - started
+    correct = Counter()
+    total = Counter()
+    for (kind, _, expected), details in zip(corpus, results):
+        total[kind] += 1
+        if details["amount"] == expected["amount"] and details["number"] == expected["number"]:
+            correct[kind] += 1
+    accuracy = ", ".join(f"{kind} {correct[kind] / total[kind]:.1%}" for kind in sorted(total))
+    print(f"{name:8} {len(corpus) * rounds / elapsed:10.0f} чеков/с   точность: {accuracy}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Скорость и точность разбора текста чеков на синтетическом корпусе.")
+    arg_parser.add_argument("--count", type=int, default=3000, help="размер корпуса")
+    arg_parser.add_argument("--rounds", type=int, default=5, help="сколько раз разобрать корпус")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    check_samples()
+    corpus = generate_corpus(args.count, args.seed)
+    run_benchmark("legacy", parse_legacy, corpus, args.rounds)
+    run_benchmark("parser", parse_current, corpus, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import psycopg2
+
+from queries import to_asyncpg_query
+
+
+FINGERPRINT_LOOKUP_QUERIES = {
+    column: f"""
+        SELECT sha256, file_unique_id, amount, bill_number, receipt_date
+        FROM receipt_fingerprints
+        WHERE {column} = %s
+        LIMIT 1
+    """
+    for column in ("sha256", "file_unique_id")
+}
+
+FINGERPRINT_SAVE_QUERY = """
+    INSERT INTO receipt_fingerprints (sha256, file_unique_id, amount, bill_number, receipt_date)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (sha256) DO UPDATE SET file_unique_id = EXCLUDED.file_unique_id
+"""
+
+
+def fingerprint_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ReceiptFingerprintCacheBase:
+    # Общая часть синхронного и асинхронного кэша: LRU в памяти и счетчики попаданий.
+    # Наследники отличаются только доступом к таблице receipt_fingerprints.
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._by_hash = OrderedDict()
+        self._hash_by_file_id = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, sha256, file_unique_id, details):
+        with self._lock:
+            entry = self._by_hash.get(sha256)
+            if entry is None:
+                entry = (details, set())
+                self._by_hash[sha256] = entry
+            self._by_hash.move_to_end(sha256)
+            if file_unique_id:
+                entry[1].add(file_unique_id)
+                self._hash_by_file_id[file_unique_id] = sha256
+            while len(self._by_hash) > self.max_entries:
+                _, (_, file_ids) = self._by_hash.popitem(last=False)
+                for file_id in file_ids:
+                    self._hash_by_file_id.pop(file_id, None)
+
+    def _lookup_memory(self, file_unique_id=None, sha256=None):
+        with self._lock:
+            if sha256 is None and file_unique_id:
+                sha256 = self._hash_by_file_id.get(file_unique_id)
+            if sha256 is None or sha256 not in self._by_hash:
+                return None
+            self._by_hash.move_to_end(sha256)
+            return dict(self._by_hash[sha256][0])
+
+    def _remember_row(self, row):
+        if row is None:
+            return None
+        sha256, file_unique_id, amount, bill_number, receipt_date = row
+        details = {"amount": amount, "date": receipt_date, "name": None, "number": bill_number}
+        self._remember(sha256, file_unique_id, details)
+        return dict(details)
+
+    def _remember_put(self, sha256, file_unique_id, details):
+        details = {"amount": details["amount"], "date": details["date"], "name": None, "number": details["number"]}
+        self._remember(sha256, file_unique_id, details)
+        return (sha256, file_unique_id, details["amount"], details["number"], details["date"])
+
+    def _count(self, details):
+        with self._lock:
+            if details is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return details
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._by_hash), "hits": self.hits, "misses": self.misses}
+
+
+class ReceiptFingerprintCache(ReceiptFingerprintCacheBase):
+    def __init__(self, get_connection, max_entries=10000):
+        super().__init__(max_entries)
+        self.get_connection = get_connection
+
+    def _lookup_db(self, column, value):
+        if self.get_connection is None:
+            return None
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(FINGERPRINT_LOOKUP_QUERIES[column], (value,))
+                    row = cursor.fetchone()
+        except psycopg2.Error as e:
+            logging.error(f"Ошибка при поиске отпечатка чека в базе данных: {e}")
+            return None
+        return self._remember_row(row)
+
+    def get_by_file_id(self, file_unique_id):
+        if not file_unique_id:
+            return None
+        details = self._lookup_memory(file_unique_id=file_unique_id)
+        if details is None:
+            details = self._lookup_db("file_unique_id", file_unique_id)
+        return self._count(details)
+
+    def get_by_hash(self, sha256, file_unique_id=None):
+        details = self._lookup_memory(sha256=sha256)
+        if details is None:
+            details = self._lookup_db("sha256", sha256)
+        if details is not None and file_unique_id:
+            self._remember(sha256, file_unique_id, details)
+        return self._count(details)
+
+    def put(self, sha256, file_unique_id, details):
+        params = self._remember_put(sha256, file_unique_id, details)
+        if self.get_connection is None:
+            return
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(FINGERPRINT_SAVE_QUERY, params)
+                conn.commit()
+        except psycopg2.Error as e:
+            logging.error(f"Ошибка при сохранении отпечатка чека в базе данных: {e}")
+
+
+class AsyncReceiptFingerprintCache(ReceiptFingerprintCacheBase):
+    def __init__(self, get_pool, max_entries=10000):
+        super().__init__(max_entries)
+        self.get_pool = get_pool
+
+    async def _lookup_db(self, column, value):
+        # asyncpg нужен только асинхронному боту, потоковый его не загружает.
+        import asyncpg
+
+        try:
+            row = await self.get_pool().fetchrow(to_asyncpg_query(FINGERPRINT_LOOKUP_QUERIES[column])[0], value)
+        except (asyncpg.PostgresError, OSError, asyncio.TimeoutError) as e:
+            logging.error(f"Ошибка при поиске отпечатка чека в базе данных: {e}")
+            return None
+        return self._remember_row(row)
+
+    async def get_by_file_id(self, file_unique_id):
+        if not file_unique_id:
+            return None
+        details = self._lookup_memory(file_unique_id=file_unique_id)
+        if details is None:
+            details = await self._lookup_db("file_unique_id", file_unique_id)
+        return self._count(details)
+
+    async def get_by_hash(self, sha256, file_unique_id=None):
+        details = self._lookup_memory(sha256=sha256)
+        if details is None:
+            details = await self._lookup_db("sha256", sha256)
+        if details is not None and file_unique_id:
+            self._remember(sha256, file_unique_id, details)
+        return self._count(details)
+
+    async def put(self, sha256, file_unique_id, details):
+        import asyncpg
+
+        params = self._remember_put(sha256, file_unique_id, details)
+        try:
+            await self.get_pool().execute(to_asyncpg_query(FINGERPRINT_SAVE_QUERY)[0], *params)
+        except (asyncpg.PostgresError, OSError, asyncio.TimeoutError) as e:
+            logging.error(f"Ошибка при сохранении отпечатка чека в базе данных: {e}")
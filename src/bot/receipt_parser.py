@@ -0,0 +1,96 @@
+import re
+
+
+HEADER_LENGTH = 300
+
+AMOUNT_VALUE = r"\d{1,3}(?:[ \u00a0]\d{3})+|\d+"
+AMOUNT_SUFFIX = r"(?:[.,]\d{2})?[ \u00a0]?(?:₸|(?i:тг|kzt)\b)"
+DATE_PATTERN = r"\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}"
+NAME_PATTERN = r"[А-Яа-я]+\s[А-Яа-я]+\."
+
+
+class ReceiptTemplate:
+    def __init__(self, name, markers, number_pattern, total_labels, date_pattern=DATE_PATTERN, name_pattern=NAME_PATTERN):
+        self.name = name
+        self.markers = tuple(marker.lower() for marker in markers)
+        # Все поля ищутся одним проходом finditer по объединенному выражению: итоговая сумма
+        # стоит раньше обычной, поэтому строка «Итого 12 500 ₸» не распознается как сумма товара.
+        # Любое поле начинается с начала слова, и \b отсекает попытки сопоставления внутри слов.
+        self.pattern = re.compile(r"\b(?:" + "|".join((
+            rf"(?i:{'|'.join(total_labels)})[^\d\n]{{0,30}}(?P<total>{AMOUNT_VALUE}){AMOUNT_SUFFIX}",
+            rf"(?P<amount>{AMOUNT_VALUE}){AMOUNT_SUFFIX}",
+            rf"(?P<number>{number_pattern})",
+            rf"(?P<date>{date_pattern})",
+            rf"(?P<name>{name_pattern})",
+        )) + ")")
+
+    def matches(self, header):
+        return any(marker in header for marker in self.markers)
+
+
+RECEIPT_TEMPLATES = (
+    ReceiptTemplate(
+        "kaspi",
+        markers=("kaspi",),
+        number_pattern=r"(?<=№ чека )[A-Z]{2}\d{10}",
+        total_labels=("Итого", "Сумма платежа", "Сумма"),
+    ),
+    ReceiptTemplate(
+        "halyk",
+        markers=("halyk", "народный банк"),
+        number_pattern=r"(?<=№ квитанции )\d{8,12}|(?<=№ чека )[A-Z]{2}\d{10}",
+        total_labels=("Итого", "Сумма перевода", "Сумма"),
+    ),
+)
+
+DEFAULT_TEMPLATE = ReceiptTemplate(
+    "default",
+    markers=(),
+    number_pattern=r"(?<=№ чека )[A-Z]{2}\d{10}",
+    total_labels=("Итого", "Всего", "Сумма"),
+)
+
+
+def select_template(header):
+    header = header[:HEADER_LENGTH].lower()
+    for template in RECEIPT_TEMPLATES:
+        if template.matches(header):
+            return template
+    return DEFAULT_TEMPLATE
+
+
+class ReceiptParser:
+    def __init__(self, template=None):
+        self.template = template
+        self.fields = {}
+
+    @property
+    def complete(self):
+        return "total" in self.fields and "number" in self.fields
+
+    def feed(self, text):
+        # Возвращает True, когда итоговая сумма и номер чека найдены и следующие страницы читать не нужно.
+        if self.template is None:
+            self.template = select_template(text)
+        for match in self.template.pattern.finditer(text):
+            self.fields.setdefault(match.lastgroup, match[match.lastgroup])
+            if len(self.fields) == len(self.template.pattern.groupindex):
+                break
+        # Обычная сумма может оказаться суммой товара, а «Итого» — на следующей странице,
+        # поэтому без итога читаются все страницы до max_pages.
+        return self.complete
+
+    def details(self):
+        amount = self.fields.get("total") or self.fields.get("amount")
+        return {
+            "amount": re.sub(r"\D", "", amount) if amount else None,
+            "date": self.fields.get("date"),
+            "name": self.fields.get("name"),
+            "number": self.fields.get("number"),
+        }
+
+
+def extract_receipt_details(text):
+    parser = ReceiptParser()
+    parser.feed(text)
+    return parser.details()
@@ -0,0 +1,400 @@
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from ocr import ocr_pdf_bytes, tesseract_available
+from receipt_cache import fingerprint_bytes
+from receipt_parser import ReceiptParser, extract_receipt_details
+
+
+ReceiptJob = namedtuple("ReceiptJob", ["chat_id", "user_id", "file_id", "file_unique_id", "file_size"])
+# Первая попытка и один повтор после пересоздания пула из-за чужого чека.
+POOL_ATTEMPTS = 2
+
+
+class ReceiptRejected(Exception):
+    def __init__(self, reason, message="", notify=True):
+        super().__init__(message or reason)
+        self.reason = reason
+        # False — пользователь уже получил такой отказ недавно, повторно не отвечаем.
+        self.notify = notify
+
+
+def parse_receipt_bytes(data, max_pages, max_file_pages=None):
+    # PyPDF2 нужен только процессам разбора чеков, основной процесс его не загружает.
+    import PyPDF2
+
+    pdf_reader = PyPDF2.PdfReader(BytesIO(data))
+    # Число страниц до скачивания неизвестно (Telegram сообщает только размер файла),
+    # поэтому проверяется первым делом после чтения дерева страниц, до извлечения текста.
+    if max_file_pages and len(pdf_reader.pages) > max_file_pages:
+        raise ReceiptRejected("too_many_pages")
+    parser = ReceiptParser()
+    pages_read = 0
+    for page_num, page in enumerate(pdf_reader.pages):
+        if page_num >= max_pages:
+            break
+        pages_read += 1
+        if parser.feed(page.extract_text() or ""):
+            break
+    return parser.details(), pages_read
+
+def receipt_details_complete(details):
+    return bool(details["amount"] and details["number"])
+
+def issue_tickets_params(user_id, details, ticket_price):
+    amount = int(details["amount"])
+    return {
+        "bill_number": details["number"],
+        "user_id": user_id,
+        "amount": amount,
+        "tickets_count": amount // ticket_price,
+    }
+
+def merge_receipt_details(details, ocr_details):
+    return {key: details[key] or ocr_details[key] for key in details}
+
+
+class ReceiptParserPool:
+    def __init__(self, workers=None, max_pages=5, max_file_pages=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pages = max_pages
+        self.max_file_pages = max_file_pages
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _create_executor(self):
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def submit(self, data):
+        with self._lock:
+            executor = self._executor
+        return executor, executor.submit(parse_receipt_bytes, data, self.max_pages, self.max_file_pages)
+
+    def recycle(self, stale_executor):
+        # ProcessPoolExecutor не умеет отменять уже запущенную задачу, поэтому зависший
+        # разбор PDF прерывается пересозданием пула с остановкой его процессов. Остальные
+        # задачи старого пула завершаются с BrokenProcessPool и отправляются в новый пул.
+        with self._lock:
+            if self._executor is not stale_executor:
+                return False
+            self._executor = self._create_executor()
+        for process in list((getattr(stale_executor, "_processes", None) or {}).values()):
+            process.terminate()
+        stale_executor.shutdown(wait=False)
+        logging.warning("Пул обработки чеков пересоздан после сбоя или превышения времени ожидания.")
+        return True
+
+
+class ReceiptOcrPool(ReceiptParserPool):
+    def __init__(self, workers=1, max_pages=1, max_dpi=200, lang="rus+eng", timeout=30.0):
+        super().__init__(workers=workers, max_pages=max_pages)
+        self.max_dpi = max_dpi
+        self.lang = lang
+        self.timeout = timeout
+
+    def submit(self, data):
+        with self._lock:
+            executor = self._executor
+        return executor, executor.submit(ocr_pdf_bytes, data, self.max_pages, self.max_dpi, self.lang, self.timeout)
+
+
+def create_ocr_pool(enabled, **options):
+    if not enabled:
+        return None
+    if not tesseract_available():
+        logging.warning("Tesseract-OCR не найден: распознавание отсканированных чеков отключено.")
+        return None
+    return ReceiptOcrPool(**options)
+
+
+class ReceiptProcessorBase:
+    # Общая часть синхронного и асинхронного обработчиков: проверки, кэш, учет отказов и метрики.
+    # Наследники отличаются только очередью задач и способом ожидания результата пула.
+    def __init__(self, download, on_result, on_error, workers=None, queue_size=100,
+                 job_timeout=20.0, max_pages=5, max_bytes=5 * 1024 * 1024, cache=None, ocr_pool=None,
+                 on_parse_timing=None, max_file_pages=None, admission=None, on_reject=None):
+        self.download = download
+        self.cache = cache
+        # on_parse_timing(stage, seconds, pages) — для метрик: stage равен "text" или "ocr".
+        self.on_parse_timing = on_parse_timing
+        self.on_result = on_result
+        self.on_error = on_error
+        self.job_timeout = job_timeout
+        self.max_bytes = max_bytes
+        self.parser_pool = ReceiptParserPool(workers=workers, max_pages=max_pages, max_file_pages=max_file_pages)
+        self.ocr_pool = ocr_pool
+        self.admission = admission
+        # on_reject(reason) — для метрик, вызывается при каждом отказе в обработке чека.
+        self.on_reject = on_reject
+        self.rejections = Counter()
+        self._rejections_lock = threading.Lock()
+        self.workers = self.parser_pool.workers
+        self.queue_size = queue_size
+
+    def _start_pools(self):
+        self.parser_pool.start()
+        if self.ocr_pool is not None:
+            self.ocr_pool.start()
+        logging.info(f"Обработчик чеков запущен: {self.workers} процессов, очередь на {self.queue_size} чеков.")
+
+    def _shutdown_pools(self):
+        self.parser_pool.shutdown()
+        if self.ocr_pool is not None:
+            self.ocr_pool.shutdown()
+
+    def _count_rejection(self, reason):
+        with self._rejections_lock:
+            self.rejections[reason] += 1
+        if self.on_reject is not None:
+            self.on_reject(reason)
+
+    def _reject(self, reason, notify=True):
+        self._count_rejection(reason)
+        return ReceiptRejected(reason, notify=notify)
+
+    def _check_size(self, job):
+        if job.file_size and job.file_size > self.max_bytes:
+            raise self._reject("too_large")
+
+    def _admit(self, job):
+        if self.admission is not None:
+            rejection = self.admission.admit(job.user_id)
+            if rejection is not None:
+                raise self._reject(*rejection)
+
+    def _release(self, job):
+        if self.admission is not None:
+            self.admission.release(job.user_id)
+
+    def _failure_reason(self, job, error):
+        if isinstance(error, ReceiptRejected):
+            reason = error.reason
+        else:
+            logging.error(f"Ошибка при обработке PDF чека пользователя {job.user_id}: {error}")
+            reason = "error"
+        self._count_rejection(reason)
+        return reason
+
+    def _retry_after_broken_pool(self, pool, executor, attempt):
+        # Задача, попавшая под пересоздание пула из-за чужого чека, повторяется в новом пуле
+        # один раз; повторный сбой считается ошибкой самого чека.
+        pool.recycle(executor)
+        if attempt + 1 == POOL_ATTEMPTS:
+            return False
+        logging.warning("Чек повторно отправлен в пересозданный пул обработки.")
+        return True
+
+    def _observe_parse(self, stage, started, pages=None):
+        if self.on_parse_timing is not None:
+            self.on_parse_timing(stage, time.perf_counter() - started, pages)
+
+    def _needs_ocr(self, details):
+        return self.ocr_pool is not None and not receipt_details_complete(details)
+
+    def _fingerprint(self, data):
+        if len(data) > self.max_bytes:
+            raise ReceiptRejected("too_large")
+        return fingerprint_bytes(data) if self.cache is not None else None
+
+    def _cacheable(self, details):
+        # Неполный результат не кэшируется: после исправления разбора или включения OCR
+        # тот же файл должен обрабатываться заново.
+        return self.cache is not None and receipt_details_complete(details)
+
+
+class ReceiptProcessor(ReceiptProcessorBase):
+    def __init__(self, download, on_result, on_error, **options):
+        super().__init__(download, on_result, on_error, **options)
+        # Задача ждет свободный процесс OCR до отправки в пул, иначе время ожидания в очереди
+        # пула засчитывалось бы в timeout и прерывало бы уже идущее распознавание.
+        self._ocr_slots = threading.BoundedSemaphore(self.ocr_pool.workers) if self.ocr_pool is not None else None
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._threads = []
+
+    def start(self):
+        self._start_pools()
+        for worker_num in range(self.workers):
+            thread = threading.Thread(target=self._dispatch_loop, name=f"receipt-dispatch-{worker_num}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._shutdown_pools()
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def submit(self, job):
+        self._check_size(job)
+        self._admit(job)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._release(job)
+            raise self._reject("busy")
+
+    def _run_in_pool(self, pool, data, timeout):
+        for attempt in range(POOL_ATTEMPTS):
+            executor, future = pool.submit(data)
+            try:
+                return future.result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                pool.recycle(executor)
+                raise ReceiptRejected("timeout")
+            except BrokenProcessPool:
+                if not self._retry_after_broken_pool(pool, executor, attempt):
+                    raise
+
+    def _parse(self, data):
+        started = time.perf_counter()
+        details, pages = self._run_in_pool(self.parser_pool, data, self.job_timeout)
+        self._observe_parse("text", started, pages)
+        if not self._needs_ocr(details):
+            return details
+        with self._ocr_slots:
+            started = time.perf_counter()
+            text = self._run_in_pool(self.ocr_pool, data, self.ocr_pool.timeout + self.job_timeout)
+            self._observe_parse("ocr", started)
+        return merge_receipt_details(details, extract_receipt_details(text))
+
+    def _process(self, job):
+        details = self.cache.get_by_file_id(job.file_unique_id) if self.cache is not None else None
+        if details is not None:
+            return details
+        data = self.download(job.file_id)
+        sha256 = self._fingerprint(data)
+        details = self.cache.get_by_hash(sha256, job.file_unique_id) if sha256 is not None else None
+        if details is None:
+            details = self._parse(data)
+            if self._cacheable(details):
+                self.cache.put(sha256, job.file_unique_id, details)
+        return details
+
+    def _dispatch_loop(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                try:
+                    details = self._process(job)
+                except Exception as e:
+                    self.on_error(job, self._failure_reason(job, e))
+                else:
+                    self.on_result(job, details)
+            except Exception as e:
+                logging.error(f"Ошибка при отправке результата обработки чека пользователю {job.user_id}: {e}")
+            finally:
+                if job is not None:
+                    self._release(job)
+                self._queue.task_done()
+
+
+class AsyncReceiptProcessor(ReceiptProcessorBase):
+    def __init__(self, download, on_result, on_error, **options):
+        super().__init__(download, on_result, on_error, **options)
+        self._ocr_slots = None
+        self._slots = None
+        self._tasks = set()
+
+    def start(self):
+        self._slots = asyncio.Semaphore(self.workers)
+        if self.ocr_pool is not None:
+            self._ocr_slots = asyncio.Semaphore(self.ocr_pool.workers)
+        self._start_pools()
+
+    async def stop(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._shutdown_pools()
+
+    def queue_depth(self):
+        return max(len(self._tasks) - self.workers, 0)
+
+    def submit(self, job):
+        self._check_size(job)
+        if len(self._tasks) >= self.queue_size + self.workers:
+            raise self._reject("busy")
+        self._admit(job)
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_in_pool(self, pool, data, timeout):
+        for attempt in range(POOL_ATTEMPTS):
+            executor, future = pool.submit(data)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+            except asyncio.TimeoutError:
+                pool.recycle(executor)
+                raise ReceiptRejected("timeout")
+            except BrokenProcessPool:
+                if not self._retry_after_broken_pool(pool, executor, attempt):
+                    raise
+
+    async def _parse(self, data):
+        started = time.perf_counter()
+        details, pages = await self._run_in_pool(self.parser_pool, data, self.job_timeout)
+        self._observe_parse("text", started, pages)
+        if not self._needs_ocr(details):
+            return details
+        async with self._ocr_slots:
+            started = time.perf_counter()
+            text = await self._run_in_pool(self.ocr_pool, data, self.ocr_pool.timeout + self.job_timeout)
+            self._observe_parse("ocr", started)
+        return merge_receipt_details(details, extract_receipt_details(text))
+
+    async def _process(self, job):
+        details = await self.cache.get_by_file_id(job.file_unique_id) if self.cache is not None else None
+        if details is not None:
+            return details
+        data = await self.download(job.file_id)
+        sha256 = self._fingerprint(data)
+        details = await self.cache.get_by_hash(sha256, job.file_unique_id) if sha256 is not None else None
+        if details is None:
+            details = await self._parse(data)
+            if self._cacheable(details):
+                await self.cache.put(sha256, job.file_unique_id, details)
+        return details
+
+    async def _run(self, job):
+        try:
+            async with self._slots:
+                try:
+                    details = await self._process(job)
+                except Exception as e:
+                    await self.on_error(job, self._failure_reason(job, e))
+                else:
+                    await self.on_result(job, details)
+        except Exception as e:
+            logging.error(f"Ошибка при отправке результата обработки чека пользователю {job.user_id}: {e}")
+        finally:
+            self._release(job)
@@ -0,0 +1,31 @@
+import tempfile
+
+
+EXPORT_FETCH_SIZE = 2000
+EXPORT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+class UsersReportWriter:
+    headers = ["User ID", "Фамилия", "Имя", "Адрес", "Номер телефона", "Количество билетов", "ID билета", "Дата билета"]
+
+    def __init__(self):
+        # openpyxl импортируется только при выгрузке: это треть времени запуска бота.
+        import openpyxl
+
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.worksheet = self.workbook.create_sheet("Users and Tickets")
+        self.worksheet.append(self.headers)
+
+    def append(self, row):
+        user_data = list(row[:6])
+        ticket_id, created_at = row[6], row[7]
+        if ticket_id is not None:
+            self.worksheet.append(user_data + [ticket_id, created_at.strftime('%d.%m.%Y %H:%M')])
+        else:
+            self.worksheet.append(user_data + ["Нет билетов", "N/A"])
+
+    def finish(self):
+        report_file = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+        self.workbook.save(report_file)
+        report_file.seek(0)
+        return report_file
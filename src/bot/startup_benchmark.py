@@ -0,0 +1,98 @@
+import argparse
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from fake_telegram import FakeTelegramServer
+from load_test import BOT_TOKEN, spawn_bot
+
+
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Для импорта достаточно заполненных обязательных переменных, подключение к БД при импорте не открывается.
+IMPORT_ENV = {"BOT_TOKEN": BOT_TOKEN, "DB_HOST": "localhost", "DB_NAME": "bot", "DB_USER": "bot",
+              "DB_PASSWORD": "bot", "ADMIN_USER_ID": "1"}
+
+
+def parse_import_times(stderr):
+    # Строка -X importtime: "import time: self [us] | cumulative | <отступ>модуль".
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), depth, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules
+
+def measure_import(module):
+    env = dict(os.environ, **{name: os.getenv(name) or value for name, value in IMPORT_ENV.items()})
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=BOT_DIR, env=env,
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"Не удалось импортировать {module}:\n{result.stderr[-2000:]}")
+    return wall, parse_import_times(result.stderr)
+
+def import_report(module, runs, top):
+    walls, totals, runs_modules = [], [], []
+    for _ in range(runs):
+        wall, modules = measure_import(module)
+        walls.append(wall)
+        totals.append(next(cumulative for name, depth, _, cumulative in modules if name == module and depth == 0))
+        runs_modules.append(modules)
+    # Прямые зависимости модуля из запуска с медианным временем импорта.
+    median_run = runs_modules[sorted(range(runs), key=totals.__getitem__)[runs // 2]]
+    children = sorted(((cumulative, name) for name, depth, _, cumulative in median_run if depth == 1), reverse=True)
+    lines = [f"import {module}: медиана {statistics.median(totals):.0f} мс, минимум {min(totals):.0f} мс "
+             f"(процесс целиком: {statistics.median(walls) * 1000:.0f} мс, запусков: {runs})"]
+    lines.extend(f"  {cumulative:8.1f} мс  {name}" for cumulative, name in children[:top])
+    return "\n".join(lines)
+
+def measure_time_to_polling(runtime, timeout, log_path):
+    # Время от запуска процесса до первого getUpdates: бот применил схему и начал принимать обновления.
+    server = FakeTelegramServer(port=0)
+    server.start()
+    started = time.perf_counter()
+    process, log_file = spawn_bot(server.url, log_path, runtime)
+    try:
+        deadline = started + timeout
+        while not server.requests.get("getUpdates"):
+            if process.poll() is not None:
+                raise RuntimeError(f"Бот завершился с кодом {process.returncode}, вывод: {log_path}")
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"Бот не начал получать обновления за {timeout} с, вывод: {log_path}")
+            time.sleep(0.005)
+        return time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        log_file.close()
+        server.stop()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Время запуска бота: импорт модулей и время до первого getUpdates.")
+    arg_parser.add_argument("--runs", type=int, default=5, help="сколько раз повторить каждое измерение")
+    arg_parser.add_argument("--top", type=int, default=10, help="сколько самых дорогих импортов показать")
+    arg_parser.add_argument("--runtime", choices=("threaded", "async"), default="threaded")
+    arg_parser.add_argument("--serve", action="store_true",
+                            help="измерить время до первого getUpdates на тестовом Bot API (DB_* берутся из окружения)")
+    arg_parser.add_argument("--timeout", type=float, default=30, help="ограничение времени одного запуска для --serve")
+    arg_parser.add_argument("--bot-log", default="startup_benchmark_bot.log", help="куда писать вывод запущенного бота")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    # main.py только выбирает режим, поэтому измеряется импорт модуля выбранного режима.
+    print(import_report("async_main" if args.runtime == "async" else "threaded_main", args.runs, args.top))
+    if args.serve:
+        times = [measure_time_to_polling(args.runtime, args.timeout, args.bot_log) for _ in range(args.runs)]
+        print(f"До первого getUpdates ({args.runtime}): медиана {statistics.median(times) * 1000:.0f} мс, "
+              f"минимум {min(times) * 1000:.0f} мс, максимум {max(times) * 1000:.0f} мс")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+from telebot.asyncio_storage import StateStorageBase as AsyncStateStorageBase
+from telebot.asyncio_storage.base_storage import StateDataContext as AsyncStateDataContext
+from telebot.storage import StateStorageBase
+from telebot.storage.base_storage import StateDataContext
+
+from queries import to_asyncpg_query
+
+
+KEY_PREFIX = "st"
+KEY_SEPARATOR = ":"
+
+
+def _state_name(state):
+    return state.name if hasattr(state, "name") else state
+
+
+class TTLStateMemoryStorage(StateStorageBase):
+    def __init__(self, ttl=3600, max_entries=100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        return self._get_key(chat_id, user_id, KEY_PREFIX, KEY_SEPARATOR, business_connection_id, message_thread_id, bot_id)
+
+    def _live_record(self, key):
+        record = self._records.get(key)
+        if record is None:
+            return None
+        if record["expires_at"] <= time.monotonic():
+            del self._records[key]
+            return None
+        return record
+
+    def _touch(self, key, record):
+        record["expires_at"] = time.monotonic() + self.ttl
+        self._records[key] = record
+        self._records.move_to_end(key)
+        now = time.monotonic()
+        while self._records:
+            oldest_key, oldest = next(iter(self._records.items()))
+            if len(self._records) <= self.max_entries and oldest["expires_at"] > now:
+                break
+            del self._records[oldest_key]
+
+    def set_state(self, chat_id, user_id, state, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        with self._lock:
+            record = self._live_record(key) or {"data": {}}
+            record["state"] = _state_name(state)
+            self._touch(key, record)
+        return True
+
+    def get_state(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        with self._lock:
+            record = self._live_record(key)
+            return record["state"] if record else None
+
+    def delete_state(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        with self._lock:
+            return self._records.pop(key, None) is not None
+
+    def set_data(self, chat_id, user_id, key, value, business_connection_id=None, message_thread_id=None, bot_id=None):
+        record_key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        with self._lock:
+            record = self._live_record(record_key)
+            if record is None:
+                raise RuntimeError(f"TTLStateMemoryStorage: ключ {record_key} не существует.")
+            record["data"][key] = value
+            self._touch(record_key, record)
+        return True
+
+    def get_data(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        with self._lock:
+            record = self._live_record(key)
+            return dict(record["data"]) if record else {}
+
+    def reset_data(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        with self._lock:
+            record = self._live_record(key)
+            if record is None:
+                return False
+            record["data"] = {}
+        return True
+
+    def get_interactive_data(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        return StateDataContext(self, chat_id=chat_id, user_id=user_id, business_connection_id=business_connection_id,
+                                message_thread_id=message_thread_id, bot_id=bot_id)
+
+    def save(self, chat_id, user_id, data, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        with self._lock:
+            record = self._live_record(key)
+            if record is None:
+                return False
+            record["data"] = data
+            self._touch(key, record)
+        return True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+
+class AsyncTTLStateMemoryStorage(AsyncStateStorageBase):
+    def __init__(self, ttl=3600, max_entries=100000):
+        self.storage = TTLStateMemoryStorage(ttl=ttl, max_entries=max_entries)
+
+    async def set_state(self, *args, **kwargs):
+        return self.storage.set_state(*args, **kwargs)
+
+    async def get_state(self, *args, **kwargs):
+        return self.storage.get_state(*args, **kwargs)
+
+    async def delete_state(self, *args, **kwargs):
+        return self.storage.delete_state(*args, **kwargs)
+
+    async def set_data(self, *args, **kwargs):
+        return self.storage.set_data(*args, **kwargs)
+
+    async def get_data(self, *args, **kwargs):
+        return self.storage.get_data(*args, **kwargs)
+
+    async def reset_data(self, *args, **kwargs):
+        return self.storage.reset_data(*args, **kwargs)
+
+    def get_interactive_data(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        return AsyncStateDataContext(self, chat_id=chat_id, user_id=user_id, business_connection_id=business_connection_id,
+                                     message_thread_id=message_thread_id, bot_id=bot_id)
+
+    async def save(self, *args, **kwargs):
+        return self.storage.save(*args, **kwargs)
+
+
+GET_STATE_QUERY = "SELECT state FROM conversation_states WHERE state_key = %s AND expires_at > now()"
+GET_DATA_QUERY = "SELECT data FROM conversation_states WHERE state_key = %s AND expires_at > now()"
+SET_STATE_QUERY = """
+    INSERT INTO conversation_states (state_key, state, data, expires_at)
+    VALUES (%s, %s, '{}'::jsonb, now() + %s::float8 * interval '1 second')
+    ON CONFLICT (state_key) DO UPDATE
+    SET state = EXCLUDED.state,
+        expires_at = EXCLUDED.expires_at,
+        data = CASE WHEN conversation_states.expires_at > now() THEN conversation_states.data ELSE '{}'::jsonb END
+"""
+SET_DATA_QUERY = """
+    UPDATE conversation_states
+    SET data = data || jsonb_build_object(%s::text, %s::jsonb),
+        expires_at = now() + %s::float8 * interval '1 second'
+    WHERE state_key = %s AND expires_at > now()
+"""
+SAVE_DATA_QUERY = """
+    UPDATE conversation_states
+    SET data = %s::jsonb,
+        expires_at = now() + %s::float8 * interval '1 second'
+    WHERE state_key = %s AND expires_at > now()
+"""
+RESET_DATA_QUERY = "UPDATE conversation_states SET data = '{}'::jsonb WHERE state_key = %s AND expires_at > now()"
+DELETE_STATE_QUERY = "DELETE FROM conversation_states WHERE state_key = %s"
+PURGE_EXPIRED_QUERY = "DELETE FROM conversation_states WHERE expires_at <= now()"
+
+
+class PostgresStateStorage(StateStorageBase):
+    def __init__(self, get_connection, ttl=3600, purge_interval=300):
+        self.get_connection = get_connection
+        self.ttl = float(ttl)
+        self.purge_interval = purge_interval
+        self._next_purge = time.monotonic() + purge_interval
+
+    def _key(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        return self._get_key(chat_id, user_id, KEY_PREFIX, KEY_SEPARATOR, business_connection_id, message_thread_id, bot_id)
+
+    def _execute(self, query, params, fetch=False):
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                result = cursor.fetchone() if fetch else cursor.rowcount
+            conn.commit()
+        return result
+
+    def _purge_expired(self):
+        if time.monotonic() < self._next_purge:
+            return
+        self._next_purge = time.monotonic() + self.purge_interval
+        try:
+            deleted = self._execute(PURGE_EXPIRED_QUERY, ())
+            if deleted:
+                logging.info(f"Удалено {deleted} устаревших состояний диалогов.")
+        except psycopg2.Error as e:
+            logging.error(f"Ошибка при очистке устаревших состояний диалогов: {e}")
+
+    def set_state(self, chat_id, user_id, state, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        self._execute(SET_STATE_QUERY, (key, _state_name(state), self.ttl))
+        self._purge_expired()
+        return True
+
+    def get_state(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        row = self._execute(GET_STATE_QUERY, (key,), fetch=True)
+        return row[0] if row else None
+
+    def delete_state(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        return self._execute(DELETE_STATE_QUERY, (key,)) > 0
+
+    def set_data(self, chat_id, user_id, key, value, business_connection_id=None, message_thread_id=None, bot_id=None):
+        record_key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        if not self._execute(SET_DATA_QUERY, (key, json.dumps(value), self.ttl, record_key)):
+            raise RuntimeError(f"PostgresStateStorage: ключ {record_key} не существует.")
+        return True
+
+    def get_data(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        row = self._execute(GET_DATA_QUERY, (key,), fetch=True)
+        return row[0] if row else {}
+
+    def reset_data(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        return self._execute(RESET_DATA_QUERY, (key,)) > 0
+
+    def get_interactive_data(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        return StateDataContext(self, chat_id=chat_id, user_id=user_id, business_connection_id=business_connection_id,
+                                message_thread_id=message_thread_id, bot_id=bot_id)
+
+    def save(self, chat_id, user_id, data, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        return self._execute(SAVE_DATA_QUERY, (json.dumps(data), self.ttl, key)) > 0
+
+
+class AsyncPostgresStateStorage(AsyncStateStorageBase):
+    def __init__(self, get_pool, ttl=3600, purge_interval=300):
+        self.get_pool = get_pool
+        self.ttl = float(ttl)
+        self.purge_interval = purge_interval
+        self._next_purge = time.monotonic() + purge_interval
+
+    def _key(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        return self._get_key(chat_id, user_id, KEY_PREFIX, KEY_SEPARATOR, business_connection_id, message_thread_id, bot_id)
+
+    async def _execute(self, query, *params):
+        status = await self.get_pool().execute(to_asyncpg_query(query)[0], *params)
+        return int(status.split()[-1])
+
+    async def _fetchval(self, query, *params):
+        return await self.get_pool().fetchval(to_asyncpg_query(query)[0], *params)
+
+    async def _purge_expired(self):
+        if time.monotonic() < self._next_purge:
+            return
+        self._next_purge = time.monotonic() + self.purge_interval
+        deleted = await self._execute(PURGE_EXPIRED_QUERY)
+        if deleted:
+            logging.info(f"Удалено {deleted} устаревших состояний диалогов.")
+
+    async def set_state(self, chat_id, user_id, state, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        await self._execute(SET_STATE_QUERY, key, _state_name(state), self.ttl)
+        await self._purge_expired()
+        return True
+
+    async def get_state(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        return await self._fetchval(GET_STATE_QUERY, key)
+
+    async def delete_state(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        return await self._execute(DELETE_STATE_QUERY, key) > 0
+
+    async def set_data(self, chat_id, user_id, key, value, business_connection_id=None, message_thread_id=None, bot_id=None):
+        record_key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        if not await self._execute(SET_DATA_QUERY, key, json.dumps(value), self.ttl, record_key):
+            raise RuntimeError(f"AsyncPostgresStateStorage: ключ {record_key} не существует.")
+        return True
+
+    async def get_data(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        data = await self._fetchval(GET_DATA_QUERY, key)
+        return json.loads(data) if data else {}
+
+    async def reset_data(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        return await self._execute(RESET_DATA_QUERY, key) > 0
+
+    def get_interactive_data(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None):
+        return AsyncStateDataContext(self, chat_id=chat_id, user_id=user_id, business_connection_id=business_connection_id,
+                                     message_thread_id=message_thread_id, bot_id=bot_id)
+
+    async def save(self, chat_id, user_id, data, business_connection_id=None, message_thread_id=None, bot_id=None):
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        return await self._execute(SAVE_DATA_QUERY, json.dumps(data), self.ttl, key) > 0
@@ -0,0 +1,258 @@
+import telebot
+from telebot import apihelper, custom_filters
+import psycopg2
+import functools
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+from config import (
+    BOT_TOKEN, BOT_UPDATE_MODE, DB_HOST, DB_NAME, DB_PASSWORD, DB_POOL_HEALTHCHECK_INTERVAL, DB_POOL_MAX, DB_POOL_MIN,
+    DB_POOL_TIMEOUT, DB_PREPARED_STATEMENTS, DB_USER, RECEIPT_CACHE_SIZE, STATE_MAX_ENTRIES, STATE_STORAGE, STATE_TTL,
+    TELEGRAM_API_URL, USER_CACHE_NEGATIVE_TTL, USER_CACHE_NOTIFY, USER_CACHE_SIZE, USER_CACHE_TTL, WEBHOOK_BATCH_SIZE,
+    WEBHOOK_HOST, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_QUEUE_SIZE, WEBHOOK_SECRET_TOKEN, WEBHOOK_URL, WEBHOOK_WORKERS,
+    WELCOME_IMAGE_PATH
+)
+from app import BotApp, SchemaMigrator
+from broadcast import Broadcaster
+from db import ConnectionPool, PreparedConnection
+from metrics import BotMetrics
+from media import StaticMediaRegistry
+from queries import create_query_registry
+from receipt_cache import ReceiptFingerprintCache
+from receipts import ReceiptProcessor
+from state_storage import PostgresStateStorage, TTLStateMemoryStorage
+from user_cache import RegisteredUserCache, UserCacheListener
+from user_import import IMPORT_COPY_SQL, CopyStream
+from webhook import WEBHOOK_MAX_CONNECTIONS, UpdateDispatcher, WebhookServer
+
+db_conn_kwargs = {
+    "host": DB_HOST,
+    "database": DB_NAME,
+    "user": DB_USER,
+    "password": DB_PASSWORD,
+}
+
+
+def run_sync(coroutine):
+    # Общие обработчики (app.py) — корутины, но с блокирующими адаптерами этого модуля они ни разу
+    # не приостанавливаются: один шаг выполняет корутину до конца в текущем потоке.
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError("Обработчик приостановился в потоковом режиме.")
+
+
+class AwaitableBot:
+    # Методы TeleBot в виде корутин, которые выполняются сразу.
+    def __init__(self, bot):
+        self._bot = bot
+
+    def __getattr__(self, name):
+        method = getattr(self._bot, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+    @asynccontextmanager
+    async def retrieve_data(self, user_id, chat_id):
+        with self._bot.retrieve_data(user_id, chat_id) as data:
+            yield data
+
+
+class CursorSession:
+    def __init__(self, query_registry, conn, cursor):
+        self.query_registry = query_registry
+        self.conn = conn
+        self.cursor = cursor
+
+    async def execute(self, name, params=None):
+        self.query_registry.execute(self.cursor, name, params)
+
+    async def fetchrow(self, name, params=None):
+        self.query_registry.execute(self.cursor, name, params)
+        return self.cursor.fetchone()
+
+    async def fetch(self, name, params=None):
+        self.query_registry.execute(self.cursor, name, params)
+        return self.cursor.fetchall()
+
+    async def fetchval(self, name, params=None):
+        row = await self.fetchrow(name, params)
+        return row[0] if row else None
+
+    async def run_script(self, name):
+        self.cursor.execute(self.query_registry.script(name))
+
+    async def copy_import(self, import_id, records):
+        self.cursor.copy_expert(IMPORT_COPY_SQL, CopyStream(import_id, records))
+
+    async def stream(self, name, fetch_size):
+        with self.conn.cursor(name=name) as cursor:
+            cursor.itersize = fetch_size
+            self.query_registry.execute(cursor, name)
+            for row in cursor:
+                yield row
+
+    async def validate_queries(self):
+        return self.query_registry.validate(self.cursor)
+
+
+class ThreadedDatabase:
+    errors = (psycopg2.Error,)
+    undefined_table_error = psycopg2.errors.UndefinedTable
+
+    def __init__(self, db_pool, query_registry):
+        self.db_pool = db_pool
+        self.query_registry = query_registry
+
+    @asynccontextmanager
+    async def connection(self):
+        # psycopg2 всегда открывает транзакцию: она фиксируется, когда блок завершился без ошибки.
+        with self.db_pool.connection() as conn:
+            with conn.cursor() as cursor:
+                yield CursorSession(self.query_registry, conn, cursor)
+            conn.commit()
+
+    @asynccontextmanager
+    async def transaction(self, isolation=None):
+        async with self.connection() as db:
+            if isolation is not None:
+                db.cursor.execute(f"SET TRANSACTION ISOLATION LEVEL {isolation.replace('_', ' ').upper()}")
+            yield db
+
+    def pool_stats(self):
+        return self.db_pool.stats()
+
+
+class ThreadedBotApp(BotApp):
+    api_errors = (apihelper.ApiException,)
+    broadcaster_class = Broadcaster
+    receipt_processor_class = ReceiptProcessor
+
+    def __init__(self, bot, database, user_cache, static_media, bot_metrics):
+        self._upload_lock = threading.Lock()
+        fingerprint_cache = ReceiptFingerprintCache(database.db_pool.connection, max_entries=RECEIPT_CACHE_SIZE)
+        super().__init__(database, AwaitableBot(bot), bot, database.query_registry, user_cache, static_media,
+                         bot_metrics, fingerprint_cache)
+
+    def callback(self, method):
+        @functools.wraps(method)
+        def run(*args, **kwargs):
+            return run_sync(method(*args, **kwargs))
+        return run
+
+    @asynccontextmanager
+    async def upload_lock(self):
+        with self._upload_lock:
+            yield
+
+    async def to_thread(self, function, *args):
+        return function(*args)
+
+    async def import_records(self, user_import):
+        return user_import.records()
+
+
+def create_database():
+    # Пул открывает соединения при первом запросе, поэтому создание ничего не стоит.
+    db_pool = ConnectionPool(
+        minconn=DB_POOL_MIN,
+        maxconn=DB_POOL_MAX,
+        timeout=DB_POOL_TIMEOUT,
+        healthcheck_interval=DB_POOL_HEALTHCHECK_INTERVAL,
+        connection_factory=PreparedConnection,
+        **db_conn_kwargs
+    )
+    return ThreadedDatabase(db_pool, create_query_registry(use_prepared=DB_PREPARED_STATEMENTS))
+
+def create_bot(database):
+    if STATE_STORAGE == "postgres":
+        state_storage = PostgresStateStorage(database.db_pool.connection, ttl=STATE_TTL)
+    else:
+        state_storage = TTLStateMemoryStorage(ttl=STATE_TTL, max_entries=STATE_MAX_ENTRIES)
+    bot = telebot.TeleBot(BOT_TOKEN, threaded=BOT_UPDATE_MODE != "webhook", state_storage=state_storage)
+    bot.add_custom_filter(custom_filters.StateFilter(bot))
+    return bot
+
+
+def run_webhook(bot, bot_metrics):
+    if WEBHOOK_URL:
+        bot.set_webhook(url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET_TOKEN,
+                        max_connections=min(WEBHOOK_MAX_CONNECTIONS, WEBHOOK_WORKERS * 10))
+    update_dispatcher = UpdateDispatcher(bot.process_new_updates, workers=WEBHOOK_WORKERS,
+                                         queue_size=WEBHOOK_QUEUE_SIZE, batch_size=WEBHOOK_BATCH_SIZE)
+    webhook_server = WebhookServer(WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN, update_dispatcher)
+    bot_metrics.registry.gauge("update_queue_depth", "Обновления Telegram, ожидающие обработки.",
+                               lambda: sum(update_dispatcher.queue_depths()))
+    update_dispatcher.start()
+    logging.info("Бот запущен (режим webhook).")
+    try:
+        webhook_server.serve_forever()
+    finally:
+        webhook_server.shutdown()
+        update_dispatcher.stop()
+
+
+def warm_up_db_pool(db_pool):
+    try:
+        db_pool.warmup()
+    except psycopg2.Error as e:
+        logging.error(f"Не удалось заранее открыть соединения с базой данных: {e}")
+
+
+def check():
+    database = create_database()
+    try:
+        return run_sync(SchemaMigrator(database, database.query_registry).check_readiness())
+    finally:
+        database.db_pool.closeall()
+
+def main():
+    if TELEGRAM_API_URL:
+        apihelper.API_URL = TELEGRAM_API_URL + "/bot{0}/{1}"
+        apihelper.FILE_URL = TELEGRAM_API_URL + "/file/bot{0}/{1}"
+
+    database = create_database()
+    run_sync(SchemaMigrator(database, database.query_registry).migrate())
+    # Остальные соединения пула открываются в фоне: первые обновления не ждут их установки.
+    threading.Thread(target=warm_up_db_pool, args=(database.db_pool,), name="db-pool-warmup", daemon=True).start()
+
+    user_cache = RegisteredUserCache(ttl=USER_CACHE_TTL, negative_ttl=USER_CACHE_NEGATIVE_TTL, max_entries=USER_CACHE_SIZE)
+    static_media = StaticMediaRegistry()
+    static_media.register("welcome_image", WELCOME_IMAGE_PATH)
+    bot_metrics = BotMetrics()
+    bot = create_bot(database)
+    app = ThreadedBotApp(bot, database, user_cache, static_media, bot_metrics)
+    app.register_handlers()
+
+    run_sync(app.load_static_media())
+    run_sync(app.resume_broadcast())
+    user_cache_listener = UserCacheListener(user_cache, db_conn_kwargs) if USER_CACHE_NOTIFY else None
+    if user_cache_listener is not None:
+        user_cache_listener.start()
+    app.receipt_processor.start()
+    metrics_server, profiler = app.start_metrics()
+    try:
+        if BOT_UPDATE_MODE == "webhook":
+            run_webhook(bot, bot_metrics)
+        else:
+            logging.info("Бот запущен.")
+            bot.polling(non_stop=True)
+    finally:
+        app.receipt_processor.stop()
+        if user_cache_listener is not None:
+            user_cache_listener.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if profiler is not None:
+            profiler.stop()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,286 @@
+import re
+
+from telebot.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
+
+
+WELCOME_MESSAGE = (
+    "🎉 *Добро пожаловать в Конкурс Бот!* 🎉\n\n"
+    "Приветствую! 👋 Я помогу вам получить билеты для участия в захватывающих конкурсах. 🚀\n\n"
+    "💰 *Стоимость билета:* 7900 ТГ за участие\n"
+    "📜 *Правила конкурса:*\n\n"
+    "Ваш чек должен включать сумму *не менее* 7900 ТГ.\n"
+    "Если сумма чека, например, 15800 ТГ, вы получите *2 билета* и так далее.\n"
+    "Для участия отправьте чек в формате *PDF*.\n\n"
+    "📌 *Команды меню:* 📌\n"
+    "🎫 */Мои билеты* – Показывает ваши билеты в текущем конкурсе.\n"
+    "🎟️ */Получить билеты* – Отправьте чек и получите свои билеты!\n"
+    "🏆 */Результаты* – Узнайте результаты прошедших и будущих конкурсов!\n\n"
+    "👇 Нажмите *«Получить билет»*, чтобы участвовать! 👇\n"
+    "🔔 Следите за обновлениями и не пропустите объявления о новых конкурсах! 🔔\n"
+)
+
+RESULTS_MESSAGE = (
+    "🏆 <b>Результаты конкурса будут опубликованы позже!</b> 🏆\n\n"
+    "Ожидайте объявлений! 🔔"
+)
+
+DETAILED_RESULTS_MESSAGE = (
+    "📜 <b>Подробная информация о результатах конкурса:</b> 📜\n\n"
+    "Результаты будут определены случайным образом среди всех участников, "
+    "получивших билеты. Следите за новостями в канале! 📢\n\n"
+    "Дата объявления результатов: <b>[Дата будет объявлена позже]</b>. 📅\n"
+    "Призовой фонд: <b>[Призовой фонд будет объявлен позже]</b>. 🎁\n\n"
+    "Желаем всем удачи! 👍"
+)
+
+RECEIPT_REJECTION_MESSAGES = {
+    "too_large": "❌ Файл чека слишком большой. Пожалуйста, отправьте чек в формате *PDF* размером до {max_mb} МБ. ❌",
+    "busy": "⏳ Сейчас обрабатывается слишком много чеков. Пожалуйста, отправьте чек еще раз через пару минут. ⏳",
+    "rate_limited": "⏳ Вы отправляете чеки слишком часто. Пожалуйста, подождите немного и отправьте чек снова. ⏳",
+    "in_flight": "⏳ Ваши предыдущие чеки еще обрабатываются. Дождитесь результата и отправьте следующий чек. ⏳",
+    "too_many_pages": "❌ В файле слишком много страниц. Пожалуйста, отправьте чек в формате *PDF* не длиннее {max_pages} страниц. ❌",
+    "timeout": "❌ Не удалось обработать чек за отведенное время. Пожалуйста, убедитесь, что чек корректный и в формате *PDF*. ❌",
+    "error": "❌ Произошла ошибка при обработке чека. Пожалуйста, попробуйте позже. ❌",
+}
+
+NO_PERMISSION_MESSAGE = "🚫 У вас нет прав на выполнение этого действия. 🚫"
+NOT_REGISTERED_MESSAGE = "❌ Вы не зарегистрированы. ❌"
+ERROR_MESSAGE = "❌ {error} ❌"
+MAIN_MENU_MESSAGE = "✨ *Выберите действие:* ✨"
+BACK_TO_MENU_MESSAGE = "⬅️ *Возврат в главное меню:* ⬅️"
+WELCOME_IMAGE_FAILED_MESSAGE = "Не удалось загрузить приветственное изображение."
+
+REGISTRATION_START_MESSAGE = "📝 Для начала регистрации, пожалуйста, введите следующие данные:"
+SURNAME_PROMPT = "👤 Введите вашу *фамилию*:"
+NAME_PROMPT = "👤 Введите ваше *имя*:"
+ADDRESS_PROMPT = "📍 Введите ваш *адрес* (Город, район, улица, номер квартиры):"
+PHONE_NUMBER_PROMPT = "📞 Введите ваш *номер телефона*: (например, 87771234567)"
+WELCOME_BACK_MESSAGE = "🎉 Вы уже зарегистрированы! Добро пожаловать снова! 🎉"
+ALREADY_REGISTERED_MESSAGE = "🎉 Вы уже зарегистрированы! 🎉"
+REGISTRATION_DONE_MESSAGE = "✅ *Регистрация успешно завершена!* Добро пожаловать в клуб! 🎉"
+REGISTRATION_FAILED_MESSAGE = "❌ Ошибка при регистрации. Пожалуйста, попробуйте снова. ❌"
+
+USER_MANAGEMENT_MESSAGE = "⚙️ *Выберите действие по управлению пользователями:* ⚙️"
+INVALID_USER_ID_MESSAGE = "❌ Некорректный ID пользователя. Введите *числовой ID*. ❌"
+ADD_USER_ID_PROMPT = "➕ Введите *ID нового пользователя*:"
+ADD_USER_SURNAME_PROMPT = "👤 Введите *фамилию* для пользователя с ID {user_id} (или пропустите, нажав /skip):"
+ADD_USER_NAME_PROMPT = "👤 Введите *имя* для пользователя с ID {user_id} (или /skip):"
+ADD_USER_ADDRESS_PROMPT = "📍 Введите *адрес* для пользователя с ID {user_id} (или /skip):"
+ADD_USER_PHONE_NUMBER_PROMPT = "📞 Введите *номер телефона* для пользователя с ID {user_id} (или /skip):"
+USER_ADDED_MESSAGE = "✅ Пользователь с ID {user_id} успешно *добавлен* администратором. ✅"
+USER_ADD_FAILED_MESSAGE = "❌ Не удалось добавить пользователя с ID {user_id}. Произошла ошибка. ❌"
+DELETE_USER_PROMPT = "➖ Введите *ID пользователя для удаления*:"
+USER_DELETED_MESSAGE = "✅ Пользователь с ID {user_id} успешно *удален*. ✅"
+USER_DELETE_FAILED_MESSAGE = "❌ Не удалось удалить пользователя с ID {user_id}. Произошла ошибка. ❌"
+USER_DELETE_ERROR_MESSAGE = "❌ Произошла непредвиденная ошибка при удалении пользователя. ❌"
+
+USERS_REPORT_CAPTION = "📊 *Отчет по данным пользователей и билетам* 📊"
+USERS_EXPORT_CAPTION = "📊 *Отчет по данным пользователей* 📊"
+USERS_REPORT_FILE_NAME = "user_tickets_data.xlsx"
+REPORT_FAILED_MESSAGE = "❌ Не удалось сформировать отчет. Пожалуйста, попробуйте позже. ❌"
+NO_USERS_MESSAGE = "ℹ️ В базе данных не найдено пользователей. ℹ️"
+
+IMPORT_PROMPT = ("📥 Отправьте файл *XLSX* или *CSV* со столбцами: User ID, Фамилия, Имя, Адрес, "
+                 "Номер телефона, Количество билетов (подходит файл из «📊 Экспорт данных»). "
+                 "Для отмены — /cancel")
+IMPORT_CANCELLED_MESSAGE = "❎ Импорт пользователей отменен. ❎"
+IMPORT_TOO_LARGE_MESSAGE = "❌ Файл слишком большой. Максимальный размер — {max_mb} МБ. ❌"
+IMPORT_STARTED_MESSAGE = "⏳ Файл принят, пользователи загружаются... ⏳"
+IMPORT_FAILED_MESSAGE = "❌ Не удалось загрузить пользователей, изменения не сохранены. Пожалуйста, попробуйте позже. ❌"
+IMPORT_FINISHED_MESSAGE = "✅ Импорт №{import_id} завершен: {summary}. ✅"
+IMPORT_ERRORS_MESSAGE = "⚠️ Строки с ошибками не загружены:\n{preview}"
+IMPORT_ERRORS_CAPTION = "⚠️ Ошибки импорта №{import_id}"
+IMPORT_ERRORS_FILE_NAME = "import_{import_id}_errors.csv"
+
+BROADCAST_PROMPT = "📢 Отправьте сообщение для рассылки всем пользователям (текст, фото, видео или документ). Для отмены — /cancel"
+BROADCAST_ACTIVE_MESSAGE = "⏳ Рассылка №{broadcast_id} еще идет: {summary}. Остановить: /broadcast_stop"
+BROADCAST_CANCELLED_MESSAGE = "❎ Рассылка отменена. ❎"
+BROADCAST_CREATE_FAILED_MESSAGE = "❌ Не удалось создать рассылку. Пожалуйста, попробуйте позже. ❌"
+BROADCAST_STARTED_MESSAGE = "📢 Рассылка №{broadcast_id} запущена. Остановить: /broadcast_stop"
+BROADCAST_BUSY_MESSAGE = "⏳ Другая рассылка еще не завершена. Пожалуйста, дождитесь ее окончания. ⏳"
+BROADCAST_RESUMED_MESSAGE = "📢 Рассылка №{broadcast_id} возобновлена после перезапуска бота."
+BROADCAST_STOPPING_MESSAGE = "⏹️ Рассылка будет остановлена после текущей порции сообщений."
+BROADCAST_NOT_ACTIVE_MESSAGE = "ℹ️ Сейчас нет активной рассылки. ℹ️"
+
+NO_TICKETS_MESSAGE = "ℹ️ У вас пока нет билетов в текущем конкурсе. ℹ️"
+TICKETS_PAGE_NOT_FOUND_MESSAGE = "ℹ️ Билеты на этой странице не найдены."
+SEND_RECEIPT_MESSAGE = "🧾 Отправьте *чек* в формате *PDF* для получения билетов. 🚀"
+RECEIPT_NOT_PDF_MESSAGE = "❌ Пожалуйста, отправьте чек в формате *PDF*. ❌"
+RECEIPT_ACCEPTED_MESSAGE = "⏳ Чек принят в обработку. Результат придет в ближайшее время. ⏳"
+RECEIPT_UNREADABLE_MESSAGE = "❌ Не удалось извлечь данные из чека. Пожалуйста, убедитесь, что чек корректный и в формате *PDF*. ❌"
+RECEIPT_ALREADY_ADDED_MESSAGE = "⚠️ Вы уже добавили этот чек. ⚠️"
+RECEIPT_USED_MESSAGE = "🚫 Этот чек уже был использован другим пользователем. 🚫"
+TICKETS_RECEIVED_MESSAGE = "🎉 Поздравляем! Вы получили *{tickets_count} билетов*! 🎟️ Удачи в конкурсе! 🎉"
+
+DRAW_USAGE_MESSAGE = "ℹ️ Использование: `/draw <число победителей> [зерно]`"
+DRAW_SEED_INVALID_MESSAGE = "❌ Зерно может содержать только буквы, цифры и символы `_ . : -` (до 128 символов). ❌"
+DRAW_FAILED_MESSAGE = "❌ Не удалось провести розыгрыш. Пожалуйста, попробуйте позже. ❌"
+DRAW_VERIFY_USAGE_MESSAGE = "ℹ️ Использование: `/draw_verify <номер розыгрыша>`"
+DRAW_NOT_FOUND_MESSAGE = "ℹ️ Розыгрыш №{draw_id} не найден. ℹ️"
+DRAW_VERIFY_FAILED_MESSAGE = "❌ Не удалось проверить розыгрыш. Пожалуйста, попробуйте позже. ❌"
+DRAW_VERIFIED_MESSAGE = "✅ Розыгрыш №{draw_id} подтвержден: повторный расчет по зерну дал тех же победителей. ✅"
+DRAW_MISMATCH_MESSAGE = ("⚠️ Повторный расчет розыгрыша №{draw_id} не совпал с сохраненным результатом "
+                         "(билеты могли быть удалены после розыгрыша). ⚠️")
+
+STATS_FAILED_MESSAGE = "❌ Не удалось получить статистику. Пожалуйста, попробуйте позже. ❌"
+CONTEST_USAGE_MESSAGE = "ℹ️ Использование: `/new_contest <название конкурса>`"
+CONTEST_START_FAILED_MESSAGE = "❌ Не удалось начать новый конкурс. Пожалуйста, попробуйте позже. ❌"
+CONTEST_STARTED_MESSAGE = "✅ Начат конкурс №{contest_id}. Новые билеты будут выдаваться в нем, предыдущий конкурс завершен. ✅"
+
+
+def create_main_menu():
+    menu = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=False) 
+    menu.add(KeyboardButton("🎫 Мои билеты"), KeyboardButton("🎟️ Получить билеты"), KeyboardButton("🏆 Результаты"))
+    return menu
+
+def create_admin_menu():
+    menu = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=False)
+    menu.add(KeyboardButton("🎫 Мои билеты"), KeyboardButton("🎟️ Получить билеты"), KeyboardButton("🏆 Результаты"))
+    menu.add(KeyboardButton("📊 Экспорт данных"), KeyboardButton("⚙️ Управление пользователями"))
+    menu.add(KeyboardButton("📢 Рассылка"), KeyboardButton("📈 Статистика"))
+    return menu
+
+def create_admin_management_menu():
+    management_menu = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
+    management_menu.add(KeyboardButton("➕ Добавить пользователя"), KeyboardButton("➖ Удалить пользователя"))
+    management_menu.add(KeyboardButton("📥 Импорт пользователей"))
+    management_menu.add(KeyboardButton("⬅️ Назад"))
+    return management_menu
+
+def create_menu(is_admin):
+    return create_admin_menu() if is_admin else create_main_menu()
+
+def create_results_inline_menu():
+    inline_menu = InlineKeyboardMarkup()
+    learn_more_button = InlineKeyboardButton(text="Подробнее ℹ️", callback_data='learn_results')
+    inline_menu.add(learn_more_button)
+    return inline_menu
+
+
+TICKETS_PAGE_CALLBACK_PREFIX = "tickets:"
+
+
+def create_tickets_page_menu(first_ticket_id, last_ticket_id, has_previous, has_next):
+    buttons = []
+    if has_previous:
+        buttons.append(InlineKeyboardButton(text="⬅️ Предыдущие", callback_data=f"{TICKETS_PAGE_CALLBACK_PREFIX}before:{first_ticket_id}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton(text="Следующие ➡️", callback_data=f"{TICKETS_PAGE_CALLBACK_PREFIX}after:{last_ticket_id}"))
+    if not buttons:
+        return None
+    inline_menu = InlineKeyboardMarkup()
+    inline_menu.row(*buttons)
+    return inline_menu
+
+def build_tickets_page(rows, direction, cursor_ticket_id, limit):
+    # rows запрошены с запасом в одну строку: по ней видно, есть ли билеты дальше.
+    has_more = len(rows) > limit
+    tickets = list(rows[:limit])
+    if not tickets:
+        return None, None
+    if direction == "before":
+        tickets.reverse()
+        has_previous, has_next = has_more, True
+    else:
+        has_previous, has_next = cursor_ticket_id > 0, has_more
+    reply_markup = create_tickets_page_menu(tickets[0][0], tickets[-1][0], has_previous, has_next)
+    return format_tickets_page(tickets), reply_markup
+
+def parse_tickets_page_callback(data):
+    direction, _, cursor = data[len(TICKETS_PAGE_CALLBACK_PREFIX):].partition(":")
+    if direction not in ("after", "before") or not cursor.isdigit():
+        return None
+    return direction, int(cursor)
+
+
+def format_tickets_summary(tickets_count, first_ticket_at, last_ticket_at):
+    response_lines = ["🎫 *Ваши билеты:* 🎫"]
+    response_lines.append(f"Билетов в текущем конкурсе: *{tickets_count} шт.*")
+    response_lines.append(f"Первый билет получен: {first_ticket_at.strftime('%d.%m.%Y %H:%M')}")
+    response_lines.append(f"Последний билет получен: {last_ticket_at.strftime('%d.%m.%Y %H:%M')}")
+    return "\n".join(response_lines)
+
+def format_amount(value):
+    return f"{value:,}".replace(",", " ")
+
+def escape_legacy_markdown(text):
+    # В режиме parse_mode='Markdown' экранируются только _ * ` [; обратная косая черта перед
+    # другими символами осталась бы в сообщении.
+    return re.sub(r"([_*`\[])", r"\\\1", text)
+
+def format_contest_stats(totals, days, leaders):
+    contest_id, title, started_at, tickets_count, receipts_count, receipts_amount = totals
+    response_lines = ["📈 *Статистика конкурса* 📈"]
+    response_lines.append(f"Конкурс №{contest_id} «{escape_legacy_markdown(title)}», идет с {started_at.strftime('%d.%m.%Y')}")
+    response_lines.append(f"Билетов выдано: *{format_amount(tickets_count)}*")
+    response_lines.append(f"Чеков принято: *{format_amount(receipts_count)}* на сумму *{format_amount(receipts_amount)} ₸*")
+    if days:
+        response_lines.append("")
+        response_lines.append("📅 *По дням (билеты / чеки / сумма):*")
+        for day, day_tickets, day_receipts, day_amount in days:
+            response_lines.append(f"{day.strftime('%d.%m.%Y')}: {format_amount(day_tickets)} / {format_amount(day_receipts)} / {format_amount(day_amount)} ₸")
+    if leaders:
+        response_lines.append("")
+        response_lines.append(f"🏆 *Топ-{len(leaders)} участников:*")
+        for place, (user_id, surname, name, user_tickets) in enumerate(leaders, start=1):
+            full_name = escape_legacy_markdown(" ".join(part for part in (surname, name) if part) or "—")
+            response_lines.append(f"{place}. {full_name} (ID {user_id}) — *{format_amount(user_tickets)}*")
+    return "\n".join(response_lines)
+
+def format_tickets_page(tickets):
+    response_lines = [f"Билеты №*{tickets[0][0]}* – №*{tickets[-1][0]}*:"]
+    response_lines.append("---")
+    for ticket in tickets:
+        response_lines.append(f"Билет №: *{ticket[0]}* | Дата получения: {ticket[1].strftime('%d.%m.%Y %H:%M')}")
+    return "\n".join(response_lines)
+
+
+def format_draw_results(draw, winners):
+    draw_id, seed, winners_count, min_ticket_id, max_ticket_id, candidates_checked, created_at, contest_id = draw
+    response_lines = [f"🏆 *Розыгрыш №{draw_id}* от {created_at.strftime('%d.%m.%Y %H:%M')} 🏆"]
+    response_lines.append(f"Конкурс №{contest_id}")
+    response_lines.append(f"Зерно: `{seed}`")
+    response_lines.append(f"Билеты в розыгрыше: №{min_ticket_id} – №{max_ticket_id}, проверено кандидатов: {candidates_checked}")
+    response_lines.append("---")
+    for place, ticket_id, user_id, surname, name in winners:
+        full_name = escape_legacy_markdown(" ".join(part for part in (surname, name) if part) or "—")
+        response_lines.append(f"{place}. Билет №: *{ticket_id}* | {full_name} (ID {user_id})")
+    return "\n".join(response_lines)
+
+
+def format_draw_verification(draw_id, verified):
+    return (DRAW_VERIFIED_MESSAGE if verified else DRAW_MISMATCH_MESSAGE).format(draw_id=draw_id)
+
+
+def format_receipt_rejection(reason, max_bytes, max_file_pages):
+    message_text = RECEIPT_REJECTION_MESSAGES.get(reason, RECEIPT_REJECTION_MESSAGES["error"])
+    return message_text.format(max_mb=max_bytes // (1024 * 1024), max_pages=max_file_pages)
+
+
+def format_broadcast_report(progress, finished):
+    if not finished:
+        return f"📢 Рассылка №{progress.broadcast_id} продолжается: {progress.summary()}."
+    return f"📢 Рассылка №{progress.broadcast_id} {progress.status_text()}: {progress.summary()}."
+
+
+def format_db_stats(pool_stats, user_cache_stats, admission_stats, rejections, media_stats, query_stats):
+    stats_lines = ["🗄️ *Пул соединений БД:* 🗄️"]
+    stats_lines.extend(f"`{key}`: {value}" for key, value in pool_stats.items())
+    stats_lines.append("")
+    stats_lines.append("👥 *Кэш пользователей:* 👥")
+    stats_lines.extend(f"`{key}`: {value}" for key, value in user_cache_stats.items())
+    stats_lines.append("")
+    stats_lines.append("🚦 *Прием чеков:* 🚦")
+    stats_lines.extend(f"`{key}`: {value}" for key, value in admission_stats.items())
+    stats_lines.extend(f"`rejected_{reason}`: {count}" for reason, count in sorted(rejections.items()))
+    stats_lines.append("")
+    stats_lines.append("🖼️ *Статические медиафайлы:* 🖼️")
+    stats_lines.extend(f"`{key}`: {value}" for key, value in media_stats.items())
+    stats_lines.append("")
+    stats_lines.append("⏱️ *SQL запросы (вызовы / ошибки / среднее / максимум, мс):* ⏱️")
+    query_stats = sorted(query_stats.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+    stats_lines.extend(
+        f"`{name}`: {timing['calls']} / {timing['errors']} / {timing['avg_ms']} / {timing['max_ms']}"
+        for name, timing in query_stats
+    )
+    return "\n".join(stats_lines)
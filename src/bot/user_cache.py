@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import select
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+from psycopg2 import extensions
+
+
+USER_CACHE_CHANNEL = "user_cache"
+# Массовые изменения (импорт пользователей) сбрасывают кэш целиком одним уведомлением.
+USER_CACHE_CLEAR_PAYLOAD = "*"
+RECONNECT_DELAY = 5.0
+
+
+class RegisteredUserCache:
+    def __init__(self, ttl=300, negative_ttl=30, max_entries=100000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        # Возвращает (найдено_в_кэше, строка_пользователя_или_None).
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return True, entry[0]
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def set(self, user_id, profile, generation=None):
+        # Чтение из БД, начатое до записи или инвалидации, не должно перезаписать более свежие данные.
+        ttl = self.ttl if profile is not None else self.negative_ttl
+        with self._lock:
+            if generation is None:
+                self._generation += 1
+            elif generation != self._generation:
+                return
+            if ttl <= 0:
+                self._entries.pop(user_id, None)
+                return
+            self._entries[user_id] = (tuple(profile) if profile is not None else None, time.monotonic() + ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._entries.pop(user_id, None)
+
+    def invalidate_payload(self, payload):
+        if payload == USER_CACHE_CLEAR_PAYLOAD:
+            self.clear()
+            return
+        try:
+            self.invalidate(int(payload))
+        except (TypeError, ValueError):
+            logging.warning(f"Получено некорректное уведомление об изменении пользователя: {payload!r}")
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+class UserCacheListener:
+    def __init__(self, cache, conn_kwargs, channel=USER_CACHE_CHANNEL):
+        self.cache = cache
+        self.conn_kwargs = conn_kwargs
+        self.channel = channel
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._listen_loop, name="user-cache-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _listen_loop(self):
+        while not self._stopped.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.conn_kwargs)
+                conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                # Пока соединение не было установлено, уведомления могли быть пропущены.
+                self.cache.clear()
+                logging.info(f"Подписка на изменения пользователей ({self.channel}) установлена.")
+                while not self._stopped.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.cache.invalidate_payload(conn.notifies.pop(0).payload)
+            except psycopg2.Error as e:
+                logging.error(f"Подписка на изменения пользователей прервана: {e}")
+                self.cache.clear()
+                self._stopped.wait(RECONNECT_DELAY)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+class AsyncUserCacheListener:
+    def __init__(self, cache, conn_kwargs, channel=USER_CACHE_CHANNEL):
+        self.cache = cache
+        self.conn_kwargs = conn_kwargs
+        self.channel = channel
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._listen_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _on_notification(self, connection, pid, channel, payload):
+        self.cache.invalidate_payload(payload)
+
+    async def _listen_loop(self):
+        # asyncpg нужен только асинхронному боту, потоковый его не загружает.
+        import asyncpg
+
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(**self.conn_kwargs)
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda connection: closed.set())
+                await conn.add_listener(self.channel, self._on_notification)
+                self.cache.clear()
+                logging.info(f"Подписка на изменения пользователей ({self.channel}) установлена.")
+                await closed.wait()
+                logging.error("Подписка на изменения пользователей прервана: соединение закрыто.")
+            except (asyncpg.PostgresError, OSError, asyncio.TimeoutError) as e:
+                logging.error(f"Подписка на изменения пользователей прервана: {e}")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            self.cache.clear()
+            await asyncio.sleep(RECONNECT_DELAY)
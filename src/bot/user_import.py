@@ -0,0 +1,298 @@
+import csv
+import io
+import os
+import re
+import zipfile
+import zlib
+from xml.etree import ElementTree
+
+
+IMPORT_COLUMNS = ("user_id", "surname", "name", "address", "phone_number", "number_of_tickets")
+IMPORT_COPY_SQL = (
+    "COPY users_import_staging (import_id, row_number, " + ", ".join(IMPORT_COLUMNS) + ") FROM STDIN"
+)
+IMPORT_ERRORS_IN_MESSAGE = 20
+
+# Заголовки из выгрузки «📊 Экспорт данных» и имена столбцов таблицы users.
+HEADER_ALIASES = {
+    "user id": "user_id",
+    "user_id": "user_id",
+    "id": "user_id",
+    "фамилия": "surname",
+    "surname": "surname",
+    "имя": "name",
+    "name": "name",
+    "адрес": "address",
+    "address": "address",
+    "номер телефона": "phone_number",
+    "телефон": "phone_number",
+    "phone_number": "phone_number",
+    "количество билетов": "number_of_tickets",
+    "number_of_tickets": "number_of_tickets",
+}
+TEXT_LIMITS = {"surname": 255, "name": 255, "address": 255, "phone_number": 20}
+PHONE_PATTERN = re.compile(r"\+?[\d\s()-]{5,20}")
+MAX_USER_ID = 2 ** 63 - 1
+MAX_TICKETS = 100000
+XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+XLSX_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+# Ошибки чтения поврежденного файла: часть из них возникает уже во время COPY, когда лист дочитывается.
+FILE_READ_ERRORS = (UnicodeDecodeError, csv.Error, zipfile.BadZipFile, zlib.error, EOFError, ElementTree.ParseError,
+                    KeyError, OSError)
+
+
+class UserImportError(Exception):
+    pass
+
+
+class InvalidCell:
+    # Ячейка, значение которой не удалось прочитать: строка с ней попадает в отчет об ошибках.
+    def __init__(self, reference, error):
+        self.reference = reference
+        self.error = error
+
+    def __str__(self):
+        return f"ячейка {self.reference or ''} не читается ({self.error})"
+
+
+def read_csv_rows(data):
+    text = data.decode("utf-8-sig")
+    first_line = text.split("\n", 1)[0]
+    delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+    yield from csv.reader(io.StringIO(text, newline=""), delimiter=delimiter)
+
+def xlsx_first_sheet_path(archive):
+    with archive.open("xl/workbook.xml") as file:
+        sheet = ElementTree.parse(file).getroot().find(f"{XLSX_NS}sheets/{XLSX_NS}sheet")
+    relation_id = sheet.get(f"{XLSX_REL_NS}id")
+    with archive.open("xl/_rels/workbook.xml.rels") as file:
+        for relation in ElementTree.parse(file).getroot():
+            if relation.get("Id") == relation_id:
+                target = relation.get("Target")
+                return target.lstrip("/") if target.startswith("/") else "xl/" + target
+    raise KeyError(relation_id)
+
+def xlsx_column_index(reference):
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord("A") + 1
+    return index - 1
+
+def xlsx_cell_value(cell, shared_strings):
+    cell_type = cell.get("t")
+    if cell_type == "inlineStr":
+        return "".join(text.text or "" for text in cell.iter(f"{XLSX_NS}t"))
+    value = cell.find(f"{XLSX_NS}v")
+    if value is None or value.text is None:
+        return None
+    if cell_type == "s":
+        index = int(value.text)
+        if not 0 <= index < len(shared_strings):
+            raise ValueError(f"нет общей строки с номером {index}")
+        return shared_strings[index]
+    # t="d" — дата в формате ISO 8601, передается как текст.
+    if cell_type in ("str", "e", "b", "d"):
+        return value.text
+    return int(value.text) if value.text.lstrip("-").isdigit() else float(value.text)
+
+def read_xlsx_rows(data):
+    # Лист читается потоком через iterparse: для выгрузок на сотни тысяч строк это в несколько раз
+    # быстрее openpyxl (даже в режиме read_only), а в памяти держится только текущая строка.
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        shared_strings = []
+        if "xl/sharedStrings.xml" in archive.namelist():
+            with archive.open("xl/sharedStrings.xml") as file:
+                for _, element in ElementTree.iterparse(file):
+                    if element.tag == f"{XLSX_NS}si":
+                        shared_strings.append("".join(text.text or "" for text in element.iter(f"{XLSX_NS}t")))
+                        element.clear()
+        with archive.open(xlsx_first_sheet_path(archive)) as file:
+            for _, element in ElementTree.iterparse(file):
+                if element.tag != f"{XLSX_NS}row":
+                    continue
+                values = []
+                for cell in element.iter(f"{XLSX_NS}c"):
+                    reference = cell.get("r")
+                    if reference:
+                        values.extend([None] * (xlsx_column_index(reference) - len(values)))
+                    try:
+                        values.append(xlsx_cell_value(cell, shared_strings))
+                    except ValueError as e:
+                        values.append(InvalidCell(reference, e))
+                element.clear()
+                yield values
+
+def cell_text(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    return text or None
+
+def parse_int(value):
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return int(cell_text(value).replace(" ", "").replace("\u00a0", ""))
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.accepted = 0
+        self.duplicates = 0
+        self.inserted = 0
+        self.updated = 0
+        self.tickets_added = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    def summary(self):
+        return (f"строк: {self.rows}, принято: {self.accepted}, новых пользователей: {self.inserted}, "
+                f"обновлено: {self.updated}, добавлено билетов: {self.tickets_added}, "
+                f"повторов: {self.duplicates}, ошибок: {len(self.errors)}")
+
+    def finish_params(self, import_id):
+        return {
+            "import_id": import_id,
+            "rows_count": self.rows,
+            "inserted_count": self.inserted,
+            "updated_count": self.updated,
+            "tickets_added": self.tickets_added,
+            "errors_count": len(self.errors),
+        }
+
+    def errors_preview(self):
+        lines = [f"Строка {row_number}: {message}" for row_number, message in self.errors[:IMPORT_ERRORS_IN_MESSAGE]]
+        if len(self.errors) > IMPORT_ERRORS_IN_MESSAGE:
+            lines.append(f"… и еще {len(self.errors) - IMPORT_ERRORS_IN_MESSAGE}, полный список — в файле.")
+        return "\n".join(lines)
+
+    def errors_csv(self):
+        output = io.StringIO()
+        writer = csv.writer(output, delimiter=";")
+        writer.writerow(["Строка", "Ошибка"])
+        writer.writerows(self.errors)
+        # BOM нужен, чтобы Excel открыл файл в UTF-8.
+        return io.BytesIO(output.getvalue().encode("utf-8-sig"))
+
+
+class UserImport:
+    def __init__(self, data, file_name):
+        extension = os.path.splitext(file_name or "")[1].lower()
+        try:
+            if extension == ".csv":
+                self._rows = read_csv_rows(data)
+            elif extension == ".xlsx":
+                self._rows = read_xlsx_rows(data)
+            else:
+                raise UserImportError("Поддерживаются только файлы *.xlsx* и *.csv*.")
+            header = next(self._rows, None)
+        except FILE_READ_ERRORS as e:
+            raise UserImportError(f"Не удалось прочитать файл: {e}")
+        if header is None:
+            raise UserImportError("Файл пуст.")
+        self.columns = {}
+        for index, title in enumerate(header):
+            column = HEADER_ALIASES.get((cell_text(title) or "").lower())
+            if column is not None:
+                self.columns.setdefault(column, index)
+        if "user_id" not in self.columns:
+            raise UserImportError("В первой строке файла нет столбца *User ID*.")
+        self.report = ImportReport()
+        self._seen = {}
+
+    def _validate(self, values):
+        for value in values:
+            if isinstance(value, InvalidCell):
+                raise ValueError(str(value))
+        cells = {column: values[index] if index < len(values) else None for column, index in self.columns.items()}
+        try:
+            user_id = parse_int(cells["user_id"])
+        except (TypeError, ValueError, AttributeError):
+            raise ValueError(f"некорректный User ID {cell_text(cells['user_id'])!r:.60}")
+        if not 0 < user_id <= MAX_USER_ID:
+            raise ValueError(f"User ID {user_id} вне допустимого диапазона")
+
+        record = [user_id]
+        for column in IMPORT_COLUMNS[1:5]:
+            text = cell_text(cells.get(column))
+            if text is not None and len(text) > TEXT_LIMITS[column]:
+                raise ValueError(f"поле {column} длиннее {TEXT_LIMITS[column]} символов")
+            record.append(text)
+        if record[4] is not None and not PHONE_PATTERN.fullmatch(record[4]):
+            raise ValueError(f"некорректный номер телефона {record[4]!r:.60}")
+
+        tickets = cells.get("number_of_tickets")
+        if cell_text(tickets) is None:
+            record.append(None)
+        else:
+            try:
+                record.append(parse_int(tickets))
+            except (TypeError, ValueError, AttributeError):
+                raise ValueError(f"некорректное количество билетов {cell_text(tickets)!r:.60}")
+            if not 0 <= record[-1] <= MAX_TICKETS:
+                raise ValueError(f"количество билетов должно быть от 0 до {MAX_TICKETS}")
+        return tuple(record)
+
+    def records(self):
+        # Строки проверяются по мере чтения: в COPY уходят только корректные,
+        # ошибки копятся в отчете с номером строки файла.
+        try:
+            yield from self._records()
+        except FILE_READ_ERRORS as e:
+            # Файл поврежден дальше первой строки: импорт откатывается целиком.
+            raise UserImportError(f"Не удалось прочитать файл: {e}")
+
+    def _records(self):
+        for row_number, values in enumerate(self._rows, start=2):
+            if not any(cell_text(value) for value in values):
+                continue
+            self.report.rows += 1
+            try:
+                record = self._validate(values)
+            except ValueError as e:
+                self.report.add_error(row_number, str(e))
+                continue
+            # Выгрузка повторяет данные пользователя в каждой строке его билета: такие строки пропускаются.
+            first_seen = self._seen.setdefault(record[0], (row_number, record))
+            if first_seen[0] != row_number:
+                if first_seen[1] == record:
+                    self.report.duplicates += 1
+                else:
+                    self.report.add_error(row_number, f"User ID {record[0]} уже встречался в строке {first_seen[0]} с другими данными")
+                continue
+            self.report.accepted += 1
+            yield (row_number,) + record
+
+
+def copy_text_value(value):
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class CopyStream:
+    # Файлоподобный объект для cursor.copy_expert: строки COPY формируются по мере чтения,
+    # поэтому весь файл не собирается в памяти.
+    def __init__(self, import_id, records):
+        self.import_id = import_id
+        self._records = iter(records)
+        self._buffer = ""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            record = next(self._records, None)
+            if record is None:
+                break
+            self._buffer += "\t".join(copy_text_value(value) for value in (self.import_id,) + record) + "\n"
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
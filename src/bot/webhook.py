@@ -0,0 +1,151 @@
+import hmac
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot.types import Update
+
+
+MAX_UPDATE_BYTES = 1024 * 1024
+# Bot API принимает max_connections в setWebhook только в диапазоне 1-100.
+WEBHOOK_MAX_CONNECTIONS = 100
+
+
+def update_chat_key(update):
+    for message in (update.message, update.edited_message, update.channel_post, update.edited_channel_post):
+        if message is not None:
+            return message.chat.id
+    if update.callback_query is not None:
+        if update.callback_query.message is not None:
+            return update.callback_query.message.chat.id
+        return update.callback_query.from_user.id
+    for event_name in ("inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query",
+                       "my_chat_member", "chat_member", "chat_join_request"):
+        event = getattr(update, event_name, None)
+        if event is not None:
+            chat = getattr(event, "chat", None)
+            if chat is not None:
+                return chat.id
+            return event.from_user.id
+    return update.update_id
+
+
+class UpdateDispatcher:
+    def __init__(self, process_updates, workers=4, queue_size=1000, batch_size=50):
+        self.process_updates = process_updates
+        self.workers = max(workers, 1)
+        self.batch_size = max(batch_size, 1)
+        self._queues = [queue.Queue(maxsize=max(queue_size // self.workers, 1)) for _ in range(self.workers)]
+        self._threads = []
+
+    def start(self):
+        for worker_num, update_queue in enumerate(self._queues):
+            thread = threading.Thread(target=self._worker_loop, args=(update_queue,), name=f"update-dispatch-{worker_num}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info(f"Обработчик обновлений запущен: {self.workers} потоков.")
+
+    def stop(self):
+        for update_queue in self._queues:
+            update_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def queue_depths(self):
+        return [update_queue.qsize() for update_queue in self._queues]
+
+    def submit(self, update):
+        # Все обновления одного чата попадают в одну очередь и обрабатываются одним потоком,
+        # поэтому порядок сообщений внутри чата сохраняется.
+        update_queue = self._queues[hash(update_chat_key(update)) % self.workers]
+        try:
+            update_queue.put_nowait(update)
+            return True
+        except queue.Full:
+            return False
+
+    def _worker_loop(self, update_queue):
+        while True:
+            batch = [update_queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(update_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            batch = [update for update in batch if update is not None]
+            if batch:
+                try:
+                    self.process_updates(batch)
+                except Exception as e:
+                    logging.error(f"Ошибка при обработке пакета из {len(batch)} обновлений: {e}")
+            if stop:
+                return
+
+
+class WebhookServer:
+    def __init__(self, host, port, path, secret_token, dispatcher):
+        self.path = path
+        self.secret_token = secret_token
+        self.dispatcher = dispatcher
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+
+    def _make_handler(self):
+        webhook = self
+
+        class WebhookRequestHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                self._reply(200 if self.path == "/healthz" else 404)
+
+            def do_POST(self):
+                if self.path != webhook.path:
+                    self._reply(404)
+                    return
+                received_token = self.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+                # compare_digest принимает str только из ASCII, иначе TypeError и ответ 500.
+                if not hmac.compare_digest(received_token.encode("utf-8"), webhook.secret_token.encode("utf-8")):
+                    self._reply(403)
+                    return
+                try:
+                    content_length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    self._reply(400)
+                    return
+                if content_length <= 0:
+                    self._reply(400)
+                    return
+                if content_length > MAX_UPDATE_BYTES:
+                    self._reply(413)
+                    return
+                try:
+                    update = Update.de_json(json.loads(self.rfile.read(content_length)))
+                except (ValueError, KeyError, TypeError) as e:
+                    logging.error(f"Получено некорректное обновление от Telegram: {e}")
+                    self._reply(400)
+                    return
+                # При 503 Telegram повторит доставку обновления позже.
+                self._reply(200 if webhook.dispatcher.submit(update) else 503)
+
+        return WebhookRequestHandler
+
+    def serve_forever(self):
+        host, port = self._server.server_address[:2]
+        logging.info(f"Webhook-сервер слушает {host}:{port}{self.path}")
+        self._server.serve_forever()
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()